@@ -9,36 +9,73 @@ import subprocess
 import ipaddress
 import random
 import string
+import sys
+from array import array
+from bisect import bisect_left
+from collections.abc import Sequence
 from datetime import datetime
-from typing import Dict, List, Optional, Set
+from typing import Callable, Dict, List, Optional, Set
 import getpass
+import argparse
+import gzip
 
-class Colors:
-    HEADER = '\033[95m'
-    OKBLUE = '\033[94m'
-    OKCYAN = '\033[96m'
-    OKGREEN = '\033[92m'
-    WARNING = '\033[93m'
-    FAIL = '\033[91m'
-    ENDC = '\033[0m'
-    BOLD = '\033[1m'
-    UNDERLINE = '\033[4m'
-
-def colored_print(text, color):
-    print(f"{color}{text}{Colors.ENDC}")
+from VILcoin_log import Colors, add_logging_arguments, colored_print, setup_logging
+from VILcoin_metrics import NodeMetrics
+from VILcoin_miner import AutoMiner
+from VILcoin_store import ChainStore, Persister
+from VILcoin_trace import add_tracing_arguments, start_tracing, tracer
 
 def generate_user_id():
     """Generate a random 10-character alphanumeric ID"""
     return ''.join(random.choices(string.ascii_uppercase + string.digits, k=10))
 
+def encode_message(msg_type: str, data, port: int = None):
+    """Wrap already-serialized JSON bytes in a {"type", "data"} network message.
+
+    `port` is the sender's listen port, so the receiver knows where to dial back.
+    `data` may also be a list of buffers (e.g. block bytes mapped from disk); the
+    message is then a list too, to be written out by send_buffers().
+    """
+    port_field = b', "port": ' + str(port).encode() if port is not None else b''
+    head = b'{"type": ' + json.dumps(msg_type).encode() + port_field + b', "data": '
+    if isinstance(data, list):
+        return [head, *data, b'}']
+    return head + data + b'}'
+
+def json_array(items: list) -> list:
+    """Buffers of a JSON array of already-serialized items, without joining them"""
+    parts = [b'[']
+    for item in items:
+        parts.append(item)
+        parts.append(b', ')
+    parts[-1] = b']' if items else b'[]'
+    return parts
+
+def intern_id(value):
+    """Share one string object per user id across transactions, blocks and users"""
+    return sys.intern(value) if type(value) is str else value
+
 class Transaction:
+    __slots__ = ('sender', 'receiver', 'amount', 'timestamp', 'tx_type', 'hash', '_json')
+
     def __init__(self, sender: str, receiver: str, amount: float, timestamp: float = None, tx_type: str = "transfer"):
-        self.sender = sender
-        self.receiver = receiver
+        self.sender = intern_id(sender)
+        self.receiver = intern_id(receiver)
         self.amount = amount
         self.timestamp = timestamp or time.time()
-        self.tx_type = tx_type
+        self.tx_type = intern_id(tx_type)
         self.hash = self.calculate_hash()
+        self._json = None
+    
+    @classmethod
+    def from_dict(cls, tx_data: dict) -> 'Transaction':
+        return cls(
+            tx_data['sender'],
+            tx_data['receiver'],
+            tx_data['amount'],
+            tx_data['timestamp'],
+            tx_data.get('tx_type', 'transfer')
+        )
     
     def calculate_hash(self) -> str:
         transaction_string = f"{self.sender}{self.receiver}{self.amount}{self.timestamp}{self.tx_type}"
@@ -53,29 +90,371 @@ class Transaction:
             'tx_type': self.tx_type,
             'hash': self.hash
         }
+    
+    def serialize(self) -> bytes:
+        if self._json is None:
+            self._json = json.dumps(self.to_dict()).encode()
+        return self._json
+
+class TransactionStore:
+    """Column-oriented storage for confirmed transactions.
+
+    Each confirmed transaction is one row spread over flat arrays; user ids and
+    transaction types live once in a shared symbol table. Rows are appended in
+    chain order, so dropping the tip is a truncate and pruning old blocks drops
+    a prefix. Row numbers stay absolute; `offset` rows have been dropped.
+    """
+    AMOUNT_INT = 1
+    TIMESTAMP_INT = 2
+
+    def __init__(self):
+        self.symbols = []
+        self.symbol_index = {}
+        self.offset = 0
+        self.senders = array('I')
+        self.receivers = array('I')
+        self.kinds = array('I')
+        self.amounts = array('d')
+        self.timestamps = array('d')
+        self.flags = array('B')
+        self.hashes = bytearray()
+        self.extra = {}
+
+    def __len__(self) -> int:
+        return self.offset + len(self.amounts)
+
+    def symbol(self, value) -> int:
+        idx = self.symbol_index.get(value)
+        if idx is None:
+            idx = len(self.symbols)
+            self.symbols.append(intern_id(value))
+            self.symbol_index[value] = idx
+        return idx
+
+    @staticmethod
+    def _pack_number(value):
+        if type(value) is float:
+            return value, 0
+        if type(value) is int and abs(value) <= 2 ** 53:
+            return float(value), 1
+        return None, 0
+
+    def append(self, tx: Transaction) -> int:
+        row = len(self)
+        amount, amount_int = self._pack_number(tx.amount)
+        timestamp, timestamp_int = self._pack_number(tx.timestamp)
+        if amount is None or timestamp is None:
+            self.extra[row] = (tx.amount, tx.timestamp)
+            amount, timestamp, amount_int, timestamp_int = 0.0, 0.0, 0, 0
+        
+        self.senders.append(self.symbol(tx.sender))
+        self.receivers.append(self.symbol(tx.receiver))
+        self.kinds.append(self.symbol(tx.tx_type))
+        self.amounts.append(amount)
+        self.timestamps.append(timestamp)
+        self.flags.append(amount_int * self.AMOUNT_INT | timestamp_int * self.TIMESTAMP_INT)
+        self.hashes += bytes.fromhex(tx.hash)
+        return row
+
+    def amount(self, row: int):
+        if row in self.extra:
+            return self.extra[row][0]
+        i = row - self.offset
+        value = self.amounts[i]
+        return int(value) if self.flags[i] & self.AMOUNT_INT else value
+
+    def timestamp(self, row: int):
+        if row in self.extra:
+            return self.extra[row][1]
+        i = row - self.offset
+        value = self.timestamps[i]
+        return int(value) if self.flags[i] & self.TIMESTAMP_INT else value
+
+    def get(self, row: int) -> Transaction:
+        i = row - self.offset
+        tx = Transaction.__new__(Transaction)
+        tx.sender = self.symbols[self.senders[i]]
+        tx.receiver = self.symbols[self.receivers[i]]
+        tx.amount = self.amount(row)
+        tx.timestamp = self.timestamp(row)
+        tx.tx_type = self.symbols[self.kinds[i]]
+        tx.hash = self.hashes[i * 32:i * 32 + 32].hex()
+        tx._json = None
+        return tx
+
+    def compact(self, block: 'Block') -> None:
+        """Move a confirmed block's transactions into the store"""
+        if isinstance(block.transactions, TransactionView):
+            return
+        start = len(self)
+        for tx in block.transactions:
+            self.append(tx)
+        block.transactions = TransactionView(self, start, len(self) - start)
+
+    def truncate(self, rows: int) -> None:
+        i = rows - self.offset
+        for column in (self.senders, self.receivers, self.kinds, self.amounts, self.timestamps, self.flags):
+            del column[i:]
+        del self.hashes[i * 32:]
+        for row in [r for r in self.extra if r >= rows]:
+            del self.extra[row]
+
+    def drop_before(self, row: int) -> None:
+        """Forget rows below `row`. Done in chunks, since it shifts the remaining rows."""
+        n = row - self.offset
+        if n <= 0 or (n < 4096 and n * 2 < len(self.amounts)):
+            return
+        for column in (self.senders, self.receivers, self.kinds, self.amounts, self.timestamps, self.flags):
+            del column[:n]
+        del self.hashes[:n * 32]
+        for r in [r for r in self.extra if r < row]:
+            del self.extra[r]
+        self.offset = row
+
+    def apply_flows(self, view: 'TransactionView', balances: Dict[str, float], sign: int = 1) -> None:
+        """Add (sign=1) or take back (sign=-1) a block's transfers on a user_id -> balance map"""
+        symbols, senders, receivers = self.symbols, self.senders, self.receivers
+        for row in range(view.start, view.start + view.count):
+            i = row - self.offset
+            amount = self.amount(row) * sign
+            sender = symbols[senders[i]]
+            receiver = symbols[receivers[i]]
+            balances[sender] = balances.get(sender, 0) - amount
+            balances[receiver] = balances.get(receiver, 0) + amount
+
+class TransactionView(Sequence):
+    """Read-only list of a block's transactions backed by a TransactionStore"""
+    __slots__ = ('store', 'start', 'count')
+
+    def __init__(self, store: TransactionStore, start: int, count: int):
+        self.store = store
+        self.start = start
+        self.count = count
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self.store.get(self.start + r) for r in range(*i.indices(self.count))]
+        if i < 0:
+            i += self.count
+        if not 0 <= i < self.count:
+            raise IndexError("transaction index out of range")
+        return self.store.get(self.start + i)
+
+    def __iter__(self):
+        get = self.store.get
+        for row in range(self.start, self.start + self.count):
+            yield get(row)
+
+class ChainIndex:
+    """Secondary indexes over the held chain: tx hash, per-user history and mined blocks.
+
+    A location packs (height, position in block) into one int, so user
+    histories are flat arrays in chain order: appending a block only appends,
+    rolling back the tip only pops from the end and pruning cuts a prefix.
+    """
+    SHIFT = 32
+
+    def __init__(self):
+        self.tx_locations = {}
+        self.user_locations = {}
+        self.mined_blocks = {}
+
+    @classmethod
+    def location(cls, height: int, position: int) -> int:
+        return height << cls.SHIFT | position
+
+    @classmethod
+    def split(cls, location: int):
+        return location >> cls.SHIFT, location & ((1 << cls.SHIFT) - 1)
+
+    def _rows(self, view: TransactionView, store: TransactionStore):
+        symbols = store.symbols
+        for position in range(view.count):
+            i = view.start + position - store.offset
+            yield position, i, symbols[store.senders[i]], symbols[store.receivers[i]]
+
+    def add_block(self, block: 'Block', store: TransactionStore) -> None:
+        view = block.transactions
+        base = self.location(block.index, 0)
+        for position, i, sender, receiver in self._rows(view, store):
+            location = base | position
+            self.tx_locations[bytes(store.hashes[i * 32:i * 32 + 32])] = location
+            for user_id in (sender, receiver):
+                if user_id == "SYSTEM":
+                    continue
+                locations = self.user_locations.get(user_id)
+                if locations is None:
+                    locations = self.user_locations[user_id] = array('Q')
+                if not locations or locations[-1] != location:
+                    locations.append(location)
+        if block.miner:
+            self.mined_blocks.setdefault(block.miner, array('Q')).append(block.index)
+
+    def remove_block(self, block: 'Block', store: TransactionStore) -> None:
+        """Undo add_block for the current tip"""
+        base = self.location(block.index, 0)
+        for position, i, sender, receiver in self._rows(block.transactions, store):
+            self.tx_locations.pop(bytes(store.hashes[i * 32:i * 32 + 32]), None)
+            for user_id in (sender, receiver):
+                locations = self.user_locations.get(user_id)
+                while locations and locations[-1] >= base:
+                    locations.pop()
+        mined = self.mined_blocks.get(block.miner)
+        if mined and mined[-1] == block.index:
+            mined.pop()
+
+    def forget_transactions(self, block: 'Block', store: TransactionStore) -> None:
+        """Drop a block's tx hashes before its body is pruned; call trim_history afterwards"""
+        for position, i, sender, receiver in self._rows(block.transactions, store):
+            self.tx_locations.pop(bytes(store.hashes[i * 32:i * 32 + 32]), None)
+
+    def trim_history(self, height: int) -> None:
+        """Forget user history below `height`. Mined blocks stay, their headers are kept."""
+        cutoff = self.location(height, 0)
+        for locations in self.user_locations.values():
+            n = bisect_left(locations, cutoff)
+            if n:
+                del locations[:n]
+
+    def find(self, tx_hash: str) -> Optional[int]:
+        try:
+            return self.tx_locations.get(bytes.fromhex(tx_hash))
+        except ValueError:
+            return None
+
+    def history(self, user_id: str, page: int = 0, per_page: int = 20):
+        """One page of a user's locations, newest first, and the total count"""
+        locations = self.user_locations.get(user_id, ())
+        total = len(locations)
+        end = max(total - page * per_page, 0)
+        return [locations[i] for i in range(end - 1, max(end - per_page, 0) - 1, -1)], total
+
+    def mined(self, user_id: str, page: int = 0, per_page: int = 20):
+        heights = self.mined_blocks.get(user_id, ())
+        total = len(heights)
+        end = max(total - page * per_page, 0)
+        return [heights[i] for i in range(end - 1, max(end - per_page, 0) - 1, -1)], total
 
 class Block:
-    def __init__(self, index: int, transactions: List[Transaction], previous_hash: str, miner: str = None):
+    __slots__ = ('index', 'timestamp', 'transactions', 'previous_hash', 'miner', 'nonce', 'difficulty', 'hash', 'pruned',
+                 '_json', '_json_hash', '_tx_span', '_checked_hash')
+
+    # Blocks mined before per-block difficulty were all mined at this one
+    LEGACY_DIFFICULTY = 5
+
+    def __init__(self, index: int, transactions: List[Transaction], previous_hash: str, miner: str = None,
+                 timestamp: float = None, difficulty: int = None):
         self.index = index
-        self.timestamp = time.time()
+        self.timestamp = timestamp or time.time()
         self.transactions = transactions
         self.previous_hash = previous_hash
-        self.miner = miner
+        self.miner = intern_id(miner)
         self.nonce = 0
+        self.difficulty = difficulty
+        self.pruned = False
+        self._json = None
+        self._checked_hash = None
+        self.hash = None
         self.hash = self.calculate_hash()
     
+    @classmethod
+    def from_dict(cls, block_data: dict, trusted: bool = False) -> 'Block':
+        # Only our own storage may mark a block as pruned; a peer's pruned header fails its hash check
+        block = cls.__new__(cls)
+        block.index = block_data['index']
+        block.timestamp = block_data['timestamp']
+        block.transactions = [Transaction.from_dict(tx_data) for tx_data in block_data['transactions']]
+        block.previous_hash = block_data['previous_hash']
+        block.miner = intern_id(block_data.get('miner'))
+        block.nonce = block_data['nonce']
+        block.difficulty = block_data.get('difficulty')
+        block.hash = block_data['hash']
+        block.pruned = trusted and block_data.get('pruned', False)
+        block._json = None
+        block._checked_hash = None
+        return block
+    
+    def serialize(self) -> bytes:
+        """Canonical JSON bytes of to_dict(), reused by storage, sync responses and hashing"""
+        if self._json is None or self._json_hash != self.hash:
+            if self._json is None:
+                tx_json = json.dumps([t.to_dict() for t in self.transactions]).encode()
+            else:
+                # Only the header changed (mining or deserialization), keep the transaction bytes
+                tx_json = self.transactions_json()
+            head = (json.dumps({'index': self.index, 'timestamp': self.timestamp})[:-1] + ', "transactions": ').encode()
+            header = {
+                'previous_hash': self.previous_hash,
+                'miner': self.miner,
+                'nonce': self.nonce
+            }
+            if self.difficulty is not None:
+                header['difficulty'] = self.difficulty
+            header['hash'] = self.hash
+            if self.pruned:
+                header['pruned'] = True
+            tail = (', ' + json.dumps(header)[1:]).encode()
+            self._json = head + tx_json + tail
+            self._tx_span = (len(head), len(head) + len(tx_json))
+            self._json_hash = self.hash
+        return self._json
+    
+    def transactions_json(self) -> bytes:
+        if self._json is None:
+            self.serialize()
+        start, end = self._tx_span
+        return self._json[start:end]
+    
+    def hash_prefix(self) -> bytes:
+        """Everything in the hash preimage except the trailing nonce"""
+        return f"{self.index}{self.timestamp}".encode() + self.transactions_json() + f"{self.previous_hash}".encode()
+    
     def calculate_hash(self) -> str:
-        block_string = f"{self.index}{self.timestamp}{json.dumps([t.to_dict() for t in self.transactions])}{self.previous_hash}{self.nonce}"
-        return hashlib.sha256(block_string.encode()).hexdigest()
+        return hashlib.sha256(self.hash_prefix() + str(self.nonce).encode()).hexdigest()
+    
+    def has_valid_hash(self) -> bool:
+        if self.pruned:
+            # Verified before its body was dropped
+            return True
+        if self._checked_hash is not None and self._checked_hash == self.hash:
+            return True
+        if self.hash != self.calculate_hash():
+            return False
+        self._checked_hash = self.hash
+        return True
     
     def mine_block(self, difficulty: int) -> None:
         target = "0" * difficulty
-        while self.hash[:difficulty] != target:
-            self.nonce += 1
-            self.hash = self.calculate_hash()
+        with tracer.span('mine_block', index=self.index, difficulty=difficulty):
+            prefix = hashlib.sha256(self.hash_prefix())
+            while self.hash[:difficulty] != target:
+                self.nonce += 1
+                h = prefix.copy()
+                h.update(str(self.nonce).encode())
+                self.hash = h.hexdigest()
+        self._checked_hash = self.hash
+    
+    def mining_difficulty(self) -> int:
+        return self.LEGACY_DIFFICULTY if self.difficulty is None else self.difficulty
+    
+    def work(self) -> int:
+        """Expected number of hashes it took to mine this block"""
+        return 16 ** self.mining_difficulty()
+    
+    def meets_difficulty(self) -> bool:
+        return self.hash.startswith("0" * self.mining_difficulty())
+    
+    def prune(self) -> None:
+        """Drop the transaction bodies, keeping the already-verified header"""
+        self.transactions = []
+        self.pruned = True
+        self._json = None
     
     def to_dict(self) -> dict:
-        return {
+        block_dict = {
             'index': self.index,
             'timestamp': self.timestamp,
             'transactions': [t.to_dict() for t in self.transactions],
@@ -84,14 +463,67 @@ class Block:
             'nonce': self.nonce,
             'hash': self.hash
         }
+        if self.difficulty is not None:
+            block_dict['difficulty'] = self.difficulty
+        if self.pruned:
+            block_dict['pruned'] = True
+        return block_dict
+
+class Chain(Sequence):
+    """Blocks indexed by height.
+
+    A node bootstrapped from a snapshot only holds blocks from `base` upward;
+    everything below is summarized by the snapshot's balance state.
+    """
+    __slots__ = ('blocks', 'base')
+
+    def __init__(self, blocks: List[Block] = None, base: int = 0):
+        self.blocks = blocks if blocks is not None else []
+        self.base = base
+
+    def __len__(self) -> int:
+        return self.base + len(self.blocks)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            start, stop, step = i.indices(len(self))
+            if step > 0:
+                start = max(start, self.base)
+            return [self.blocks[h - self.base] for h in range(start, stop, step) if h >= self.base]
+        if i < 0:
+            i += len(self)
+        if not self.base <= i < len(self):
+            raise IndexError(f"block #{i} is not held by this node")
+        return self.blocks[i - self.base]
+
+    def __iter__(self):
+        return iter(self.blocks)
+
+    def append(self, block: Block) -> None:
+        self.blocks.append(block)
+
+    def pop(self) -> Block:
+        return self.blocks.pop()
 
 class User:
+    __slots__ = ('username', 'user_id', 'password_hash', 'balance')
+
     def __init__(self, username: str, password: str, user_id: str = None):
         self.username = username
-        self.user_id = user_id or generate_user_id()
+        self.user_id = intern_id(user_id or generate_user_id())
         self.password_hash = hashlib.sha256(password.encode()).hexdigest()
         self.balance = 1000.0
     
+    @classmethod
+    def from_dict(cls, user_data: dict, username: str = None) -> 'User':
+        # A stored or received user already carries its password hash; nothing to hash here
+        user = cls.__new__(cls)
+        user.username = username or user_data['username']
+        user.user_id = intern_id(user_data.get('user_id') or generate_user_id())
+        user.password_hash = user_data['password_hash']
+        user.balance = user_data['balance']
+        return user
+    
     def verify_password(self, password: str) -> bool:
         return self.password_hash == hashlib.sha256(password.encode()).hexdigest()
     
@@ -103,32 +535,184 @@ class User:
             'balance': self.balance
         }
 
-class Blockchain:
+def read_message(sock: socket.socket, timeout: float) -> bytes:
+    """Read one JSON message; the sender either closes or stops once the JSON is complete"""
+    sock.settimeout(timeout)
+    data = b""
+    while True:
+        try:
+            chunk = sock.recv(65536)
+        except socket.timeout:
+            break
+        if not chunk:
+            break
+        data += chunk
+        try:
+            json.loads(data)
+            break
+        except ValueError:
+            continue
+    return data
+
+def send_buffers(sock: socket.socket, buffers) -> None:
+    """sendall() for a message given as a list of buffers, gathered by sendmsg instead of joined first"""
+    if not isinstance(buffers, list):
+        sock.sendall(buffers)
+        return
+    if not hasattr(sock, 'sendmsg'):
+        # Windows has no sendmsg
+        for buffer in buffers:
+            sock.sendall(buffer)
+        return
+    pending = [memoryview(buffer) for buffer in buffers if len(buffer)]
+    i = 0
+    while i < len(pending):
+        # Stay below IOV_MAX; a short write resumes inside the buffer it stopped in
+        sent = sock.sendmsg(pending[i:i + 512])
+        while sent and sent >= len(pending[i]):
+            sent -= len(pending[i])
+            i += 1
+        if sent:
+            pending[i] = pending[i][sent:]
+
+class TCPTransport:
+    """How a node reaches its peers: one TCP connection per message.
+
+    Anything with the same request/send methods can stand in for it, e.g. the
+    in-process network of the simulator.
+    """
+
+    def __init__(self, blockchain: 'Blockchain'):
+        self.blockchain = blockchain
+
+    def request(self, peer: str, payload: bytes, timeout: float = 10) -> bytes:
+        sock = socket.create_connection(self.blockchain.peer_address(peer), timeout=timeout)
+        try:
+            sock.sendall(payload)
+            return read_message(sock, timeout)
+        finally:
+            sock.close()
+
+    def send(self, peer: str, payload: bytes, timeout: float = 5) -> None:
+        sock = socket.create_connection(self.blockchain.peer_address(peer), timeout=timeout)
+        try:
+            sock.sendall(payload)
+        finally:
+            sock.close()
+
+class EventBus:
+    """In-process publish/subscribe for node events.
+
+    Handlers run on the publishing thread (network, mining or sync), so they
+    should only hand the event off, e.g. put it on a queue.
+    """
+    EVENTS = ('block_appended', 'tx_received', 'reorg', 'peer_joined', 'peer_left', 'sync_progress')
+
     def __init__(self):
-        self.chain = [self.create_genesis_block()]
-        self.difficulty = 5 
+        self.subscribers = {}
+        self.lock = threading.Lock()
+        self.next_token = 0
+
+    def subscribe(self, handler: Callable[[str, dict], None], events=None) -> int:
+        with self.lock:
+            self.next_token += 1
+            self.subscribers[self.next_token] = (handler, set(events) if events else None)
+            return self.next_token
+
+    def unsubscribe(self, token: int) -> None:
+        with self.lock:
+            self.subscribers.pop(token, None)
+
+    def publish(self, event: str, data: dict) -> None:
+        if not self.subscribers:
+            return
+        with self.lock:
+            subscribers = list(self.subscribers.values())
+        for handler, events in subscribers:
+            if events is None or event in events:
+                try:
+                    handler(event, data)
+                except Exception:
+                    pass
+
+class Blockchain:
+    def __init__(self, start_network: bool = True, prune_depth: int = None, server_port: int = 8888,
+                 discover: bool = True, data_dir: str = None):
+        self.data_dir = data_dir or '.'
+        if data_dir:
+            os.makedirs(data_dir, exist_ok=True)
+        # Single-file format of older versions, migrated to the store on first start
+        self.data_file = os.path.join(self.data_dir, 'blockchain_data.json')
+        self.store = ChainStore(self.data_dir)
+        # sync_lock serializes decisions about the chain (syncs, received blocks) and is held across
+        # network calls; chain_lock, mempool_lock and users_lock are only held briefly to change or copy
+        # the chain, the pending transactions and the user registry. Take them in that order; slow work
+        # (mining, disk writes, serving peers) runs on copies outside them.
+        self.sync_lock = threading.RLock()
+        self.chain_lock = threading.RLock()
+        self.mempool_lock = threading.RLock()
+        self.users_lock = threading.RLock()
+        self.save_lock = threading.Lock()
+        self.save_generation = 0
+        self.saved_generation = 0
+        self.persister = Persister(self.save_data)
+        self.events = EventBus()
+        self.metrics = NodeMetrics(self)
+        self.tx_store = TransactionStore()
+        self.balances = {}
+        self.base_balances = {}
+        self.snapshot_interval = 1000
+        self.snapshot_file = os.path.join(self.data_dir, 'blockchain_snapshot.json')
+        self.latest_snapshot = None
+        # (tip block dict, balances, users) copied when a snapshot height is reached, written by the next save
+        self.due_snapshot = None
+        self.prune_depth = prune_depth
+        self.pruned_height = 0
+        self.replace_chain([self.create_genesis_block()])
+        self.target_block_time = 60
+        self.retarget_interval = 10
+        self.min_difficulty = 3
+        self.max_difficulty = 8
         self.pending_transactions = []
         self.mining_reward = 2
         self.users = {}
         self.username_to_id = {}  
         self.id_to_username = {}  
+        # Usernames in the order this node learned them; a peer's position in it is how far it has synced
+        self.user_order = []
+        # Per peer: (position, username there) reached in that peer's user_order
+        self.user_cursors = {}
+        self.user_batch_size = 1000
         self.current_user = None
         self.peers = set()
-        self.server_port = 8888
+        self.server_port = server_port
+        # Peers are "ip" (listening on default_peer_port) or "ip:port"
+        self.default_peer_port = 8888
+        self.server_socket = None
+        self.transport = TCPTransport(self)
         self.my_ip = self.get_local_ip()
-        self.sync_lock = threading.Lock()
+        self.block_pool = {}
+        self.max_pool_size = 256
+        self.syncing = False
+        self.last_sync = None
+        self.auto_miner = None
         
         colored_print(f"📡 Node IP: {self.my_ip}", Colors.OKCYAN)
         
         self.load_data()
 
+        # Offline tools (export/import) work on the local files only
+        if not start_network:
+            return
+
         if not self.is_chain_valid():
             colored_print("⚠️  Local chain validation failed on startup!", Colors.FAIL)
             threading.Thread(target=self.delayed_recovery, daemon=True).start()
 
         self.start_network_server()
         
-        threading.Thread(target=self.auto_discover_and_sync, daemon=True).start()
+        if discover:
+            threading.Thread(target=self.auto_discover_and_sync, daemon=True).start()
     
     def get_local_ip(self) -> str:
         try:
@@ -163,7 +747,7 @@ class Blockchain:
         if not network_ranges:
             return peers
         
-        colored_print("🔍 Scanning network for blockchain nodes...", Colors.OKCYAN)
+        colored_print("🔍 Scanning network for blockchain nodes...", Colors.OKCYAN, component='node.net')
         
         def check_peer(ip_str):
             if ip_str == self.my_ip:
@@ -172,14 +756,14 @@ class Blockchain:
             try:
                 sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
                 sock.settimeout(0.5)  
-                result = sock.connect_ex((ip_str, self.server_port))
+                result = sock.connect_ex((ip_str, self.default_peer_port))
                 if result == 0:
-                    message = {"type": "ping", "data": "discovery"}
+                    message = {"type": "ping", "port": self.server_port, "data": "discovery"}
                     sock.send(json.dumps(message).encode())
                     response = sock.recv(1024).decode()
                     if "pong" in response:
                         peers.add(ip_str)
-                        colored_print(f"✅ Found peer: {ip_str}", Colors.OKGREEN)
+                        colored_print(f"✅ Found peer: {ip_str}", Colors.OKGREEN, component='node.net')
                 sock.close()
             except:
                 pass
@@ -211,7 +795,7 @@ class Blockchain:
         for thread in threads:
             thread.join()
         
-        colored_print(f"📊 Scanned {total_ips_to_scan} IP addresses", Colors.OKBLUE)
+        colored_print(f"📊 Scanned {total_ips_to_scan} IP addresses", Colors.OKBLUE, component='node.net')
         return peers
     
     def auto_discover_and_sync(self):
@@ -219,152 +803,472 @@ class Blockchain:
         
         discovered_peers = self.scan_for_peers()
         for peer in discovered_peers:
-            self.peers.add(peer)
+            self.add_peer(peer)
         
         if self.peers:
-            colored_print(f"🌐 Discovered {len(self.peers)} peers: {list(self.peers)}", Colors.OKGREEN)
+            colored_print(f"🌐 Discovered {len(self.peers)} peers: {list(self.peers)}", Colors.OKGREEN, component='node.net')
             self.sync_with_network()
         else:
-            colored_print("⚠️  No peers found on the network.", Colors.WARNING)
+            colored_print("⚠️  No peers found on the network.", Colors.WARNING, component='node.net')
     
     def sync_with_network(self):
         """Synchronize with all network peers"""
-        colored_print("🔄 SYNCHRONIZING WITH NETWORK", Colors.HEADER)
+        colored_print("🔄 SYNCHRONIZING WITH NETWORK", Colors.HEADER, component='node.sync')
         
         with self.sync_lock:
-            self.sync_user_lists()
-            self.sync_blockchain_data()
-            colored_print("✅ Network synchronization completed!", Colors.OKGREEN)
+            self.syncing = True
+            self.events.publish('sync_progress', {"stage": "started", "height": len(self.chain), "peers": len(self.peers)})
+            start = time.perf_counter()
+            try:
+                self.sync_user_lists()
+                self.sync_blockchain_data()
+            finally:
+                self.syncing = False
+            self.metrics.sync_seconds.observe(time.perf_counter() - start)
+            self.last_sync = time.time()
+            self.events.publish('sync_progress', {"stage": "finished", "height": len(self.chain), "peers": len(self.peers)})
+            colored_print("✅ Network synchronization completed!", Colors.OKGREEN, component='node.sync')
     
     def sync_user_lists(self):
-        """Sync user lists with all peers"""
-        colored_print("👥 Syncing user lists...", Colors.OKBLUE)
+        """Fetch the users each peer added since the last sync with it, in batches"""
+        colored_print("👥 Syncing user lists...", Colors.OKBLUE, component='node.sync')
         
         for peer_ip in self.peers.copy():
             try:
-                message = {"type": "request_users", "data": {}}
-                response = self.send_message_with_response(peer_ip, message)
-                
-                if response and response.get('type') == 'users_response':
-                    peer_users = response.get('data', {})
-                    
-                    for username, user_data in peer_users.items():
-                        if username not in self.users:
-                            user = User(username, "")
-                            user.user_id = user_data.get('user_id', generate_user_id())
-                            user.password_hash = user_data['password_hash']
-                            user.balance = user_data['balance']
-                            self.users[username] = user
-                            self.username_to_id[username] = user.user_id
-                            self.id_to_username[user.user_id] = username
-                            colored_print(f"➕ Added user from peer: {username} (ID: {user.user_id})", Colors.OKGREEN)
+                added = self.sync_users_from_peer(peer_ip)
+                if added:
+                    colored_print(f"➕ Added {added} users from {peer_ip}", Colors.OKGREEN, component='node.sync')
+                    self.request_save()
             except Exception as e:
-                colored_print(f"❌ Failed to sync users with {peer_ip}: {e}", Colors.FAIL)
-                self.peers.discard(peer_ip)
+                colored_print(f"❌ Failed to sync users with {peer_ip}: {e}", Colors.FAIL, component='node.sync')
+                self.remove_peer(peer_ip)
+    
+    def sync_users_from_peer(self, peer_ip: str) -> int:
+        position, after = self.user_cursors.get(peer_ip, (0, None))
+        added = 0
+        while True:
+            message = {"type": "request_users", "data": {"since": position, "after": after, "limit": self.user_batch_size}}
+            response = self.send_message_with_response(peer_ip, message)
+            if not response or response.get('type') != 'users_response':
+                return added
+            data = response.get('data', {})
+            
+            if not isinstance(data.get('users'), list):
+                # An older node sends its whole registry as {username: user}
+                return added + sum(self.add_user_if_missing(username, user_data) is not None
+                                   for username, user_data in data.items())
+            
+            # The peer starts over from 0 if its registry no longer matches our position in it
+            entries = data['users']
+            for user_data in entries:
+                if self.add_user_if_missing(user_data['username'], user_data) is not None:
+                    added += 1
+            position = data['from'] + len(entries)
+            if entries:
+                after = entries[-1]['username']
+            self.user_cursors[peer_ip] = (position, after)
+            if not entries or position >= data['version']:
+                return added
     
     def sync_blockchain_data(self):
-        colored_print("⛓️  Syncing blockchain data...", Colors.OKBLUE)
+        colored_print("⛓️  Syncing blockchain data...", Colors.OKBLUE, component='node.sync')
+        with tracer.span('sync_blockchain_data', peers=len(self.peers)):
+            self.sync_chain_from_peers()
+    
+    def sync_chain_from_peers(self):
         
         if not self.is_valid_chain(self.chain):
-            colored_print("⚠️  Local chain is invalid! Attempting recovery...", Colors.WARNING)
+            colored_print("⚠️  Local chain is invalid! Attempting recovery...", Colors.WARNING, component='node.sync')
             if self.recover_from_invalid_chain():
                 return 
         
-        valid_chains = [(len(self.chain), self.chain, "local")]
+        valid_chains = [(self.chain_work(self.chain), self.chain, "local")]
         
         for peer_ip in self.peers.copy():
-            try:
-                message = {"type": "request_blockchain", "data": {}}
-                response = self.send_message_with_response(peer_ip, message)
+            with tracer.span('sync_blockchain_data.peer', peer=peer_ip):
+                if self.sync_blocks_from_peer(peer_ip):
+                    continue
+            
+                try:
+                    message = {"type": "request_blockchain", "data": {}}
+                    response = self.send_message_with_response(peer_ip, message)
                 
-                if response and response.get('type') == 'blockchain_response':
-                    peer_chain_data = response.get('data', [])
-                    peer_chain = self.deserialize_chain(peer_chain_data)
+                    if response and response.get('type') == 'blockchain_response':
+                        peer_chain_data = response.get('data', [])
+                        peer_chain = self.deserialize_chain(peer_chain_data)
                     
-                    if peer_chain and self.is_valid_chain(peer_chain):
-                        valid_chains.append((len(peer_chain), peer_chain, peer_ip))
-                        colored_print(f"✅ Received valid chain from {peer_ip} (length: {len(peer_chain)})", Colors.OKGREEN)
-                    else:
-                        colored_print(f"❌ Invalid chain received from {peer_ip}", Colors.FAIL)
-            except Exception as e:
-                colored_print(f"❌ Failed to sync blockchain with {peer_ip}: {e}", Colors.FAIL)
-                self.peers.discard(peer_ip)
+                        if peer_chain and self.is_valid_chain(peer_chain):
+                            valid_chains.append((self.chain_work(peer_chain), peer_chain, peer_ip))
+                            colored_print(f"✅ Received valid chain from {peer_ip} (length: {len(peer_chain)})", Colors.OKGREEN, component='node.sync')
+                        elif response.get('base'):
+                            colored_print(f"❌ {peer_ip} only holds blocks from #{response['base']} (pruned or snapshot node)", Colors.FAIL, component='node.sync')
+                        else:
+                            colored_print(f"❌ Invalid chain received from {peer_ip}", Colors.FAIL, component='node.sync')
+                except Exception as e:
+                    colored_print(f"❌ Failed to sync blockchain with {peer_ip}: {e}", Colors.FAIL, component='node.sync')
+                    self.remove_peer(peer_ip)
         
         if valid_chains:
+            # The local entry may have grown through incremental syncs
+            valid_chains[0] = (self.chain_work(self.chain), self.chain, "local")
             valid_chains.sort(key=lambda x: x[0], reverse=True)
-            longest_chain_length, longest_chain, source = valid_chains[0]
+            most_work, longest_chain, source = valid_chains[0]
+            longest_chain_length = len(longest_chain)
             
-            if source != "local" and longest_chain_length > len(self.chain):
-                colored_print(f"🔄 Adopting longer chain from {source} (length: {longest_chain_length})", Colors.WARNING)
-                self.chain = longest_chain
-                self.pending_transactions = []
-                self.save_data()
+            if source != "local" and most_work > self.chain_work(self.chain):
+                colored_print(f"🔄 Adopting chain with more work from {source} (length: {longest_chain_length})", Colors.WARNING, component='node.sync')
+                self.replace_chain(longest_chain)
+                self.events.publish('reorg', {
+                    "fork_height": None, "source": source,
+                    "height": len(self.chain), "tip": self.get_latest_block().hash
+                })
+                self.clear_pending_transactions()
+                self.request_save()
             elif source == "local":
-                colored_print(f"✅ Local chain is up to date (length: {longest_chain_length})", Colors.OKGREEN)
+                colored_print(f"✅ Local chain is up to date (length: {longest_chain_length})", Colors.OKGREEN, component='node.sync')
             else:
-                colored_print(f"✅ Local chain is already the longest (length: {len(self.chain)})", Colors.OKGREEN)
+                colored_print(f"✅ Local chain already has the most work (length: {len(self.chain)})", Colors.OKGREEN, component='node.sync')
 
-    def deserialize_chain(self, chain_data: List[dict]) -> List[Block]:
+    def sync_blocks_from_peer(self, peer_ip: str, batch_size: int = 500) -> bool:
+        """Pull only the blocks after our tip.
+
+        Returns False when the peer cannot extend our chain this way (fork, peer
+        pruned or snapshot-based below our height, old peer), so the caller can
+        fall back to a full chain download.
+        """
         try:
-            chain = []
-            for block_data in chain_data:
-                transactions = []
-                for tx_data in block_data['transactions']:
-                    tx = Transaction(
-                        tx_data['sender'],
-                        tx_data['receiver'],
-                        tx_data['amount'],
-                        tx_data['timestamp'],
-                        tx_data.get('tx_type', 'transfer')
-                    )
-                    transactions.append(tx)
+            while True:
+                message = {"type": "request_blocks", "data": {"from": len(self.chain), "limit": batch_size}}
+                response = self.send_message_with_response(peer_ip, message)
+                if not response or response.get('type') != 'blocks_response':
+                    return False
+                
+                data = response.get('data', {})
+                blocks = [Block.from_dict(block_data) for block_data in data.get('blocks', [])]
+                if not blocks:
+                    return data.get('height', 0) <= len(self.chain)
+                
+                if blocks[0].previous_hash != self.get_latest_block().hash:
+                    # The peer is on another branch: find the fork point instead of downloading everything
+                    return self.fetch_branch_from_peer(peer_ip, data.get('height', 0), batch_size)
+                
+                for block in blocks:
+                    if self.add_block(block) not in ('added', 'reorg'):
+                        return False
                 
-                block = Block(
-                    block_data['index'],
-                    transactions,
-                    block_data['previous_hash'],
-                    block_data.get('miner')
-                )
-                block.nonce = block_data['nonce']
-                block.hash = block_data['hash']
-                block.timestamp = block_data['timestamp']
-                chain.append(block)
+                colored_print(f"📥 Received {len(blocks)} new blocks from {peer_ip} (height: {len(self.chain)})", Colors.OKGREEN, component='node.sync')
+                self.events.publish('sync_progress', {"stage": "blocks", "peer": peer_ip, "height": len(self.chain), "target": data.get('height', 0)})
+                self.request_save()
+                
+                if len(self.chain) >= data.get('height', 0):
+                    return True
+        except Exception:
+            return False
+    
+    def fetch_branch_from_peer(self, peer_ip: str, peer_height: int, batch_size: int = 500) -> bool:
+        """Find where the peer's chain forks from ours and feed its branch into the block tree.
+
+        Looks back from our tip in growing steps until the peer's blocks link
+        to a block we hold, then pulls the rest of the branch in batches.
+        """
+        floor = self.reorg_floor() + 1
+        step = 8
+        try:
+            while True:
+                start = max(floor, len(self.chain) - step)
+                message = {"type": "request_blocks", "data": {"from": start, "limit": batch_size}}
+                response = self.send_message_with_response(peer_ip, message)
+                if not response or response.get('type') != 'blocks_response':
+                    return False
+                blocks = [Block.from_dict(block_data) for block_data in response['data'].get('blocks', [])]
+                if not blocks:
+                    return False
+                if blocks[0].previous_hash == self.chain[start - 1].hash:
+                    break
+                if start == floor:
+                    colored_print(f"⚠️  Fork with {peer_ip} is deeper than this node can roll back", Colors.WARNING, component='node.sync')
+                    return False
+                step *= 8
+            
+            colored_print(f"🌿 Chain from {peer_ip} forks at block #{start - 1}", Colors.OKCYAN, component='node.sync')
+            while blocks:
+                for block in blocks:
+                    if self.add_block(block) == 'invalid':
+                        return False
+                last_index = blocks[-1].index
+                self.events.publish('sync_progress', {"stage": "branch", "peer": peer_ip, "height": last_index + 1, "target": peer_height})
+                if last_index + 1 >= peer_height:
+                    break
+                message = {"type": "request_blocks", "data": {"from": last_index + 1, "limit": batch_size}}
+                response = self.send_message_with_response(peer_ip, message)
+                blocks = [Block.from_dict(block_data) for block_data in response['data'].get('blocks', [])]
+            
+            self.request_save()
+            return True
+        except Exception:
+            return False
+    
+    def is_block_known(self, block: Block) -> bool:
+        if block.hash in self.block_pool:
+            return True
+        return (self.chain.base <= block.index < len(self.chain) and
+                self.chain[block.index].hash == block.hash)
+    
+    def add_block(self, block: Block) -> str:
+        """Place a block received from the network in the block tree.
+
+        Returns 'added' (extends our tip), 'reorg' (we switched branches),
+        'side' (kept on a side chain), 'orphan' (parent unknown, kept in the
+        pool), 'known' or 'invalid'.
+        """
+        with self.sync_lock:
+            if self.is_block_known(block):
+                return 'known'
+            if not block.has_valid_hash():
+                return 'invalid'
+            
+            self.block_pool[block.hash] = block
+            self.trim_block_pool()
+            
+            branch = self.branch_to_main_chain(block)
+            if branch is None:
+                return 'orphan'
+            # Later blocks may already be waiting in the pool for this one
+            branch = branch[:-1] + self.best_descendants(block)
+            
+            if not self.is_better_branch(branch):
+                return 'side'
             
-            return chain
+            rolled_back = self.reorganize(branch)
+            if rolled_back is None:
+                return 'invalid'
+            return 'reorg' if rolled_back else 'added'
+    
+    def branch_to_main_chain(self, block: Block) -> Optional[List[Block]]:
+        """Pool blocks from the fork point up to `block`, or None if it does not connect yet"""
+        branch = [block]
+        while True:
+            first = branch[0]
+            parent_height = first.index - 1
+            if parent_height < self.chain.base:
+                return None
+            if parent_height < len(self.chain) and self.chain[parent_height].hash == first.previous_hash:
+                return branch
+            parent = self.block_pool.get(first.previous_hash)
+            if parent is None or parent.index != parent_height:
+                return None
+            branch.insert(0, parent)
+    
+    def best_descendants(self, block: Block) -> List[Block]:
+        """The longest run of pool blocks building on `block`, starting with it"""
+        best = [block]
+        for child in self.block_pool.values():
+            if child.previous_hash == block.hash and child.index == block.index + 1:
+                candidate = [block] + self.best_descendants(child)
+                if len(candidate) > len(best):
+                    best = candidate
+        return best
+    
+    def is_better_branch(self, branch: List[Block]) -> bool:
+        """Heaviest chain wins; on equal work we keep the branch we saw first"""
+        fork_height = branch[0].index - 1
+        current_work = sum(block.work() for block in self.chain[fork_height + 1:])
+        return sum(block.work() for block in branch) > current_work
+    
+    def reorg_floor(self) -> int:
+        """Lowest height a fork may branch from: blocks above it must still have their bodies"""
+        return max(self.chain.base, self.pruned_height - 1)
+    
+    def reorganize(self, branch: List[Block]) -> Optional[List[Block]]:
+        """Switch the tip to `branch`, rolling back only the blocks that differ.
+
+        Returns the blocks that were rolled back, or None if the branch is invalid.
+        """
+        fork_height = branch[0].index - 1
+        if fork_height < self.reorg_floor():
+            return None
+        
+        def lookup(height: int) -> Block:
+            return branch[height - fork_height - 1] if height > fork_height else self.chain[height]
+        
+        previous = self.chain[fork_height]
+        start = time.perf_counter()
+        for i, block in enumerate(branch):
+            if not self.is_valid_next_block(block, previous, lookup):
+                for bad in branch[i:]:
+                    self.block_pool.pop(bad.hash, None)
+                return None
+            previous = block
+        self.metrics.validation_seconds.observe(time.perf_counter() - start, kind='branch')
+        
+        rolled_back = []
+        # Readers see the old branch or the new one, never a chain cut back to the fork; the mempool
+        # changes with it, or a miner could take the new tip with the transactions it confirms still pending
+        with self.chain_lock:
+            while len(self.chain) - 1 > fork_height:
+                rolled_back.append(self.disconnect_tip())
+            rolled_back.reverse()
+            
+            for block in branch:
+                self.block_pool.pop(block.hash, None)
+                self.append_block(block)
+            
+            new_hashes = set()
+            for block in branch:
+                new_hashes.update(tx.hash for tx in block.transactions)
+            
+            # Transfers that only the abandoned branch confirmed go back to the mempool
+            with self.mempool_lock:
+                pending = [tx for tx in self.pending_transactions if tx.hash not in new_hashes]
+                pending_hashes = {tx.hash for tx in pending}
+                returned = []
+                for block in rolled_back:
+                    self.block_pool[block.hash] = block
+                    for tx in block.transactions:
+                        if tx.tx_type != "mining_reward" and tx.hash not in new_hashes and tx.hash not in pending_hashes:
+                            returned.append(tx)
+                            pending_hashes.add(tx.hash)
+                self.pending_transactions = pending + returned
+                self.journal_pending(returned)
+        self.trim_block_pool()
+        
+        if rolled_back:
+            self.events.publish('reorg', {
+                "fork_height": fork_height, "rolled_back": [block.hash for block in rolled_back],
+                "height": len(self.chain), "tip": self.get_latest_block().hash
+            })
+            colored_print(f"🔀 Reorganized: rolled back {len(rolled_back)} blocks, applied {len(branch)} from block #{fork_height + 1}", Colors.WARNING, component='node.chain')
+        if returned:
+            # Peers on the new branch may never have seen these; let whoever mines next pick them up
+            self.broadcast_transactions(returned)
+        return rolled_back
+    
+    def disconnect_tip(self) -> Block:
+        with self.chain_lock:
+            block = self.chain.pop()
+            view = block.transactions
+            if isinstance(view, TransactionView):
+                self.tx_store.apply_flows(view, self.balances, sign=-1)
+                self.chain_index.remove_block(block, self.tx_store)
+                block.transactions = list(view)
+                self.tx_store.truncate(view.start)
+        return block
+    
+    def trim_block_pool(self):
+        floor = self.reorg_floor()
+        for block_hash in [h for h, b in self.block_pool.items() if b.index <= floor]:
+            del self.block_pool[block_hash]
+        while len(self.block_pool) > self.max_pool_size:
+            # Oldest first: dicts keep insertion order
+            del self.block_pool[next(iter(self.block_pool))]
+    
+    def deserialize_chain(self, chain_data: List[dict]) -> List[Block]:
+        try:
+            with tracer.span('deserialize_chain', blocks=len(chain_data)):
+                return [Block.from_dict(block_data) for block_data in chain_data]
         except Exception as e:
-            colored_print(f"❌ Error deserializing chain: {e}", Colors.FAIL)
+            colored_print(f"❌ Error deserializing chain: {e}", Colors.FAIL, component='node.storage')
             return None
     
     def is_valid_chain(self, chain: List[Block]) -> bool:
         if not chain or len(chain) == 0:
             return False
         
-        if chain[0].index != 0 or chain[0].previous_hash != "0":
+        # A snapshot-based chain starts at its trusted anchor block
+        first = chain.base if isinstance(chain, Chain) else 0
+        if first == 0 and (chain[0].index != 0 or chain[0].previous_hash != "0"):
             return False
         
-        for i in range(1, len(chain)):
-            current_block = chain[i]
-            previous_block = chain[i-1]
-            
-            if current_block.hash != current_block.calculate_hash():
-                return False
-            
-            if current_block.previous_hash != previous_block.hash:
+        start = time.perf_counter()
+        try:
+            with tracer.span('is_valid_chain', blocks=len(chain) - first):
+                for i in range(first + 1, len(chain)):
+                    if not self.is_valid_next_block(chain[i], chain[i-1], chain.__getitem__):
+                        return False
+        finally:
+            self.metrics.validation_seconds.observe(time.perf_counter() - start, kind='chain')
+        
+        return True
+    
+    def is_valid_next_block(self, current_block: Block, previous_block: Block,
+                            lookup: Callable[[int], Block] = None) -> bool:
+        """`lookup` returns the block at a height on the same branch, for the retarget window"""
+        if not current_block.has_valid_hash():
+            return False
+        
+        if not self.has_valid_difficulty(current_block, previous_block, lookup):
+            return False
+        
+        if current_block.previous_hash != previous_block.hash:
+            return False
+        
+        if current_block.index != previous_block.index + 1:
+            return False
+        
+        return True
+    
+    def has_valid_difficulty(self, current_block: Block, previous_block: Block,
+                             lookup: Callable[[int], Block] = None) -> bool:
+        if current_block.difficulty is None:
+            # Legacy blocks can only extend a legacy chain
+            if previous_block.difficulty is not None:
                 return False
-            
-            if current_block.index != previous_block.index + 1:
+        else:
+            expected = self.next_difficulty(previous_block, lookup)
+            if expected is None:
+                # Retarget window is below our snapshot; only the step size can be checked
+                if abs(current_block.difficulty - previous_block.mining_difficulty()) > 1:
+                    return False
+            elif current_block.difficulty != expected:
                 return False
         
-        return True
+        if current_block.timestamp > time.time() + 2 * 60 * 60:
+            return False
+        
+        return current_block.meets_difficulty()
+    
+    def next_difficulty(self, parent: Block, lookup: Callable[[int], Block] = None) -> Optional[int]:
+        """Difficulty the block after `parent` must be mined at.
+
+        Every `retarget_interval` blocks the time taken by the previous window is
+        compared with `target_block_time`; each step is one hex digit (16x work),
+        so it only moves when blocks came more than 4x too fast or too slow.
+        """
+        difficulty = parent.mining_difficulty()
+        height = parent.index + 1
+        if height % self.retarget_interval:
+            return max(self.min_difficulty, min(self.max_difficulty, difficulty))
+        
+        try:
+            first = (lookup or self.chain.__getitem__)(height - self.retarget_interval)
+        except IndexError:
+            return None
+        
+        elapsed = parent.timestamp - first.timestamp
+        expected = self.target_block_time * (self.retarget_interval - 1)
+        if elapsed * 4 < expected:
+            difficulty += 1
+        elif elapsed > expected * 4:
+            difficulty -= 1
+        return max(self.min_difficulty, min(self.max_difficulty, difficulty))
+    
+    @property
+    def difficulty(self) -> int:
+        """Difficulty the next block on our tip will be mined at"""
+        tip = self.get_latest_block()
+        return self.next_difficulty(tip) or tip.mining_difficulty()
+    
+    def chain_work(self, chain: List[Block]) -> int:
+        return sum(block.work() for block in chain)
     
     def recover_from_invalid_chain(self):
-        colored_print("⚠️  WARNING: Local chain is invalid!", Colors.FAIL)
-        colored_print("🔍 Searching network for valid chains to recover...", Colors.WARNING)
+        colored_print("⚠️  WARNING: Local chain is invalid!", Colors.FAIL, component='node.sync')
+        colored_print("🔍 Searching network for valid chains to recover...", Colors.WARNING, component='node.sync')
 
         if not self.peers:
-            colored_print("❌ No peers available for recovery. Resetting to genesis block.", Colors.FAIL)
-            self.chain = [self.create_genesis_block()]
-            self.pending_transactions = []
+            colored_print("❌ No peers available for recovery. Resetting to genesis block.", Colors.FAIL, component='node.sync')
+            self.replace_chain([self.create_genesis_block()])
+            self.clear_pending_transactions()
             self.save_data()
             return False
 
@@ -380,60 +1284,53 @@ class Blockchain:
                     peer_chain = self.deserialize_chain(peer_chain_data)
 
                     if peer_chain and self.is_valid_chain(peer_chain):
-                        valid_chains.append((len(peer_chain), peer_chain, peer_ip))
-                        colored_print(f"✅ Found valid chain from {peer_ip} (length: {len(peer_chain)})", Colors.OKGREEN)
+                        valid_chains.append((self.chain_work(peer_chain), peer_chain, peer_ip))
+                        colored_print(f"✅ Found valid chain from {peer_ip} (length: {len(peer_chain)})", Colors.OKGREEN, component='node.sync')
+                    elif response.get('base'):
+                        colored_print(f"❌ {peer_ip} only holds blocks from #{response['base']} (pruned or snapshot node)", Colors.FAIL, component='node.sync')
                     else:
-                        colored_print(f"❌ Invalid chain from {peer_ip}", Colors.FAIL)
+                        colored_print(f"❌ Invalid chain from {peer_ip}", Colors.FAIL, component='node.sync')
             except Exception as e:
-                colored_print(f"❌ Failed to get chain from {peer_ip}: {e}", Colors.FAIL)
-                self.peers.discard(peer_ip)
+                colored_print(f"❌ Failed to get chain from {peer_ip}: {e}", Colors.FAIL, component='node.sync')
+                self.remove_peer(peer_ip)
 
         if valid_chains:
             valid_chains.sort(key=lambda x: x[0], reverse=True)
-            longest_chain_length, longest_chain, source = valid_chains[0]
+            most_work, longest_chain, source = valid_chains[0]
+            longest_chain_length = len(longest_chain)
 
-            colored_print(f"🔄 RECOVERING: Adopting valid chain from {source} (length: {longest_chain_length})", Colors.OKGREEN)
-            self.chain = longest_chain
-            self.pending_transactions = []
+            colored_print(f"🔄 RECOVERING: Adopting valid chain from {source} (length: {longest_chain_length})", Colors.OKGREEN, component='node.sync')
+            self.replace_chain(longest_chain)
+            self.clear_pending_transactions()
             self.save_data()
 
-            colored_print("✅ Chain recovered successfully!", Colors.OKGREEN)
+            colored_print("✅ Chain recovered successfully!", Colors.OKGREEN, component='node.sync')
             return True
         else:
-            colored_print("❌ No valid chains found in network. Resetting to genesis block.", Colors.FAIL)
-            self.chain = [self.create_genesis_block()]
-            self.pending_transactions = []
+            colored_print("❌ No valid chains found in network. Resetting to genesis block.", Colors.FAIL, component='node.sync')
+            self.replace_chain([self.create_genesis_block()])
+            self.clear_pending_transactions()
             self.save_data()
             return False
         
     def delayed_recovery(self):
         time.sleep(3) 
-        self.recover_from_invalid_chain()
+        with self.sync_lock:
+            self.recover_from_invalid_chain()
     
     def send_message_with_response(self, peer_ip: str, message: dict, timeout: int = 10) -> dict:
+        start = time.perf_counter()
         try:
-            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            sock.settimeout(timeout)
-            sock.connect((peer_ip, self.server_port))
-            sock.send(json.dumps(message).encode())
-
-            response_data = b""
-            while True:
-                chunk = sock.recv(65536)  
-                if not chunk:
-                    break
-                response_data += chunk
-                try:
-                    json.loads(response_data.decode())
-                    break  
-                except json.JSONDecodeError:
-                    continue  
-                
-            sock.close()
-
-            return json.loads(response_data.decode())
+            with tracer.span(f"request.{message.get('type')}", peer=peer_ip):
+                payload = json.dumps(dict(message, port=self.server_port)).encode()
+                data = self.transport.request(peer_ip, payload, timeout)
+                with tracer.span('json.loads', bytes=len(data)):
+                    response = json.loads(data)
         except Exception as e:
+            self.metrics.rpc_failures.inc(peer=peer_ip, method='request')
             raise Exception(f"Communication error: {e}")
+        self.metrics.rpc_seconds.observe(time.perf_counter() - start, peer=peer_ip, method='request')
+        return response
     
     def create_genesis_block(self) -> Block:
         return Block(0, [], "0")
@@ -441,17 +1338,144 @@ class Blockchain:
     def get_latest_block(self) -> Block:
         return self.chain[-1]
     
-    def create_user(self, username: str, password: str) -> bool:
-        if username in self.users:
-            return False
+    def append_block(self, block: Block):
+        with self.chain_lock:
+            self.store.log(b'{"op": "block", "block": ' + block.serialize() + b'}', sync=True)
+            self.tx_store.compact(block)
+            self.chain.append(block)
+            self.chain_index.add_block(block, self.tx_store)
+            self.tx_store.apply_flows(block.transactions, self.balances)
+            if self.snapshot_interval and block.index % self.snapshot_interval == 0:
+                # Callers may hold chain_lock for a whole reorg or import, so only the copy is taken here
+                self.due_snapshot = (block.to_dict(), dict(self.balances), self.users_snapshot())
+        self.events.publish('block_appended', {
+            "height": block.index, "hash": block.hash, "miner": block.miner,
+            "transactions": len(block.transactions), "timestamp": block.timestamp
+        })
+        
+        if self.due_snapshot is not None:
+            self.request_save()
+        with self.chain_lock:
+            self.prune()
+    
+    def replace_chain(self, chain: List[Block], base_balances: Dict[str, float] = None):
+        if not isinstance(chain, Chain):
+            chain = Chain(chain)
+        
+        # Index the new chain on the side, then swap everything in at once
+        tx_store = TransactionStore()
+        chain_index = ChainIndex()
+        balances = dict(base_balances or {})
+        for i, block in enumerate(chain):
+            tx_store.compact(block)
+            chain_index.add_block(block, tx_store)
+            # The anchor of a snapshot-based chain is already part of base_balances
+            if i > 0 or chain.base == 0:
+                tx_store.apply_flows(block.transactions, balances)
+        
+        with self.chain_lock:
+            # Blocks of the old chain keep their views into the old store
+            self.tx_store = tx_store
+            self.chain_index = chain_index
+            self.base_balances = dict(base_balances or {})
+            self.balances = balances
+            self.chain = chain
+            
+            self.pruned_height = chain.base
+            while self.pruned_height < len(chain) and chain[self.pruned_height].pruned:
+                self.pruned_height += 1
+            self.prune()
+    
+    def prune(self):
+        """Drop transaction bodies deeper than prune_depth.
+
+        Their effect on balances moves into base_balances, which is persisted
+        next to the chain, so the node can restart without them.
+        """
+        if not self.prune_depth:
+            return
         
-        user = User(username, password)
-        self.users[username] = user
-        self.username_to_id[username] = user.user_id
-        self.id_to_username[user.user_id] = username
-        self.save_data()
+        cutoff = len(self.chain) - self.prune_depth
+        if cutoff <= self.pruned_height:
+            return
         
-        self.broadcast_user_update()
+        for height in range(max(self.pruned_height, self.chain.base), cutoff):
+            block = self.chain[height]
+            if block.pruned:
+                continue
+            # A snapshot anchor's transactions are already in base_balances
+            if height > self.chain.base:
+                self.tx_store.apply_flows(block.transactions, self.base_balances)
+            self.chain_index.forget_transactions(block, self.tx_store)
+            block.prune()
+        self.pruned_height = cutoff
+        self.chain_index.trim_history(cutoff)
+        
+        first_kept = self.chain[cutoff].transactions
+        if isinstance(first_kept, TransactionView):
+            self.tx_store.drop_before(first_kept.start)
+    
+    def remove_confirmed_transactions(self, block: Block):
+        if not self.pending_transactions:
+            return
+        confirmed = {tx.hash for tx in block.transactions}
+        with self.mempool_lock:
+            self.pending_transactions = [tx for tx in self.pending_transactions if tx.hash not in confirmed]
+    
+    def clear_pending_transactions(self):
+        with self.mempool_lock:
+            self.pending_transactions = []
+            self.store.log(b'{"op": "clear_pending"}', sync=True)
+    
+    def journal_pending(self, transactions: List[Transaction]):
+        """Record mempool additions; call with mempool_lock held"""
+        if transactions:
+            self.store.log(b'{"op": "pending", "transactions": [' + b', '.join(tx.serialize() for tx in transactions) + b']}')
+    
+    def pending_snapshot(self) -> List[Transaction]:
+        """A copy of the mempool that stays consistent while other threads change it"""
+        with self.mempool_lock:
+            return list(self.pending_transactions)
+    
+    def users_snapshot(self) -> Dict[str, User]:
+        """A copy of the user registry, safe to iterate while users are added"""
+        with self.users_lock:
+            return dict(self.users)
+    
+    def add_user_from_data(self, username: str, user_data: dict) -> User:
+        user = User.from_dict(user_data, username)
+        with self.users_lock:
+            if username not in self.users:
+                self.user_order.append(username)
+            self.users[username] = user
+            self.username_to_id[username] = user.user_id
+            self.id_to_username[user.user_id] = username
+            self.journal_user(user)
+        return user
+    
+    def add_user_if_missing(self, username: str, user_data: dict) -> Optional[User]:
+        """Add a user received from a peer; returns None if the name is already taken"""
+        with self.users_lock:
+            if username in self.users:
+                return None
+            return self.add_user_from_data(username, user_data)
+    
+    def journal_user(self, user: User):
+        self.store.log(json.dumps({"op": "user", "username": user.username, "data": user.to_dict()}).encode())
+    
+    def create_user(self, username: str, password: str) -> bool:
+        user = User(username, password)
+        with self.users_lock:
+            if username in self.users:
+                return False
+            self.user_order.append(username)
+            self.users[username] = user
+            self.username_to_id[username] = user.user_id
+            self.id_to_username[user.user_id] = username
+            self.journal_user(user)
+        self.request_save()
+        
+        self.broadcast_user_update(user)
         return True
     
     def login(self, username: str, password: str) -> bool:
@@ -475,14 +1499,7 @@ class Blockchain:
         if not user_id:
             return balance
         
-        for block in self.chain:
-            for transaction in block.transactions:
-                if transaction.sender == user_id:
-                    balance -= transaction.amount
-                if transaction.receiver == user_id:
-                    balance += transaction.amount
-        
-        return balance
+        return balance + self.balances.get(user_id, 0)
     
     def create_transaction(self, sender: str, receiver: str, amount: float) -> bool:
         if sender not in self.users or receiver not in self.users:
@@ -496,23 +1513,88 @@ class Blockchain:
         receiver_id = self.username_to_id[receiver]
         
         transaction = Transaction(sender_id, receiver_id, amount)
-        self.pending_transactions.append(transaction)
+        with self.mempool_lock:
+            self.pending_transactions.append(transaction)
+            self.journal_pending([transaction])
         
+        self.publish_transactions([transaction])
         self.broadcast_transaction(transaction)
-        self.save_data()
+        self.request_save()
         return True
     
-    def mine_pending_transactions(self, miner: str) -> bool:
+    def create_transactions(self, transfers: List[tuple]) -> List[Optional[Transaction]]:
+        """Create many (sender, receiver, amount) transfers at once.
+
+        All transfers are checked against one balance view that is debited as
+        the batch goes, then the mempool is saved once and the batch goes out
+        as a single message per peer. Returns the created transaction, or None
+        for a rejected transfer, in input order.
+        """
+        available = {}
+        results = []
+        created = []
+        for sender, receiver, amount in transfers:
+            if sender not in self.users or receiver not in self.users or amount <= 0:
+                results.append(None)
+                continue
+            if sender not in available:
+                available[sender] = self.get_balance(sender)
+            if available[sender] < amount:
+                results.append(None)
+                continue
+            available[sender] -= amount
+            
+            transaction = Transaction(self.username_to_id[sender], self.username_to_id[receiver], amount)
+            created.append(transaction)
+            results.append(transaction)
+        
+        if created:
+            with self.mempool_lock:
+                self.pending_transactions.extend(created)
+                self.journal_pending(created)
+            self.publish_transactions(created)
+            self.broadcast_transactions(created)
+            self.request_save()
+        return results
+    
+    def add_pending_transactions(self, transactions: List[Transaction]) -> List[Transaction]:
+        """Add received transactions to the mempool, skipping ones already there or already confirmed"""
+        with self.mempool_lock:
+            known = {tx.hash for tx in self.pending_transactions}
+            added = []
+            for tx in transactions:
+                # The block confirming a transaction can overtake the transaction itself
+                if tx.hash not in known and self.chain_index.find(tx.hash) is None:
+                    known.add(tx.hash)
+                    added.append(tx)
+            self.pending_transactions.extend(added)
+            self.journal_pending(added)
+        self.publish_transactions(added)
+        return added
+    
+    def publish_transactions(self, transactions: List[Transaction]):
+        if not self.events.subscribers:
+            return
+        for tx in transactions:
+            self.events.publish('tx_received', dict(tx.to_dict(), hash=tx.hash))
+    
+    def mine_pending_transactions(self, miner: str) -> Optional[Block]:
+        """Mine the pending transactions that are valid into a block; returns that block, or None"""
         if not self.pending_transactions:
-            return False
+            return None
         
         valid_transactions = []
-        current_balances = {}
         
-        for username in self.users:
-            current_balances[self.username_to_id[username]] = self.get_balance(username)
+        # Balances, tip and mempool as of one moment; the proof of work then runs without any lock
+        with self.chain_lock:
+            tip = self.get_latest_block()
+            difficulty = self.difficulty
+            with self.mempool_lock:
+                pending = list(self.pending_transactions)
+            current_balances = {self.username_to_id[username]: self.get_balance(username)
+                                for username in self.users_snapshot()}
         
-        sorted_transactions = sorted(self.pending_transactions, key=lambda tx: tx.timestamp)
+        sorted_transactions = sorted(pending, key=lambda tx: tx.timestamp)
         
         for tx in sorted_transactions:
             sender_username = self.id_to_username.get(tx.sender)
@@ -527,120 +1609,460 @@ class Blockchain:
                 current_balances[tx.receiver] += tx.amount
             else:
                 if sender_username and receiver_username:
-                    colored_print(f"⚠️  Skipping invalid transaction: {sender_username} -> {receiver_username}: {tx.amount} (insufficient funds)", Colors.WARNING)
+                    colored_print(f"⚠️  Skipping invalid transaction: {sender_username} -> {receiver_username}: {tx.amount} (insufficient funds)", Colors.WARNING, component='node.mining')
         
         if not valid_transactions:
-            colored_print("❌ No valid transactions to mine!", Colors.FAIL)
-            return False
+            colored_print("❌ No valid transactions to mine!", Colors.FAIL, component='node.mining')
+            return None
         
         miner_id = self.username_to_id[miner]
         reward_tx = Transaction("SYSTEM", miner_id, self.mining_reward, tx_type="mining_reward")
         valid_transactions.append(reward_tx)
         
-        colored_print(f"⛏️  Mining {len(valid_transactions)-1} valid transactions + 1 reward transaction...", Colors.OKCYAN)
+        colored_print(f"⛏️  Mining {len(valid_transactions)-1} valid transactions + 1 reward transaction...", Colors.OKCYAN, component='node.mining')
         
         block = Block(
-            len(self.chain),
+            tip.index + 1,
             valid_transactions,
-            self.get_latest_block().hash,
-            miner_id
+            tip.hash,
+            miner_id,
+            difficulty=difficulty
         )
         
-        colored_print(f"🔨 Mining block #{block.index}... Please wait.", Colors.WARNING)
+        colored_print(f"🔨 Mining block #{block.index} at difficulty {difficulty}... Please wait.", Colors.WARNING, component='node.mining')
         start_time = time.time()
-        block.mine_block(self.difficulty)
+        block.mine_block(difficulty)
         end_time = time.time()
+        hashes = block.nonce + 1
+        self.metrics.hashes.inc(hashes)
+        self.metrics.mining_seconds.observe(end_time - start_time)
+        self.metrics.hash_rate.set(hashes / max(end_time - start_time, 1e-9))
         
-        self.chain.append(block)
-        
-        mined_hashes = {tx.hash for tx in valid_transactions if tx.tx_type != "mining_reward"}
-        self.pending_transactions = [
-            tx for tx in self.pending_transactions 
-            if tx.hash not in mined_hashes
-        ]
-        
-        colored_print(f"✅ Block mined successfully in {end_time - start_time:.2f} seconds!", Colors.OKGREEN)
-        colored_print(f"🔗 Block hash: {block.hash[:20]}...", Colors.OKBLUE)
-        colored_print(f"💰 Miner reward: {self.mining_reward} VIL coins", Colors.OKGREEN)
-        colored_print(f"📦 Transactions included: {len(valid_transactions)-1}", Colors.OKBLUE)
-        colored_print(f"⏳ Remaining pending: {len(self.pending_transactions)}", Colors.OKBLUE)
-        
-        self.save_data()
+        with self.sync_lock:
+            if block.previous_hash != self.get_latest_block().hash:
+                # A peer's block arrived while we were mining
+                colored_print(f"⚠️  Chain moved on while mining, block #{block.index} discarded", Colors.WARNING, component='node.mining')
+                return None
+            mined_hashes = {tx.hash for tx in valid_transactions if tx.tx_type != "mining_reward"}
+            # One step for readers, like a reorg: the new tip never comes with its transactions still pending
+            with self.chain_lock:
+                self.append_block(block)
+                with self.mempool_lock:
+                    self.pending_transactions = [
+                        tx for tx in self.pending_transactions 
+                        if tx.hash not in mined_hashes
+                    ]
+            self.metrics.blocks_mined.inc()
+        
+        colored_print(f"✅ Block mined successfully in {end_time - start_time:.2f} seconds!", Colors.OKGREEN, component='node.mining')
+        colored_print(f"🔗 Block hash: {block.hash[:20]}...", Colors.OKBLUE, component='node.mining')
+        colored_print(f"💰 Miner reward: {self.mining_reward} VIL coins", Colors.OKGREEN, component='node.mining')
+        colored_print(f"📦 Transactions included: {len(valid_transactions)-1}", Colors.OKBLUE, component='node.mining')
+        colored_print(f"⏳ Remaining pending: {len(self.pending_transactions)}", Colors.OKBLUE, component='node.mining')
+        
+        self.request_save()
         self.broadcast_block(block)
-        return True
+        return block
+    
+    def start_auto_miner(self, miner: str, max_pending: int = 100, max_wait: float = 10) -> 'AutoMiner':
+        self.stop_auto_miner()
+        self.auto_miner = AutoMiner(self, miner, max_pending, max_wait)
+        self.auto_miner.start()
+        return self.auto_miner
+    
+    def stop_auto_miner(self):
+        if self.auto_miner:
+            self.auto_miner.stop()
+            self.auto_miner = None
+    
+    def find_transaction(self, tx_hash: str):
+        """(block, transaction) for a confirmed transaction, (None, transaction) if pending, or None"""
+        location = self.chain_index.find(tx_hash)
+        if location is not None:
+            height, position = ChainIndex.split(location)
+            block = self.chain[height]
+            return block, block.transactions[position]
+        for tx in self.pending_snapshot():
+            if tx.hash == tx_hash:
+                return None, tx
+        return None
+    
+    def get_user_history(self, username: str, page: int = 0, per_page: int = 20):
+        """A page of (block, transaction) pairs involving the user, newest first, and the total"""
+        user_id = self.username_to_id.get(username, username)
+        locations, total = self.chain_index.history(user_id, page, per_page)
+        entries = []
+        for location in locations:
+            height, position = ChainIndex.split(location)
+            block = self.chain[height]
+            entries.append((block, block.transactions[position]))
+        return entries, total
+    
+    def get_blocks_mined_by(self, username: str, page: int = 0, per_page: int = 20):
+        user_id = self.username_to_id.get(username, username)
+        heights, total = self.chain_index.mined(user_id, page, per_page)
+        return [self.chain[height] for height in heights], total
+    
+    def serialized_blocks(self, start: int, stop: int) -> list:
+        """Canonical bytes of the blocks at heights start..stop-1 held by this node.
+
+        Blocks already checkpointed are sliced straight out of blocks.dat, so
+        serving them neither copies them nor fills each block's serialize()
+        cache. Those slices are only valid inside the store.reading() scope
+        the call was made in. Outside one, blocks not yet checkpointed, or
+        all of them right after a reorg until the next checkpoint, the bytes
+        are serialized from memory.
+        """
+        with self.chain_lock:
+            start = max(start, self.chain.base)
+            stop = min(stop, len(self.chain))
+            if start >= stop:
+                return []
+            # Below pruned_height the file may still hold bodies this node no longer serves
+            on_disk = min(stop, self.store.base + len(self.store.hashes)) if start >= self.pruned_height else start
+            views = self.store.views(start, on_disk, self.chain[on_disk - 1].hash) if on_disk > start else None
+            if views is None:
+                views, on_disk = [], start
+            return views + [block.serialize() for block in self.chain[on_disk:stop]]
     
     def search_block_by_number(self, block_number: int) -> Optional[Block]:
-        if 0 <= block_number < len(self.chain):
+        if self.chain.base <= block_number < len(self.chain):
             return self.chain[block_number]
         return None
     
     def is_chain_valid(self) -> bool:
         return self.is_valid_chain(self.chain)
     
+    def request_save(self):
+        """Save soon, in the background, together with whatever else changes meanwhile"""
+        self.persister.mark_dirty()
+    
     def save_data(self):
-        data = {
-            'chain': [block.to_dict() for block in self.chain],
-            'users': {username: user.to_dict() for username, user in self.users.items()},
-            'pending_transactions': [tx.to_dict() for tx in self.pending_transactions]
+        """Checkpoint: bring the store up to date and retire the journal written so far"""
+        # Copy the state under the locks, then write it without holding them. The journal is
+        # rotated at the same moment, so every change is either in this copy or in the new journal.
+        with self.chain_lock, self.mempool_lock, self.users_lock:
+            blocks = list(self.chain.blocks)
+            base = self.chain.base
+            snapshot = None
+            if self.chain.base or self.base_balances:
+                snapshot = {'height': self.chain.base, 'balances': dict(self.base_balances)}
+            pruned_height = self.pruned_height
+            pending = list(self.pending_transactions)
+            users = dict(self.users)
+            rotation = self.store.rotate()
+            self.save_generation += 1
+            generation = self.save_generation
+            due_snapshot, self.due_snapshot = self.due_snapshot, None
+        state = {
+            'format': 'vilcoin-state',
+            'version': 1,
+            'pruned_height': pruned_height,
+            'snapshot': snapshot,
+            'users': {username: user.to_dict() for username, user in users.items()},
         }
         
-        with open('blockchain_data.json', 'w') as f:
-            json.dump(data, f, indent=2)
+        with self.save_lock:
+            if due_snapshot is not None:
+                self.save_snapshot(due_snapshot)
+            if generation < self.saved_generation:
+                # A later state was written while we waited
+                return
+            start = time.perf_counter()
+            with tracer.span('save_data', blocks=len(blocks)):
+                self.store.checkpoint(blocks, base, state, pending, rotation)
+            self.saved_generation = generation
+        self.metrics.save_seconds.observe(time.perf_counter() - start)
+        self.metrics.save_bytes.set(self.store.size())
     
     def load_data(self):
-        if os.path.exists('blockchain_data.json'):
+        try:
+            if self.store.exists():
+                self.load_store()
+            elif os.path.exists(self.data_file):
+                self.load_legacy_data()
+                colored_print(f"📦 Moving {self.data_file} to the journaled store in {self.data_dir}...", Colors.OKCYAN, component='node.storage')
+                self.save_data()
+            elif not self.replay_journal(time.perf_counter()):
+                # The journal is replayed on top of a checkpoint, and a later genesis would not match the
+                # blocks it records, so a new node checkpoints its genesis at once
+                self.save_data()
+        except Exception as e:
+            colored_print(f"❌ Error loading data: {e}", Colors.FAIL, component='node.storage')
+            self.replace_chain([self.create_genesis_block()])
+        self.store.open_journal()
+    
+    def load_store(self):
+        start = time.perf_counter()
+        state = self.store.read_state()
+        snapshot = state.get('snapshot')
+        base = snapshot['height'] if snapshot else 0
+        blocks = self.store.read_blocks(base, lambda data: Block.from_dict(data, trusted=True))
+        if not blocks:
+            raise ValueError(f"no blocks in {self.store.blocks_path}")
+        # Bodies dropped in memory may still be on disk; their balances are already in the snapshot base
+        for block in blocks[:state.get('pruned_height', 0) - base]:
+            if not block.pruned:
+                block.prune()
+        self.replace_chain(Chain(blocks, base), snapshot['balances'] if snapshot else None)
+        
+        for username, user_data in state.get('users', {}).items():
+            self.add_user_from_data(username, user_data)
+        self.pending_transactions = [Transaction.from_dict(tx_data) for tx_data in state.get('pending_transactions', [])]
+        self.replay_journal(start)
+    
+    def replay_journal(self, start: float) -> int:
+        """Apply the journal on top of what is loaded and checkpoint the result; returns the records replayed"""
+        records = self.store.read_journal()
+        for record in records:
+            self.replay(record)
+        if records:
+            with self.mempool_lock:
+                self.pending_transactions = [tx for tx in self.pending_transactions if self.chain_index.find(tx.hash) is None]
+            colored_print(f"♻️  Replayed {len(records)} journal records, height {len(self.chain) - 1} "
+                          f"({time.perf_counter() - start:.2f}s)", Colors.OKCYAN, component='node.storage')
+            self.save_data()
+        return len(records)
+    
+    def replay(self, record: dict):
+        """Apply one journal record while loading"""
+        op = record.get('op')
+        if op == 'block':
+            block = Block.from_dict(record['block'], trusted=True)
+            if block.index < len(self.chain):
+                if block.index <= self.reorg_floor() or self.chain[block.index].hash == block.hash:
+                    return
+                # A reorg: the records that follow rebuild the new branch
+                while len(self.chain) > block.index:
+                    self.disconnect_tip()
+            if block.index == len(self.chain) and block.previous_hash == self.get_latest_block().hash:
+                self.append_block(block)
+        elif op == 'pending':
+            self.add_pending_transactions([Transaction.from_dict(tx_data) for tx_data in record['transactions']])
+        elif op == 'clear_pending':
+            self.clear_pending_transactions()
+        elif op == 'user':
+            self.add_user_if_missing(record['username'], record['data'])
+    
+    def load_legacy_data(self):
+        with open(self.data_file, 'r') as f:
+            data = json.load(f)
+        
+        # Load chain
+        blocks = [Block.from_dict(block_data, trusted=True) for block_data in data.get('chain', [])]
+        base = data.get('snapshot')
+        if base:
+            self.replace_chain(Chain(blocks, base['height']), base['balances'])
+        else:
+            self.replace_chain(blocks)
+        
+        for username, user_data in data.get('users', {}).items():
+            self.add_user_from_data(username, user_data)
+        
+        self.pending_transactions = [
+            Transaction.from_dict(tx_data) for tx_data in data.get('pending_transactions', [])
+        ]
+    
+    def export_chain(self, path: str) -> int:
+        """Write the chain as line-delimited JSON: a header line, then one block per line"""
+        opener = gzip.open if path.endswith('.gz') else open
+        start_time = time.time()
+        
+        with opener(path, 'wb') as f:
+            header = {'format': 'vilcoin-chain', 'version': 1, 'height': len(self.chain)}
+            f.write(json.dumps(header).encode() + b'\n')
+            with self.chain_lock:
+                blocks = list(self.chain.blocks)
+            for block in blocks:
+                f.write(block.serialize())
+                f.write(b'\n')
+        
+        elapsed = max(time.time() - start_time, 1e-9)
+        colored_print(f"📤 Exported {len(self.chain)} blocks to {path} ({len(self.chain) / elapsed:.0f} blocks/s)", Colors.OKGREEN, component='node.storage')
+        return len(self.chain)
+    
+    def import_chain(self, path: str, checkpoint_every: int = 1000) -> int:
+        """Stream blocks from an export file onto the local chain.
+
+        Every block is validated against its parent as it is read, and the chain
+        is saved every checkpoint_every blocks. Blocks the local chain already
+        holds are skipped, so an interrupted import resumes where it stopped.
+        A corrupt record ends the import at the last good block.
+        """
+        opener = gzip.open if path.endswith('.gz') else open
+        imported = 0
+        skipped = 0
+        unsaved = 0
+        start_time = time.time()
+        last_report = start_time
+        
+        with opener(path, 'rb') as f:
             try:
-                with open('blockchain_data.json', 'r') as f:
-                    data = json.load(f)
+                header = json.loads(f.readline())
+            except ValueError:
+                header = None
+            if not isinstance(header, dict) or header.get('format') != 'vilcoin-chain':
+                colored_print(f"❌ {path} is not a VIL chain export", Colors.FAIL, component='node.storage')
+                return 0
+            
+            for line in f:
+                if not line.strip():
+                    continue
                 
-                # Load chain
-                self.chain = []
-                for block_data in data.get('chain', []):
-                    transactions = []
-                    for tx_data in block_data['transactions']:
-                        tx = Transaction(
-                            tx_data['sender'],
-                            tx_data['receiver'],
-                            tx_data['amount'],
-                            tx_data['timestamp'],
-                            tx_data.get('tx_type', 'transfer')
-                        )
-                        transactions.append(tx)
-                    
-                    block = Block(
-                        block_data['index'],
-                        transactions,
-                        block_data['previous_hash'],
-                        block_data.get('miner')
-                    )
-                    block.nonce = block_data['nonce']
-                    block.hash = block_data['hash']
-                    block.timestamp = block_data['timestamp']
-                    self.chain.append(block)
+                try:
+                    block = Block.from_dict(json.loads(line))
+                except (ValueError, KeyError, TypeError):
+                    # A truncated or damaged export: keep what was imported so far
+                    colored_print(f"❌ Corrupt block record in {path}, stopping at last good block #{self.get_latest_block().index}", Colors.FAIL, component='node.storage')
+                    break
                 
-                for username, user_data in data.get('users', {}).items():
-                    user = User(username, "") 
-                    user.user_id = user_data.get('user_id', generate_user_id())
-                    user.password_hash = user_data['password_hash']
-                    user.balance = user_data['balance']
-                    self.users[username] = user
-                    self.username_to_id[username] = user.user_id
-                    self.id_to_username[user.user_id] = username
+                if block.index < self.chain.base:
+                    skipped += 1
+                    continue
                 
-                self.pending_transactions = []
-                for tx_data in data.get('pending_transactions', []):
-                    tx = Transaction(
-                        tx_data['sender'],
-                        tx_data['receiver'],
-                        tx_data['amount'],
-                        tx_data['timestamp'],
-                        tx_data.get('tx_type', 'transfer')
-                    )
-                    self.pending_transactions.append(tx)
+                if block.index < len(self.chain):
+                    local_block = self.chain[block.index]
+                    if local_block.hash == block.hash:
+                        skipped += 1
+                        continue
+                    if block.index == 0 and len(self.chain) == 1:
+                        # A fresh node only has its own random genesis block
+                        self.replace_chain([block])
+                        unsaved += 1
+                        continue
+                    colored_print(f"❌ Block #{block.index} conflicts with the local chain, stopping import", Colors.FAIL, component='node.storage')
+                    break
                 
-            except Exception as e:
-                colored_print(f"❌ Error loading data: {e}", Colors.FAIL)
-                self.chain = [self.create_genesis_block()]
+                if block.index != len(self.chain) or not self.is_valid_next_block(block, self.get_latest_block()):
+                    colored_print(f"❌ Invalid block #{block.index} in {path}, stopping import", Colors.FAIL, component='node.storage')
+                    break
+                
+                self.append_block(block)
+                self.remove_confirmed_transactions(block)
+                imported += 1
+                unsaved += 1
+                
+                if unsaved >= checkpoint_every:
+                    self.save_data()
+                    unsaved = 0
+                
+                now = time.time()
+                if now - last_report >= 2:
+                    colored_print(f"📥 Imported {imported} blocks ({imported / (now - start_time):.0f} blocks/s)", Colors.OKCYAN, component='node.storage')
+                    self.events.publish('sync_progress', {"stage": "import", "height": len(self.chain), "imported": imported})
+                    last_report = now
+        
+        if unsaved:
+            self.save_data()
+        
+        elapsed = max(time.time() - start_time, 1e-9)
+        if skipped:
+            colored_print(f"⏭️  Skipped {skipped} blocks already in the local chain", Colors.OKBLUE, component='node.storage')
+        colored_print(f"✅ Imported {imported} blocks in {elapsed:.2f}s ({imported / elapsed:.0f} blocks/s), chain length: {len(self.chain)}", Colors.OKGREEN, component='node.storage')
+        return imported
+    
+    def create_snapshot(self, state: tuple = None) -> dict:
+        """Balance state and user registry as of the current tip, or of a (tip block dict, balances, users) copy"""
+        if state is None:
+            with self.chain_lock:
+                state = (self.get_latest_block().to_dict(), dict(self.balances), self.users_snapshot())
+        anchor, balances, users = state
+        snapshot = {
+            'format': 'vilcoin-snapshot',
+            'version': 1,
+            'height': anchor['index'],
+            'block_hash': anchor['hash'],
+            'block': anchor,
+            'balances': balances,
+            'users': {username: user.to_dict() for username, user in users.items()}
+        }
+        snapshot['state_hash'] = self.snapshot_state_hash(snapshot)
+        return snapshot
+    
+    @staticmethod
+    def snapshot_state_hash(snapshot: dict) -> str:
+        state = {key: snapshot[key] for key in ('height', 'block_hash', 'balances', 'users')}
+        return hashlib.sha256(json.dumps(state, sort_keys=True).encode()).hexdigest()
+    
+    def save_snapshot(self, state: tuple = None) -> dict:
+        snapshot = self.create_snapshot(state)
+        data = json.dumps(snapshot).encode()
+        
+        tmp_path = self.snapshot_file + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, self.snapshot_file)
+        
+        self.latest_snapshot = data
+        colored_print(f"📸 Saved state snapshot at block #{snapshot['height']} (state hash: {snapshot['state_hash'][:16]}...)", Colors.OKBLUE, component='node.storage')
+        return snapshot
+    
+    def get_snapshot_bytes(self) -> Optional[bytes]:
+        if self.latest_snapshot is None and os.path.exists(self.snapshot_file):
+            with open(self.snapshot_file, 'rb') as f:
+                self.latest_snapshot = f.read()
+        return self.latest_snapshot
+    
+    def load_snapshot(self, snapshot: dict, trusted_hash: str = None) -> bool:
+        """Replace local history with a snapshot; only blocks after it are validated from now on"""
+        try:
+            if snapshot.get('format') != 'vilcoin-snapshot':
+                colored_print("❌ Not a VIL state snapshot", Colors.FAIL, component='node.storage')
+                return False
+            
+            anchor = Block.from_dict(snapshot['block'])
+            if (anchor.index != snapshot['height'] or anchor.hash != snapshot['block_hash'] or
+                    not anchor.has_valid_hash() or self.snapshot_state_hash(snapshot) != snapshot['state_hash']):
+                colored_print("❌ Snapshot is corrupted (hash mismatch)", Colors.FAIL, component='node.storage')
+                return False
+            
+            if trusted_hash and trusted_hash not in (snapshot['block_hash'], snapshot['state_hash']):
+                colored_print("❌ Snapshot does not match the trusted hash", Colors.FAIL, component='node.storage')
+                return False
+            
+            if anchor.index < len(self.chain):
+                colored_print(f"⚠️  Local chain is already at height {len(self.chain) - 1}, snapshot #{anchor.index} not needed", Colors.WARNING, component='node.storage')
+                return False
+        except (KeyError, TypeError, ValueError) as e:
+            colored_print(f"❌ Invalid snapshot: {e}", Colors.FAIL, component='node.storage')
+            return False
+        
+        self.replace_chain(Chain([anchor], anchor.index), snapshot['balances'])
+        for username, user_data in snapshot['users'].items():
+            self.add_user_if_missing(username, user_data)
+        self.clear_pending_transactions()
+        self.save_data()
+        
+        colored_print(f"✅ Loaded snapshot at block #{anchor.index} ({len(snapshot['users'])} users)", Colors.OKGREEN, component='node.storage')
+        return True
+    
+    def load_snapshot_file(self, path: str, trusted_hash: str = None) -> bool:
+        with open(path, 'rb') as f:
+            return self.load_snapshot(json.load(f), trusted_hash)
+    
+    def bootstrap_from_peer(self, peer_ip: str, trusted_hash: str = None) -> bool:
+        """Load a peer's snapshot, then fetch only the blocks after it"""
+        colored_print(f"📸 Requesting state snapshot from {peer_ip}...", Colors.OKCYAN, component='node.sync')
+        try:
+            response = self.send_message_with_response(peer_ip, {"type": "request_snapshot", "data": {}}, timeout=30)
+        except Exception as e:
+            colored_print(f"❌ Failed to get snapshot from {peer_ip}: {e}", Colors.FAIL, component='node.sync')
+            return False
+        
+        snapshot = response.get('data') if response and response.get('type') == 'snapshot_response' else None
+        if not snapshot:
+            colored_print(f"❌ {peer_ip} has no snapshot to serve", Colors.FAIL, component='node.sync')
+            return False
+        
+        if not trusted_hash:
+            colored_print(f"⚠️  No trusted hash given, trusting snapshot from {peer_ip} as-is", Colors.WARNING, component='node.sync')
+        
+        if not self.load_snapshot(snapshot, trusted_hash):
+            return False
+        
+        self.add_peer(peer_ip)
+        self.sync_blocks_from_peer(peer_ip)
+        return True
     
     def start_network_server(self):
         def server():
@@ -649,194 +2071,229 @@ class Blockchain:
                 server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
                 server_socket.bind(('', self.server_port))
                 server_socket.listen(10)  
-                colored_print(f"🌐 Network server listening on port {self.server_port}", Colors.OKGREEN)
+                self.server_socket = server_socket
+                colored_print(f"🌐 Network server listening on port {self.server_port}", Colors.OKGREEN, component='node.net')
                 
                 while True:
                     client_socket, addr = server_socket.accept()
                     threading.Thread(target=self.handle_peer, args=(client_socket, addr)).start()
             except Exception as e:
-                colored_print(f"❌ Server error: {e}", Colors.FAIL)
+                if self.server_socket is not None:
+                    colored_print(f"❌ Server error: {e}", Colors.FAIL, component='node.net')
         
         threading.Thread(target=server, daemon=True).start()
     
+    def stop_network_server(self):
+        server_socket, self.server_socket = self.server_socket, None
+        if server_socket is not None:
+            try:
+                # Wakes the accept() in the server thread
+                server_socket.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            server_socket.close()
+    
     def handle_peer(self, client_socket, addr):
         try:
-            data_bytes = b""
-            client_socket.settimeout(5)
-            while True:
-                try:
-                    chunk = client_socket.recv(65536)
-                    if not chunk:
-                        break
-                    data_bytes += chunk
-                    try:
-                        json.loads(data_bytes.decode())
-                        break  
-                    except json.JSONDecodeError:
-                        continue  
-                except socket.timeout:
-                    break  
-                
-            data = data_bytes.decode()
+            data = read_message(client_socket, timeout=5)
             if not data:
                 return
-                
-            message = json.loads(data)
-            peer_ip = addr[0]
-            
-            if peer_ip != self.my_ip:
-                self.peers.add(peer_ip)
-            
-            if message['type'] == 'transaction':
-                tx_data = message['data']
-                tx = Transaction(
-                    tx_data['sender'],
-                    tx_data['receiver'],
-                    tx_data['amount'],
-                    tx_data['timestamp'],
-                    tx_data.get('tx_type', 'transfer')
-                )
-                tx_exists = any(
-                    existing_tx.hash == tx.hash 
-                    for existing_tx in self.pending_transactions
-                )
-                if not tx_exists:
-                    self.pending_transactions.append(tx)
-                    sender_name = self.id_to_username.get(tx.sender, tx.sender)
-                    receiver_name = self.id_to_username.get(tx.receiver, tx.receiver)
-                    colored_print(f"📨 Received transaction: {sender_name} -> {receiver_name}: {tx.amount}", Colors.OKCYAN)
-                    self.save_data()
-            
-            elif message['type'] == 'block':
-                with self.sync_lock:
-                    block_data = message['data']
-                    colored_print(f"📦 Received new block #{block_data['index']} from {peer_ip}", Colors.OKCYAN)
-                    
-                    if block_data['index'] == len(self.chain):
-                        transactions = []
-                        for tx_data in block_data['transactions']:
-                            tx = Transaction(
-                                tx_data['sender'],
-                                tx_data['receiver'],
-                                tx_data['amount'],
-                                tx_data['timestamp'],
-                                tx_data.get('tx_type', 'transfer')
-                            )
-                            transactions.append(tx)
-                        
-                        new_block = Block(
-                            block_data['index'],
-                            transactions,
-                            block_data['previous_hash'],
-                            block_data.get('miner')
-                        )
-                        new_block.nonce = block_data['nonce']
-                        new_block.hash = block_data['hash']
-                        new_block.timestamp = block_data['timestamp']
-                        
-                        if (new_block.previous_hash == self.get_latest_block().hash and 
-                            new_block.hash == new_block.calculate_hash()):
-                            self.chain.append(new_block)
-                            for tx in transactions:
-                                self.pending_transactions = [
-                                    ptx for ptx in self.pending_transactions 
-                                    if ptx.hash != tx.hash
-                                ]
-                            colored_print(f"✅ Block #{block_data['index']} added to chain!", Colors.OKGREEN)
-                            self.save_data()
-                        else:
-                            colored_print(f"❌ Invalid block received from {peer_ip}", Colors.FAIL)
-            
-            elif message['type'] == 'ping':
-                response = {"type": "pong", "data": "alive"}
-                client_socket.send(json.dumps(response).encode())
-            
-            elif message['type'] == 'request_users':
-                users_data = {username: user.to_dict() for username, user in self.users.items()}
-                response = {"type": "users_response", "data": users_data}
-                client_socket.send(json.dumps(response).encode())
-            
-            elif message['type'] == 'request_blockchain':
-                chain_data = [block.to_dict() for block in self.chain]
-                response = {"type": "blockchain_response", "data": chain_data}
-                client_socket.send(json.dumps(response).encode())
-            
-            elif message['type'] == 'user_update':
-                user_data = message['data']
-                username = user_data['username']
-                if username not in self.users:
-                    user = User(username, "")
-                    user.user_id = user_data.get('user_id', generate_user_id())
-                    user.password_hash = user_data['password_hash']
-                    user.balance = user_data['balance']
-                    self.users[username] = user
-                    self.username_to_id[username] = user.user_id
-                    self.id_to_username[user.user_id] = username
-                    colored_print(f"➕ Added new user from network: {username} (ID: {user.user_id})", Colors.OKGREEN)
-                    self.save_data()
             
+            message = json.loads(data)
+            with tracer.span(f"handle_peer.{message.get('type')}", peer=addr[0], bytes=len(data)), self.store.reading():
+                response = self.handle_message(message, addr[0])
+                if response is not None:
+                    send_buffers(client_socket, response)
         except Exception as e:
-            colored_print(f"❌ Error handling peer {addr[0]}: {e}", Colors.FAIL)
+            colored_print(f"❌ Error handling peer {addr[0]}: {e}", Colors.FAIL, component='node.net')
         finally:
             client_socket.close()
     
+    def handle_message(self, message: dict, host: str):
+        """Act on one message from a peer at `host`; returns the encoded reply for requests
+        (bytes, or a list of buffers for block responses, see send_buffers)"""
+        # Identify the peer by where it listens, not by this connection's ephemeral port
+        peer_port = message.get('port') or self.default_peer_port
+        peer_ip = self.peer_name(host, peer_port)
+        
+        if not self.is_self(host, peer_port):
+            self.add_peer(peer_ip)
+        
+        if message['type'] == 'transaction':
+            tx = Transaction.from_dict(message['data'])
+            if self.add_pending_transactions([tx]):
+                self.metrics.transactions_received.inc()
+                sender_name = self.id_to_username.get(tx.sender, tx.sender)
+                receiver_name = self.id_to_username.get(tx.receiver, tx.receiver)
+                colored_print(f"📨 Received transaction: {sender_name} -> {receiver_name}: {tx.amount}", Colors.OKCYAN, component='node.net')
+                self.request_save()
+        
+        elif message['type'] == 'transactions':
+            added = self.add_pending_transactions([Transaction.from_dict(tx_data) for tx_data in message['data']])
+            if added:
+                self.metrics.transactions_received.inc(len(added))
+                colored_print(f"📨 Received {len(added)} transactions from {peer_ip}", Colors.OKCYAN, component='node.net')
+                self.request_save()
+        
+        elif message['type'] == 'block':
+            block_data = message['data']
+            colored_print(f"📦 Received new block #{block_data['index']} from {peer_ip}", Colors.OKCYAN, component='node.net')
+            
+            new_block = Block.from_dict(block_data)
+            status = self.add_block(new_block)
+            self.metrics.blocks_received.inc(status=status)
+            if status in ('added', 'reorg'):
+                colored_print(f"✅ Block #{block_data['index']} added to chain!", Colors.OKGREEN, component='node.net')
+                self.request_save()
+            elif status == 'side':
+                colored_print(f"🌿 Block #{block_data['index']} kept on a side chain", Colors.OKBLUE, component='node.net')
+            elif status == 'orphan':
+                colored_print(f"🧩 Block #{block_data['index']} has an unknown parent, fetching its branch...", Colors.WARNING, component='node.net')
+                self.fetch_branch_from_peer(peer_ip, new_block.index + 1)
+            elif status == 'invalid':
+                colored_print(f"❌ Invalid block received from {peer_ip}", Colors.FAIL, component='node.net')
+        
+        elif message['type'] == 'ping':
+            return json.dumps({"type": "pong", "data": "alive"}).encode()
+        
+        elif message['type'] == 'request_users':
+            request = message.get('data') or {}
+            if 'since' not in request:
+                # Older nodes ask for the whole registry
+                users_data = {username: user.to_dict() for username, user in self.users_snapshot().items()}
+                return json.dumps({"type": "users_response", "data": users_data}).encode()
+            since = int(request['since'])
+            limit = max(1, min(int(request.get('limit', 1000)), 5000))
+            with self.users_lock:
+                version = len(self.user_order)
+                # A position past our end, or one not following the same user, is from before a reset: start over
+                if not 0 <= since <= version or (since and self.user_order[since - 1] != request.get('after')):
+                    since = 0
+                entries = [self.users[username].to_dict() for username in self.user_order[since:since + limit]]
+            return json.dumps({"type": "users_response",
+                               "data": {"from": since, "version": version, "users": entries}}).encode()
+        
+        elif message['type'] == 'request_blockchain':
+            with self.chain_lock:
+                first_served = max(self.chain.base, self.pruned_height)
+                blocks = [] if first_served else self.serialized_blocks(0, len(self.chain))
+            if first_served:
+                # Without full history no valid chain can be sent; an empty one, plus where the served blocks
+                # start, so new nodes can tell a pruned or snapshot peer from a broken one
+                return json.dumps({"type": "blockchain_response", "base": first_served, "data": []}).encode()
+            return encode_message("blockchain_response", json_array(blocks))
+        
+        elif message['type'] == 'request_blocks':
+            start = int(message['data'].get('from', 0))
+            limit = max(1, min(int(message['data'].get('limit', 500)), 500))
+            # Heights below our base (snapshot) or pruned bodies cannot be served
+            with self.chain_lock:
+                first_served = max(self.chain.base, self.pruned_height)
+                blocks = self.serialized_blocks(start, start + limit) if start >= first_served else []
+                height = len(self.chain)
+            header = json.dumps({'height': height, 'base': first_served})[:-1]
+            payload = [header.encode() + b', "blocks": ', *json_array(blocks), b'}']
+            return encode_message("blocks_response", payload)
+        
+        elif message['type'] == 'request_snapshot':
+            return encode_message("snapshot_response", self.get_snapshot_bytes() or b'null')
+        
+        elif message['type'] == 'user_update':
+            user_data = message['data']
+            username = user_data['username']
+            user = self.add_user_if_missing(username, user_data)
+            if user:
+                colored_print(f"➕ Added new user from network: {username} (ID: {user.user_id})", Colors.OKGREEN, component='node.net')
+                self.request_save()
+        
+        return None
+    
+    def peer_address(self, peer: str):
+        """(host, port) to dial for a peer entry"""
+        host, sep, port = peer.rpartition(':')
+        if sep and port.isdigit():
+            return host, int(port)
+        return peer, self.default_peer_port
+    
+    def peer_name(self, host: str, port: int) -> str:
+        return host if port == self.default_peer_port else f"{host}:{port}"
+    
+    def is_self(self, host: str, port: int) -> bool:
+        return port == self.server_port and (host == self.my_ip or host.startswith('127.'))
+    
     def add_peer(self, ip: str):
-        self.peers.add(ip)
+        ip = self.peer_name(*self.peer_address(ip))
+        if ip not in self.peers:
+            self.peers.add(ip)
+            self.events.publish('peer_joined', {"peer": ip})
+    
+    def remove_peer(self, ip: str):
+        if ip in self.peers:
+            self.peers.discard(ip)
+            self.events.publish('peer_left', {"peer": ip})
     
     def broadcast_transaction(self, transaction: Transaction):
-        message = {
-            'type': 'transaction',
-            'data': transaction.to_dict()
-        }
+        message = encode_message('transaction', transaction.serialize(), self.server_port)
         self.broadcast_message(message)
-        colored_print(f"📡 Broadcasting transaction to {len(self.peers)} peers", Colors.OKCYAN)
+        colored_print(f"📡 Broadcasting transaction to {len(self.peers)} peers", Colors.OKCYAN, component='node.net')
+    
+    def broadcast_transactions(self, transactions: List[Transaction]):
+        message = encode_message('transactions', b'[' + b', '.join(tx.serialize() for tx in transactions) + b']', self.server_port)
+        self.broadcast_message(message)
+        colored_print(f"📡 Broadcasting {len(transactions)} transactions to {len(self.peers)} peers", Colors.OKCYAN, component='node.net')
     
     def broadcast_block(self, block: Block):
+        message = encode_message('block', block.serialize(), self.server_port)
+        self.broadcast_message(message)
+        colored_print(f"📡 Broadcasting new block to {len(self.peers)} peers", Colors.OKCYAN, component='node.net')
+    
+    def broadcast_user_update(self, user: User):
+        """Announce one new account; peers that miss it get it with their next user sync"""
         message = {
-            'type': 'block',
-            'data': block.to_dict()
+            'type': 'user_update',
+            'data': user.to_dict()
         }
         self.broadcast_message(message)
-        colored_print(f"📡 Broadcasting new block to {len(self.peers)} peers", Colors.OKCYAN)
-    
-    def broadcast_user_update(self):
-        if self.current_user and self.current_user in self.users:
-            message = {
-                'type': 'user_update',
-                'data': self.users[self.current_user].to_dict()
-            }
-            self.broadcast_message(message)
     
-    def broadcast_message(self, message: dict):
+    def broadcast_message(self, message):
+        if isinstance(message, dict):
+            message = json.dumps(dict(message, port=self.server_port)).encode()
+        
         failed_peers = set()
-        for peer_ip in self.peers:
+        for peer_ip in list(self.peers):
+            start = time.perf_counter()
             try:
-                sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-                sock.settimeout(5)
-                sock.connect((peer_ip, self.server_port))
-                sock.send(json.dumps(message).encode())
-                sock.close()
+                self.transport.send(peer_ip, message)
             except Exception as e:
-                colored_print(f"❌ Failed to send message to {peer_ip}: {e}", Colors.FAIL)
+                self.metrics.rpc_failures.inc(peer=peer_ip, method='send')
+                colored_print(f"❌ Failed to send message to {peer_ip}: {e}", Colors.FAIL, component='node.net')
                 failed_peers.add(peer_ip)
+                continue
+            self.metrics.rpc_seconds.observe(time.perf_counter() - start, peer=peer_ip, method='send')
         
-        self.peers -= failed_peers
+        for peer_ip in failed_peers:
+            self.remove_peer(peer_ip)
 
 class BlockchainCLI:
-    def __init__(self):
-        self.blockchain = Blockchain()
-        colored_print("=" * 50, Colors.HEADER)
-        colored_print("🪙  VIL COIN BLOCKCHAIN NETWORK  🪙", Colors.HEADER)
-        colored_print("=" * 50, Colors.HEADER)
-        colored_print("✅ Blockchain initialized successfully!", Colors.OKGREEN)
-        colored_print(f"🌐 Network server started on port {self.blockchain.server_port}", Colors.OKGREEN)
+    def __init__(self, prune_depth: int = None, blockchain: Blockchain = None, data_dir: str = None,
+                 server_port: int = 8888):
+        if blockchain is not None:
+            # Offline query commands reuse the views without starting the node
+            self.blockchain = blockchain
+            return
+        self.blockchain = Blockchain(prune_depth=prune_depth, data_dir=data_dir, server_port=server_port)
+        colored_print("=" * 50, Colors.HEADER, component='cli')
+        colored_print("🪙  VIL COIN BLOCKCHAIN NETWORK  🪙", Colors.HEADER, component='cli')
+        colored_print("=" * 50, Colors.HEADER, component='cli')
+        colored_print("✅ Blockchain initialized successfully!", Colors.OKGREEN, component='cli')
+        colored_print(f"🌐 Network server started on port {self.blockchain.server_port}", Colors.OKGREEN, component='cli')
         
     def show_menu(self):
         print()
         if self.blockchain.current_user:
             user_id = self.blockchain.users[self.blockchain.current_user].user_id
-            colored_print(f"👤 LOGGED IN AS: {self.blockchain.current_user} (ID: {user_id})", Colors.HEADER)
-            colored_print("=" * 50, Colors.HEADER)
+            colored_print(f"👤 LOGGED IN AS: {self.blockchain.current_user} (ID: {user_id})", Colors.HEADER, component='cli')
+            colored_print("=" * 50, Colors.HEADER, component='cli')
             print(f"{Colors.OKGREEN}1.{Colors.ENDC} 💰 Show Balance")
             print(f"{Colors.OKGREEN}2.{Colors.ENDC} 💸 Send VIL Coins")
             print(f"{Colors.OKGREEN}3.{Colors.ENDC} ⛏️  Mine Block")
@@ -847,11 +2304,14 @@ class BlockchainCLI:
             print(f"{Colors.OKGREEN}8.{Colors.ENDC} 🌐 Show Network Peers")
             print(f"{Colors.OKGREEN}9.{Colors.ENDC} 🔄 Sync with Network")
             print(f"{Colors.OKGREEN}10.{Colors.ENDC} ➕ Add Manual Peer")
-            print(f"{Colors.OKGREEN}11.{Colors.ENDC} 🚪 Logout")
-            print(f"{Colors.OKGREEN}12.{Colors.ENDC} 🚫 Exit")
+            print(f"{Colors.OKGREEN}11.{Colors.ENDC} 🔎 Find Transaction by Hash")
+            print(f"{Colors.OKGREEN}12.{Colors.ENDC} 📜 Transaction History for User")
+            print(f"{Colors.OKGREEN}13.{Colors.ENDC} 🏗️  Blocks Mined by User")
+            print(f"{Colors.OKGREEN}14.{Colors.ENDC} 🚪 Logout")
+            print(f"{Colors.OKGREEN}15.{Colors.ENDC} 🚫 Exit")
         else:
-            colored_print("🏠 MAIN MENU", Colors.HEADER)
-            colored_print("=" * 50, Colors.HEADER)
+            colored_print("🏠 MAIN MENU", Colors.HEADER, component='cli')
+            colored_print("=" * 50, Colors.HEADER, component='cli')
             print(f"{Colors.OKGREEN}1.{Colors.ENDC} 👤 Create Account")
             print(f"{Colors.OKGREEN}2.{Colors.ENDC} 🔑 Login")
             print(f"{Colors.OKGREEN}3.{Colors.ENDC} 🌐 Show Network Peers")
@@ -860,126 +2320,126 @@ class BlockchainCLI:
     
     def create_account(self):
         print()
-        colored_print("👤 CREATE NEW ACCOUNT", Colors.HEADER)
-        colored_print("=" * 30, Colors.HEADER)
+        colored_print("👤 CREATE NEW ACCOUNT", Colors.HEADER, component='cli')
+        colored_print("=" * 30, Colors.HEADER, component='cli')
         username = input(f"{Colors.OKCYAN}Enter username: {Colors.ENDC}").strip()
         if not username:
-            colored_print("❌ Username cannot be empty!", Colors.FAIL)
+            colored_print("❌ Username cannot be empty!", Colors.FAIL, component='cli')
             return
         
         password = getpass.getpass(f"{Colors.OKCYAN}Enter password: {Colors.ENDC}")
         if not password:
-            colored_print("❌ Password cannot be empty!", Colors.FAIL)
+            colored_print("❌ Password cannot be empty!", Colors.FAIL, component='cli')
             return
         
         if self.blockchain.create_user(username, password):
             user_id = self.blockchain.users[username].user_id
-            colored_print(f"✅ Account created successfully!", Colors.OKGREEN)
-            colored_print(f"🆔 Your User ID: {user_id}", Colors.OKBLUE)
-            colored_print(f"💰 You received 1000 initial VIL coins!", Colors.OKGREEN)
+            colored_print(f"✅ Account created successfully!", Colors.OKGREEN, component='cli')
+            colored_print(f"🆔 Your User ID: {user_id}", Colors.OKBLUE, component='cli')
+            colored_print(f"💰 You received 1000 initial VIL coins!", Colors.OKGREEN, component='cli')
         else:
-            colored_print("❌ Username already exists!", Colors.FAIL)
+            colored_print("❌ Username already exists!", Colors.FAIL, component='cli')
     
     def login(self):
         print()
-        colored_print("🔑 LOGIN TO YOUR ACCOUNT", Colors.HEADER)
-        colored_print("=" * 30, Colors.HEADER)
+        colored_print("🔑 LOGIN TO YOUR ACCOUNT", Colors.HEADER, component='cli')
+        colored_print("=" * 30, Colors.HEADER, component='cli')
         username = input(f"{Colors.OKCYAN}Enter username: {Colors.ENDC}").strip()
         password = getpass.getpass(f"{Colors.OKCYAN}Enter password: {Colors.ENDC}")
         
         if self.blockchain.login(username, password):
             user_id = self.blockchain.users[username].user_id
-            colored_print(f"✅ Welcome back, {username}! (ID: {user_id})", Colors.OKGREEN)
+            colored_print(f"✅ Welcome back, {username}! (ID: {user_id})", Colors.OKGREEN, component='cli')
         else:
-            colored_print("❌ Invalid username or password!", Colors.FAIL)
+            colored_print("❌ Invalid username or password!", Colors.FAIL, component='cli')
     
     def show_balance(self):
         if not self.blockchain.current_user:
-            colored_print("❌ Please login first!", Colors.FAIL)
+            colored_print("❌ Please login first!", Colors.FAIL, component='cli')
             return
         
         balance = self.blockchain.get_balance(self.blockchain.current_user)
         print()
-        colored_print("💰 YOUR BALANCE", Colors.HEADER)
-        colored_print("=" * 20, Colors.HEADER)
-        colored_print(f"🪙  {balance:.2f} VIL coins", Colors.OKGREEN)
+        colored_print("💰 YOUR BALANCE", Colors.HEADER, component='cli')
+        colored_print("=" * 20, Colors.HEADER, component='cli')
+        colored_print(f"🪙  {balance:.2f} VIL coins", Colors.OKGREEN, component='cli')
     
     def send_coins(self):
         if not self.blockchain.current_user:
-            colored_print("❌ Please login first!", Colors.FAIL)
+            colored_print("❌ Please login first!", Colors.FAIL, component='cli')
             return
         
         print()
-        colored_print("💸 SEND VIL COINS", Colors.HEADER)
-        colored_print("=" * 20, Colors.HEADER)
+        colored_print("💸 SEND VIL COINS", Colors.HEADER, component='cli')
+        colored_print("=" * 20, Colors.HEADER, component='cli')
         receiver = input(f"{Colors.OKCYAN}Enter receiver username: {Colors.ENDC}").strip()
         
         if receiver == self.blockchain.current_user:
-            colored_print("❌ You cannot send coins to yourself!", Colors.FAIL)
+            colored_print("❌ You cannot send coins to yourself!", Colors.FAIL, component='cli')
             return
         
         if receiver not in self.blockchain.users:
-            colored_print("❌ Receiver not found!", Colors.FAIL)
+            colored_print("❌ Receiver not found!", Colors.FAIL, component='cli')
             return
         
         try:
             amount = float(input(f"{Colors.OKCYAN}Enter amount: {Colors.ENDC}"))
             if amount <= 0:
-                colored_print("❌ Amount must be positive!", Colors.FAIL)
+                colored_print("❌ Amount must be positive!", Colors.FAIL, component='cli')
                 return
         except ValueError:
-            colored_print("❌ Invalid amount!", Colors.FAIL)
+            colored_print("❌ Invalid amount!", Colors.FAIL, component='cli')
             return
         
         current_balance = self.blockchain.get_balance(self.blockchain.current_user)
         if current_balance < amount:
-            colored_print(f"❌ Insufficient funds! Your balance: {current_balance:.2f} VIL", Colors.FAIL)
+            colored_print(f"❌ Insufficient funds! Your balance: {current_balance:.2f} VIL", Colors.FAIL, component='cli')
             return
         
         if self.blockchain.create_transaction(self.blockchain.current_user, receiver, amount):
             receiver_id = self.blockchain.users[receiver].user_id
-            colored_print(f"✅ Transaction created successfully!", Colors.OKGREEN)
-            colored_print(f"💸 Sent {amount:.2f} VIL coins to {receiver} (ID: {receiver_id})", Colors.OKGREEN)
-            colored_print("⏳ Transaction broadcasted and is pending. Mine a block to confirm it.", Colors.WARNING)
+            colored_print(f"✅ Transaction created successfully!", Colors.OKGREEN, component='cli')
+            colored_print(f"💸 Sent {amount:.2f} VIL coins to {receiver} (ID: {receiver_id})", Colors.OKGREEN, component='cli')
+            colored_print("⏳ Transaction broadcasted and is pending. Mine a block to confirm it.", Colors.WARNING, component='cli')
         else:
-            colored_print("❌ Transaction failed!", Colors.FAIL)
+            colored_print("❌ Transaction failed!", Colors.FAIL, component='cli')
     
     def mine_block(self):
         if not self.blockchain.current_user:
-            colored_print("❌ Please login first!", Colors.FAIL)
+            colored_print("❌ Please login first!", Colors.FAIL, component='cli')
             return
         
         print()
-        colored_print("⛏️  MINE NEW BLOCK", Colors.HEADER)
-        colored_print("=" * 20, Colors.HEADER)
+        colored_print("⛏️  MINE NEW BLOCK", Colors.HEADER, component='cli')
+        colored_print("=" * 20, Colors.HEADER, component='cli')
         if not self.blockchain.pending_transactions:
-            colored_print("❌ No pending transactions to mine!", Colors.FAIL)
+            colored_print("❌ No pending transactions to mine!", Colors.FAIL, component='cli')
             return
         
-        colored_print(f"📦 Pending transactions: {len(self.blockchain.pending_transactions)}", Colors.OKBLUE)
-        colored_print(f"💎 Mining difficulty: {self.blockchain.difficulty}", Colors.OKBLUE)
-        colored_print(f"🏆 Mining reward: {self.blockchain.mining_reward} VIL coins", Colors.OKBLUE)
+        colored_print(f"📦 Pending transactions: {len(self.blockchain.pending_transactions)}", Colors.OKBLUE, component='cli')
+        colored_print(f"💎 Mining difficulty: {self.blockchain.difficulty}", Colors.OKBLUE, component='cli')
+        colored_print(f"🏆 Mining reward: {self.blockchain.mining_reward} VIL coins", Colors.OKBLUE, component='cli')
         
         confirm = input(f"{Colors.OKCYAN}Start mining? (y/n): {Colors.ENDC}").strip().lower()
         
         if confirm == 'y':
             if self.blockchain.mine_pending_transactions(self.blockchain.current_user):
-                colored_print("🎉 Mining completed successfully!", Colors.OKGREEN)
+                colored_print("🎉 Mining completed successfully!", Colors.OKGREEN, component='cli')
             else:
-                colored_print("❌ Mining failed!", Colors.FAIL)
+                colored_print("❌ Mining failed!", Colors.FAIL, component='cli')
     
     def show_recent_ledger(self):
         print()
-        colored_print("📖 RECENT TRANSACTIONS (Last 10 Blocks)", Colors.HEADER)
-        colored_print("=" * 50, Colors.HEADER)
-        colored_print(f"⛓️  Chain length: {len(self.blockchain.chain)} blocks", Colors.OKBLUE)
-        colored_print(f"✅ Chain valid: {self.blockchain.is_chain_valid()}", Colors.OKGREEN if self.blockchain.is_chain_valid() else Colors.FAIL)
+        colored_print("📖 RECENT TRANSACTIONS (Last 10 Blocks)", Colors.HEADER, component='cli')
+        colored_print("=" * 50, Colors.HEADER, component='cli')
+        colored_print(f"⛓️  Chain length: {len(self.blockchain.chain)} blocks", Colors.OKBLUE, component='cli')
+        colored_print(f"✅ Chain valid: {self.blockchain.is_chain_valid()}", Colors.OKGREEN if self.blockchain.is_chain_valid() else Colors.FAIL, component='cli')
         print("-" * 80)
         
         recent_blocks = self.blockchain.chain[-10:]
         
         for block in recent_blocks:
-            colored_print(f"📦 Block #{block.index}", Colors.OKBLUE)
+            colored_print(f"📦 Block #{block.index}", Colors.OKBLUE, component='cli')
             timestamp_str = datetime.fromtimestamp(block.timestamp).strftime('%Y-%m-%d %H:%M:%S')
             print(f"🕒 Timestamp: {timestamp_str}")
             print(f"🔗 Previous Hash: {block.previous_hash[:20]}...")
@@ -988,24 +2448,26 @@ class BlockchainCLI:
             
             if block.miner and block.miner != "0":
                 miner_name = self.blockchain.id_to_username.get(block.miner, block.miner)
-                colored_print(f"⛏️  Miner ID: {block.miner}", Colors.OKGREEN)
+                colored_print(f"⛏️  Miner ID: {block.miner}", Colors.OKGREEN, component='cli')
             
-            if block.transactions:
-                colored_print("💰 Transactions:", Colors.OKCYAN)
+            if block.pruned:
+                colored_print("✂️  Transactions: pruned", Colors.WARNING, component='cli')
+            elif block.transactions:
+                colored_print("💰 Transactions:", Colors.OKCYAN, component='cli')
                 for tx in block.transactions:
                     if tx.tx_type == "mining_reward":
-                        colored_print(f"  🏆 MINING REWARD -> {tx.receiver}: {tx.amount:.2f} VIL", Colors.WARNING)
+                        colored_print(f"  🏆 MINING REWARD -> {tx.receiver}: {tx.amount:.2f} VIL", Colors.WARNING, component='cli')
                     else:
                         print(f"  💸 {tx.sender} -> {tx.receiver}: {tx.amount:.2f} VIL")
             else:
-                colored_print("💰 Transactions: Genesis Block", Colors.WARNING)
+                colored_print("💰 Transactions: Genesis Block", Colors.WARNING, component='cli')
             
             print("-" * 80)
     
     def search_block(self):
         print()
-        colored_print("🔍 SEARCH BLOCK BY NUMBER", Colors.HEADER)
-        colored_print("=" * 30, Colors.HEADER)
+        colored_print("🔍 SEARCH BLOCK BY NUMBER", Colors.HEADER, component='cli')
+        colored_print("=" * 30, Colors.HEADER, component='cli')
         
         try:
             block_number = int(input(f"{Colors.OKCYAN}Enter block number (0-{len(self.blockchain.chain)-1}): {Colors.ENDC}"))
@@ -1013,7 +2475,7 @@ class BlockchainCLI:
             
             if block:
                 print()
-                colored_print(f"📦 BLOCK #{block.index} DETAILS", Colors.HEADER)
+                colored_print(f"📦 BLOCK #{block.index} DETAILS", Colors.HEADER, component='cli')
                 print("-" * 40)
                 timestamp_str = datetime.fromtimestamp(block.timestamp).strftime('%Y-%m-%d %H:%M:%S')
                 print(f"🕒 Timestamp: {timestamp_str}")
@@ -1023,36 +2485,105 @@ class BlockchainCLI:
                 
                 if block.miner and block.miner != "0":
                     miner_name = self.blockchain.id_to_username.get(block.miner, block.miner)
-                    colored_print(f"⛏️Miner ID: {block.miner}", Colors.OKGREEN)
+                    colored_print(f"⛏️Miner ID: {block.miner}", Colors.OKGREEN, component='cli')
                 
-                if block.transactions:
-                    colored_print(f"💰 Transactions ({len(block.transactions)}):", Colors.OKCYAN)
+                if block.pruned:
+                    colored_print("✂️  Transactions: pruned (older than the retained window)", Colors.WARNING, component='cli')
+                elif block.transactions:
+                    colored_print(f"💰 Transactions ({len(block.transactions)}):", Colors.OKCYAN, component='cli')
                     for i, tx in enumerate(block.transactions, 1):
                         if tx.tx_type == "mining_reward":
-                            colored_print(f"  {i}. 🏆 MINING REWARD -> {tx.receiver}: {tx.amount:.2f} VIL", Colors.WARNING)
+                            colored_print(f"  {i}. 🏆 MINING REWARD -> {tx.receiver}: {tx.amount:.2f} VIL", Colors.WARNING, component='cli')
                         else:
                             tx_time = datetime.fromtimestamp(tx.timestamp).strftime('%H:%M:%S')
                             print(f"  {i}. 💸 [{tx_time}] {tx.sender} -> {tx.receiver}: {tx.amount:.2f} VIL")
                 else:
-                    colored_print("💰 Transactions: Genesis Block", Colors.WARNING)
+                    colored_print("💰 Transactions: Genesis Block", Colors.WARNING, component='cli')
             else:
-                colored_print(f"❌ Block #{block_number} not found!", Colors.FAIL)
+                colored_print(f"❌ Block #{block_number} not found!", Colors.FAIL, component='cli')
                 
         except ValueError:
-            colored_print("❌ Please enter a valid block number!", Colors.FAIL)
+            colored_print("❌ Please enter a valid block number!", Colors.FAIL, component='cli')
+    
+    def print_transaction(self, block: Optional[Block], tx: Transaction):
+        timestamp_str = datetime.fromtimestamp(tx.timestamp).strftime('%Y-%m-%d %H:%M:%S')
+        where = f"📦 Block #{block.index}" if block else "⏳ Pending"
+        if tx.tx_type == "mining_reward":
+            receiver_name = self.blockchain.id_to_username.get(tx.receiver, tx.receiver)
+            colored_print(f"{where} | 🕒 {timestamp_str} | 🏆 MINING REWARD -> {receiver_name}: {tx.amount:.2f} VIL", Colors.WARNING, component='cli')
+        else:
+            sender_name = self.blockchain.id_to_username.get(tx.sender, tx.sender)
+            receiver_name = self.blockchain.id_to_username.get(tx.receiver, tx.receiver)
+            print(f"{where} | 🕒 {timestamp_str} | 💸 {sender_name} -> {receiver_name}: {tx.amount:.2f} VIL")
+    
+    def find_transaction(self, tx_hash: str = None):
+        print()
+        colored_print("🔎 FIND TRANSACTION", Colors.HEADER, component='cli')
+        colored_print("=" * 30, Colors.HEADER, component='cli')
+        if tx_hash is None:
+            tx_hash = input(f"{Colors.OKCYAN}Enter transaction hash: {Colors.ENDC}").strip()
+        
+        found = self.blockchain.find_transaction(tx_hash)
+        if not found:
+            colored_print("❌ Transaction not found (it may be in a pruned block)", Colors.FAIL, component='cli')
+            return
+        block, tx = found
+        self.print_transaction(block, tx)
+        print(f"🔐 Hash: {tx.hash}")
+        if block:
+            confirmations = len(self.blockchain.chain) - block.index
+            colored_print(f"✅ Confirmations: {confirmations}", Colors.OKGREEN, component='cli')
+    
+    def show_user_history(self, username: str = None, page: int = None, per_page: int = 20):
+        """Paged history; interactive unless a page is given"""
+        print()
+        if username is None:
+            username = input(f"{Colors.OKCYAN}Enter username (blank for yourself): {Colors.ENDC}").strip() or self.blockchain.current_user
+        colored_print(f"📜 TRANSACTION HISTORY: {username}", Colors.HEADER, component='cli')
+        colored_print("=" * 50, Colors.HEADER, component='cli')
+        
+        current = page or 0
+        while True:
+            entries, total = self.blockchain.get_user_history(username, current, per_page)
+            if not total:
+                colored_print("✅ No confirmed transactions.", Colors.OKGREEN, component='cli')
+                return
+            pages = (total + per_page - 1) // per_page
+            colored_print(f"📄 Page {current + 1}/{pages} ({total} transactions)", Colors.OKBLUE, component='cli')
+            print("-" * 80)
+            for block, tx in entries:
+                self.print_transaction(block, tx)
+            if page is not None or current + 1 >= pages:
+                return
+            if input(f"{Colors.OKCYAN}Next page? (y/n): {Colors.ENDC}").strip().lower() != 'y':
+                return
+            current += 1
+    
+    def show_mined_blocks(self, username: str = None, page: int = 0, per_page: int = 20):
+        print()
+        if username is None:
+            username = input(f"{Colors.OKCYAN}Enter username (blank for yourself): {Colors.ENDC}").strip() or self.blockchain.current_user
+        colored_print(f"🏗️  BLOCKS MINED BY {username}", Colors.HEADER, component='cli')
+        colored_print("=" * 50, Colors.HEADER, component='cli')
+        
+        blocks, total = self.blockchain.get_blocks_mined_by(username, page, per_page)
+        colored_print(f"⛏️  Total blocks mined: {total}", Colors.OKBLUE, component='cli')
+        for block in blocks:
+            timestamp_str = datetime.fromtimestamp(block.timestamp).strftime('%Y-%m-%d %H:%M:%S')
+            print(f"  📦 Block #{block.index} | 🕒 {timestamp_str} | 🔐 {block.hash[:20]}...")
     
     def show_pending_transactions(self):
         print()
-        colored_print("⏳ PENDING TRANSACTIONS", Colors.HEADER)
-        colored_print("=" * 30, Colors.HEADER)
+        colored_print("⏳ PENDING TRANSACTIONS", Colors.HEADER, component='cli')
+        colored_print("=" * 30, Colors.HEADER, component='cli')
         if not self.blockchain.pending_transactions:
-            colored_print("✅ No pending transactions.", Colors.OKGREEN)
+            colored_print("✅ No pending transactions.", Colors.OKGREEN, component='cli')
             return
         
-        colored_print(f"📦 Total pending: {len(self.blockchain.pending_transactions)}", Colors.OKBLUE)
+        colored_print(f"📦 Total pending: {len(self.blockchain.pending_transactions)}", Colors.OKBLUE, component='cli')
         print("-" * 60)
         
-        for i, tx in enumerate(self.blockchain.pending_transactions, 1):
+        for i, tx in enumerate(self.blockchain.pending_snapshot(), 1):
             timestamp_str = datetime.fromtimestamp(tx.timestamp).strftime('%Y-%m-%d %H:%M:%S')
             sender_name = self.blockchain.id_to_username.get(tx.sender, tx.sender)
             receiver_name = self.blockchain.id_to_username.get(tx.receiver, tx.receiver)
@@ -1060,70 +2591,70 @@ class BlockchainCLI:
     
     def show_all_users(self):
         print()
-        colored_print("👥 ALL REGISTERED USERS", Colors.HEADER)
-        colored_print("=" * 30, Colors.HEADER)
+        colored_print("👥 ALL REGISTERED USERS", Colors.HEADER, component='cli')
+        colored_print("=" * 30, Colors.HEADER, component='cli')
         if not self.blockchain.users:
-            colored_print("❌ No users registered.", Colors.FAIL)
+            colored_print("❌ No users registered.", Colors.FAIL, component='cli')
             return
         
-        colored_print(f"👤 Total users: {len(self.blockchain.users)}", Colors.OKBLUE)
+        colored_print(f"👤 Total users: {len(self.blockchain.users)}", Colors.OKBLUE, component='cli')
         print("-" * 40)
-        for username, user in self.blockchain.users.items():
+        for username, user in self.blockchain.users_snapshot().items():
             online_status = "🟢 ONLINE" if username == self.blockchain.current_user else "⚪ OFFLINE"
-            colored_print(f"👤 {username} - {online_status}", Colors.OKGREEN if username == self.blockchain.current_user else Colors.ENDC)
+            colored_print(f"👤 {username} - {online_status}", Colors.OKGREEN if username == self.blockchain.current_user else Colors.ENDC, component='cli')
         print("-" * 40)
     
     def show_peers(self):
         print()
-        colored_print("🌐 NETWORK PEERS", Colors.HEADER)
-        colored_print("=" * 20, Colors.HEADER)
-        colored_print(f"📡 My IP: {self.blockchain.my_ip}", Colors.OKBLUE)
+        colored_print("🌐 NETWORK PEERS", Colors.HEADER, component='cli')
+        colored_print("=" * 20, Colors.HEADER, component='cli')
+        colored_print(f"📡 My IP: {self.blockchain.my_ip}", Colors.OKBLUE, component='cli')
         if self.blockchain.peers:
-            colored_print(f"🔗 Connected peers ({len(self.blockchain.peers)}):", Colors.OKGREEN)
+            colored_print(f"🔗 Connected peers ({len(self.blockchain.peers)}):", Colors.OKGREEN, component='cli')
             for i, peer in enumerate(self.blockchain.peers, 1):
                 print(f"  {i}. 🌐 {peer}")
         else:
-            colored_print("⚠️  No peers connected.", Colors.WARNING)
+            colored_print("⚠️  No peers connected.", Colors.WARNING, component='cli')
     
     def sync_with_network(self):
         print()
-        colored_print("🔄 SYNC WITH NETWORK", Colors.HEADER)
-        colored_print("=" * 25, Colors.HEADER)
+        colored_print("🔄 SYNC WITH NETWORK", Colors.HEADER, component='cli')
+        colored_print("=" * 25, Colors.HEADER, component='cli')
         if not self.blockchain.peers:
-            colored_print("🔍 No peers connected! Scanning for peers...", Colors.WARNING)
+            colored_print("🔍 No peers connected! Scanning for peers...", Colors.WARNING, component='cli')
             discovered_peers = self.blockchain.scan_for_peers()
             for peer in discovered_peers:
-                self.blockchain.peers.add(peer)
+                self.blockchain.add_peer(peer)
             
             if not self.blockchain.peers:
-                colored_print("❌ No peers found on the network!", Colors.FAIL)
+                colored_print("❌ No peers found on the network!", Colors.FAIL, component='cli')
                 return
         
-        colored_print("🔄 Synchronizing with network peers...", Colors.OKCYAN)
+        colored_print("🔄 Synchronizing with network peers...", Colors.OKCYAN, component='cli')
         self.blockchain.sync_with_network()
     
     def add_manual_peer(self):
         print()
-        colored_print("➕ ADD MANUAL PEER", Colors.HEADER)
-        colored_print("=" * 25, Colors.HEADER)
+        colored_print("➕ ADD MANUAL PEER", Colors.HEADER, component='cli')
+        colored_print("=" * 25, Colors.HEADER, component='cli')
         peer_ip = input(f"{Colors.OKCYAN}Enter peer IP address: {Colors.ENDC}").strip()
         if peer_ip:
             self.blockchain.add_peer(peer_ip)
-            colored_print(f"✅ Added peer: {peer_ip}", Colors.OKGREEN)
+            colored_print(f"✅ Added peer: {peer_ip}", Colors.OKGREEN, component='cli')
             
             try:
                 message = {"type": "ping", "data": "manual_add"}
                 response = self.blockchain.send_message_with_response(peer_ip, message, timeout=5)
                 if response and response.get('type') == 'pong':
-                    colored_print(f"🟢 Peer {peer_ip} is reachable!", Colors.OKGREEN)
-                    colored_print("🔄 Syncing with new peer...", Colors.OKCYAN)
+                    colored_print(f"🟢 Peer {peer_ip} is reachable!", Colors.OKGREEN, component='cli')
+                    colored_print("🔄 Syncing with new peer...", Colors.OKCYAN, component='cli')
                     self.blockchain.sync_with_network()
                 else:
-                    colored_print(f"⚠️  Warning: Peer {peer_ip} may not be reachable.", Colors.WARNING)
+                    colored_print(f"⚠️  Warning: Peer {peer_ip} may not be reachable.", Colors.WARNING, component='cli')
             except Exception as e:
-                colored_print(f"⚠️  Warning: Could not verify peer {peer_ip}: {e}", Colors.WARNING)
+                colored_print(f"⚠️  Warning: Could not verify peer {peer_ip}: {e}", Colors.WARNING, component='cli')
         else:
-            colored_print("❌ Invalid IP address!", Colors.FAIL)
+            colored_print("❌ Invalid IP address!", Colors.FAIL, component='cli')
     
     def run(self):
         while True:
@@ -1153,13 +2684,19 @@ class BlockchainCLI:
                     elif choice == '10':
                         self.add_manual_peer()
                     elif choice == '11':
-                        self.blockchain.logout()
-                        colored_print("👋 Logged out successfully!", Colors.OKGREEN)
+                        self.find_transaction()
                     elif choice == '12':
-                        colored_print("👋 Goodbye! Thanks for using VIL Coin!", Colors.HEADER)
+                        self.show_user_history()
+                    elif choice == '13':
+                        self.show_mined_blocks()
+                    elif choice == '14':
+                        self.blockchain.logout()
+                        colored_print("👋 Logged out successfully!", Colors.OKGREEN, component='cli')
+                    elif choice == '15':
+                        colored_print("👋 Goodbye! Thanks for using VIL Coin!", Colors.HEADER, component='cli')
                         break
                     else:
-                        colored_print("❌ Invalid choice! Please try again.", Colors.FAIL)
+                        colored_print("❌ Invalid choice! Please try again.", Colors.FAIL, component='cli')
                 else:
                     if choice == '1':
                         self.create_account()
@@ -1170,18 +2707,100 @@ class BlockchainCLI:
                     elif choice == '4':
                         self.sync_with_network()
                     elif choice == '5':
-                        colored_print("👋 Goodbye! Thanks for using VIL Coin!", Colors.HEADER)
+                        colored_print("👋 Goodbye! Thanks for using VIL Coin!", Colors.HEADER, component='cli')
                         break
                     else:
-                        colored_print("❌ Invalid choice! Please try again.", Colors.FAIL)
+                        colored_print("❌ Invalid choice! Please try again.", Colors.FAIL, component='cli')
                         
             except KeyboardInterrupt:
                 print()
-                colored_print("👋 Goodbye! Thanks for using VIL Coin!", Colors.HEADER)
+                colored_print("👋 Goodbye! Thanks for using VIL Coin!", Colors.HEADER, component='cli')
                 break
             except Exception as e:
-                colored_print(f"❌ An error occurred: {e}", Colors.FAIL)
+                colored_print(f"❌ An error occurred: {e}", Colors.FAIL, component='cli')
+        
+        self.blockchain.persister.stop()
+
+def main():
+    parser = argparse.ArgumentParser(description="VIL Coin blockchain node")
+    parser.add_argument('--prune', type=int, metavar='DEPTH', help="keep transaction bodies only for the last DEPTH blocks")
+    parser.add_argument('--data-dir', help="directory for the block file, journal, state and snapshots (default: current directory)")
+    parser.add_argument('--port', type=int, default=8888, help="P2P listen port")
+    parser.add_argument('--api', metavar='[HOST:]PORT', help="also serve the local HTTP/JSON API (default host 127.0.0.1)")
+    parser.add_argument('--api-workers', type=int, default=16, metavar='N', help="threads serving API connections")
+    parser.add_argument('--events', metavar='[HOST:]PORT', help="also serve the newline-delimited JSON event stream")
+    parser.add_argument('--metrics', metavar='[HOST:]PORT', help="also serve Prometheus metrics on http://HOST:PORT/metrics")
+    parser.add_argument('--save-delay', type=float, default=1.0, metavar='SECONDS', help="save once changes stop for this long")
+    add_logging_arguments(parser)
+    add_tracing_arguments(parser)
+    subparsers = parser.add_subparsers(dest='command')
+    
+    export_parser = subparsers.add_parser('export', help="stream the local chain to a line-delimited file")
+    export_parser.add_argument('path', help="output file (.gz to compress)")
+    
+    import_parser = subparsers.add_parser('import', help="import blocks from an export file")
+    import_parser.add_argument('path', help="input file produced by export")
+    import_parser.add_argument('--checkpoint-every', type=int, default=1000, help="save progress every N blocks")
+    
+    subparsers.add_parser('snapshot', help="write a balance/user snapshot of the current tip")
+    
+    load_snapshot_parser = subparsers.add_parser('load-snapshot', help="start from a snapshot file instead of full history")
+    load_snapshot_parser.add_argument('path', help="snapshot file")
+    load_snapshot_parser.add_argument('--trusted-hash', help="expected block hash or state hash of the snapshot")
+    
+    bootstrap_parser = subparsers.add_parser('bootstrap', help="load a peer's snapshot and sync the blocks after it")
+    bootstrap_parser.add_argument('peer', help="peer IP address")
+    bootstrap_parser.add_argument('--trusted-hash', help="expected block hash or state hash of the snapshot")
+    
+    find_parser = subparsers.add_parser('find-tx', help="look up a transaction by hash")
+    find_parser.add_argument('hash', help="transaction hash")
+    
+    history_parser = subparsers.add_parser('history', help="list a user's confirmed transactions, newest first")
+    history_parser.add_argument('user', help="username or user ID")
+    history_parser.add_argument('--page', type=int, default=0, help="page number, starting at 0")
+    history_parser.add_argument('--per-page', type=int, default=20)
+    
+    mined_parser = subparsers.add_parser('mined', help="list blocks mined by a user")
+    mined_parser.add_argument('user', help="username or user ID")
+    mined_parser.add_argument('--page', type=int, default=0, help="page number, starting at 0")
+    mined_parser.add_argument('--per-page', type=int, default=20)
+    
+    args = parser.parse_args()
+    setup_logging(args.log_level, args.log_json, args.log_file)
+    start_tracing(args)
+    
+    if args.command == 'export':
+        Blockchain(start_network=False, data_dir=args.data_dir).export_chain(args.path)
+    elif args.command == 'import':
+        Blockchain(start_network=False, prune_depth=args.prune, data_dir=args.data_dir).import_chain(args.path, args.checkpoint_every)
+    elif args.command == 'snapshot':
+        Blockchain(start_network=False, data_dir=args.data_dir).save_snapshot()
+    elif args.command == 'load-snapshot':
+        Blockchain(start_network=False, prune_depth=args.prune, data_dir=args.data_dir).load_snapshot_file(args.path, args.trusted_hash)
+    elif args.command == 'bootstrap':
+        Blockchain(start_network=False, prune_depth=args.prune, data_dir=args.data_dir, server_port=args.port).bootstrap_from_peer(args.peer, args.trusted_hash)
+    elif args.command == 'find-tx':
+        BlockchainCLI(blockchain=Blockchain(start_network=False, data_dir=args.data_dir)).find_transaction(args.hash)
+    elif args.command == 'history':
+        BlockchainCLI(blockchain=Blockchain(start_network=False, data_dir=args.data_dir)).show_user_history(args.user, args.page, args.per_page)
+    elif args.command == 'mined':
+        BlockchainCLI(blockchain=Blockchain(start_network=False, data_dir=args.data_dir)).show_mined_blocks(args.user, args.page, args.per_page)
+    else:
+        cli = BlockchainCLI(prune_depth=args.prune, data_dir=args.data_dir, server_port=args.port)
+        cli.blockchain.persister.delay = args.save_delay
+        if args.api:
+            from VILcoin_api import APIServer
+            host, _, port = args.api.rpartition(':')
+            APIServer(cli.blockchain, host or '127.0.0.1', int(port), args.api_workers).start()
+        if args.events:
+            from VILcoin_api import EventStreamServer
+            host, _, port = args.events.rpartition(':')
+            EventStreamServer(cli.blockchain, host or '127.0.0.1', int(port)).start()
+        if args.metrics:
+            from VILcoin_api import MetricsServer
+            host, _, port = args.metrics.rpartition(':')
+            MetricsServer(cli.blockchain, host or '127.0.0.1', int(port)).start()
+        cli.run()
 
 if __name__ == "__main__":
-    cli = BlockchainCLI()
-    cli.run()
+    main()
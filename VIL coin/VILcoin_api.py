@@ -0,0 +1,375 @@
+import json
+import queue
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, HTTPServer, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+from VILcoin import Blockchain, EventBus
+from VILcoin_log import Colors, colored_print
+
+class APIError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+class ThreadPoolHTTPServer(HTTPServer):
+    """HTTPServer that hands connections to a fixed pool of worker threads"""
+
+    def __init__(self, address, handler, workers: int = 16):
+        super().__init__(address, handler)
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='vilcoin-api')
+
+    def process_request(self, request, client_address):
+        self.executor.submit(self.process_request_thread, request, client_address)
+
+    def process_request_thread(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def server_close(self):
+        super().server_close()
+        self.executor.shutdown(wait=False)
+
+class APIRequestHandler(BaseHTTPRequestHandler):
+    # HTTP/1.1 keeps connections open between requests; each holds a worker, so idle ones are dropped soon
+    protocol_version = "HTTP/1.1"
+    timeout = 5
+    # Headers and body go out as separate writes; don't let Nagle hold the body back
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self.dispatch('GET')
+
+    def do_POST(self):
+        self.dispatch('POST')
+
+    def dispatch(self, method: str):
+        url = urlparse(self.path)
+        parts = [p for p in url.path.split('/') if p]
+        query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        try:
+            body = self.read_body() if method == 'POST' else {}
+            route = self.server.api.routes.get((method, parts[0] if parts else ''))
+            if route is None:
+                raise APIError(404, f"no such endpoint: {method} {url.path}")
+            result = route(parts[1:], query, body)
+            self.send_json(200, result)
+        except APIError as e:
+            self.send_json(e.status, {"error": str(e)})
+        except Exception as e:
+            self.send_json(500, {"error": str(e)})
+
+    def read_body(self) -> dict:
+        length = int(self.headers.get('Content-Length') or 0)
+        if not length:
+            return {}
+        try:
+            body = json.loads(self.rfile.read(length))
+        except ValueError:
+            raise APIError(400, "request body is not valid JSON")
+        if not isinstance(body, dict):
+            raise APIError(400, "request body must be a JSON object")
+        return body
+
+    def send_json(self, status: int, result):
+        # Blocks are sent as their cached canonical bytes
+        payload = result if isinstance(result, bytes) else json.dumps(result).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+class APIServer:
+    """Local HTTP/JSON API for driving a node from scripts and services.
+
+    GET  /balance?user=NAME        GET  /block/HEIGHT     GET /tx/HASH
+    GET  /mempool                  GET  /peers            GET /status
+    GET  /miner                    (auto-miner confirmation latency)
+    POST /send   {"sender", "password", "receiver", "amount"}
+    POST /send_batch {"sender", "password", "transfers": [{"receiver", "amount"}, ...]}
+    POST /mine   {"miner"}
+    """
+
+    def __init__(self, blockchain: Blockchain, host: str = '127.0.0.1', port: int = 8890, workers: int = 16):
+        self.blockchain = blockchain
+        self.host = host
+        self.port = port
+        self.workers = workers
+        self.httpd = None
+        self.routes = {
+            ('GET', 'balance'): self.get_balance,
+            ('GET', 'block'): self.get_block,
+            ('GET', 'tx'): self.get_transaction,
+            ('GET', 'mempool'): self.get_mempool,
+            ('GET', 'peers'): self.get_peers,
+            ('GET', 'status'): self.get_status,
+            ('GET', 'miner'): self.get_miner,
+            ('POST', 'send'): self.send,
+            ('POST', 'send_batch'): self.send_batch,
+            ('POST', 'mine'): self.mine,
+        }
+
+    def start(self):
+        self.httpd = ThreadPoolHTTPServer((self.host, self.port), APIRequestHandler, self.workers)
+        self.httpd.api = self
+        self.port = self.httpd.server_address[1]
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        colored_print(f"🔌 API server listening on http://{self.host}:{self.port}", Colors.OKGREEN, component='api')
+
+    def stop(self):
+        if self.httpd:
+            self.httpd.shutdown()
+            self.httpd.server_close()
+            self.httpd = None
+
+    def require_user(self, username) -> str:
+        if username not in self.blockchain.users:
+            raise APIError(404, f"unknown user: {username}")
+        return username
+
+    def authenticate(self, body: dict) -> str:
+        sender = self.require_user(body.get('sender'))
+        if not self.blockchain.users[sender].verify_password(str(body.get('password', ''))):
+            raise APIError(403, "invalid password")
+        return sender
+
+    @staticmethod
+    def parse_amount(value) -> float:
+        try:
+            amount = float(value)
+        except (TypeError, ValueError):
+            raise APIError(400, f"invalid amount: {value!r}")
+        if amount <= 0:
+            raise APIError(400, "amount must be positive")
+        return amount
+
+    def get_balance(self, path, query, body):
+        username = self.require_user(query.get('user'))
+        return {"user": username, "balance": self.blockchain.get_balance(username)}
+
+    def get_block(self, path, query, body):
+        try:
+            height = int(path[0])
+        except (IndexError, ValueError):
+            raise APIError(400, "usage: /block/HEIGHT")
+        # Straight from blocks.dat when it is there, without decoding the block
+        with self.blockchain.store.reading():
+            data = self.blockchain.serialized_blocks(height, height + 1)
+            if not data:
+                raise APIError(404, f"block #{height} not found")
+            return bytes(data[0])
+
+    def get_transaction(self, path, query, body):
+        if not path:
+            raise APIError(400, "usage: /tx/HASH")
+        found = self.blockchain.find_transaction(path[0])
+        if not found:
+            raise APIError(404, "transaction not found")
+        block, tx = found
+        result = tx.to_dict()
+        result['hash'] = tx.hash
+        if block is None:
+            result['status'] = 'pending'
+        else:
+            result['status'] = 'confirmed'
+            result['block'] = block.index
+            result['confirmations'] = len(self.blockchain.chain) - block.index
+        return result
+
+    def get_mempool(self, path, query, body):
+        pending = self.blockchain.pending_snapshot()
+        return {"count": len(pending), "transactions": [dict(tx.to_dict(), hash=tx.hash) for tx in pending]}
+
+    def get_peers(self, path, query, body):
+        return {"my_ip": self.blockchain.my_ip, "peers": sorted(self.blockchain.peers)}
+
+    def get_status(self, path, query, body):
+        blockchain = self.blockchain
+        tip = blockchain.get_latest_block()
+        return {
+            "height": len(blockchain.chain),
+            "tip": tip.hash,
+            "tip_timestamp": tip.timestamp,
+            "difficulty": blockchain.difficulty,
+            "pending": len(blockchain.pending_transactions),
+            "peers": len(blockchain.peers),
+            "syncing": blockchain.syncing,
+            "last_sync": blockchain.last_sync,
+            "snapshot_base": blockchain.chain.base,
+            "pruned_height": blockchain.pruned_height,
+        }
+
+    def get_miner(self, path, query, body):
+        auto_miner = self.blockchain.auto_miner
+        if auto_miner is None:
+            return {"running": False}
+        return dict(auto_miner.stats(), running=True, miner=auto_miner.miner,
+                    max_pending=auto_miner.max_pending, max_wait=auto_miner.max_wait)
+
+    def send(self, path, query, body):
+        sender = self.authenticate(body)
+        receiver = self.require_user(body.get('receiver'))
+        amount = self.parse_amount(body.get('amount'))
+        tx = self.blockchain.create_transactions([(sender, receiver, amount)])[0]
+        if tx is None:
+            raise APIError(400, "insufficient funds")
+        return {"hash": tx.hash}
+
+    def send_batch(self, path, query, body):
+        sender = self.authenticate(body)
+        transfers = body.get('transfers')
+        if not isinstance(transfers, list):
+            raise APIError(400, "transfers must be a list")
+        batch = []
+        for transfer in transfers:
+            if not isinstance(transfer, dict):
+                raise APIError(400, "each transfer must be an object")
+            batch.append((sender, transfer.get('receiver'), self.parse_amount(transfer.get('amount'))))
+        results = self.blockchain.create_transactions(batch)
+        return {
+            "accepted": sum(1 for tx in results if tx is not None),
+            "hashes": [tx.hash if tx is not None else None for tx in results],
+        }
+
+    def mine(self, path, query, body):
+        miner = self.require_user(body.get('miner'))
+        start = time.time()
+        # The tip may already be a peer's block by now, so report the block this call mined
+        block = self.blockchain.mine_pending_transactions(miner)
+        if block is None:
+            raise APIError(409, "nothing valid to mine")
+        return {"block": block.index, "hash": block.hash, "seconds": round(time.time() - start, 3)}
+
+class EventStreamServer:
+    """Long-lived TCP stream of node events as newline-delimited JSON.
+
+    A client connects and sends one line: a JSON object such as
+    {"events": ["block_appended", "reorg"]}, or an empty line for every event.
+    It then receives one {"event", "time", "data"} object per line, plus a
+    heartbeat line when the node is quiet. Clients that fall `max_backlog`
+    events behind are disconnected rather than slowing the node down.
+    """
+
+    def __init__(self, blockchain: Blockchain, host: str = '127.0.0.1', port: int = 8891,
+                 max_backlog: int = 1000, heartbeat: float = 15):
+        self.blockchain = blockchain
+        self.host = host
+        self.port = port
+        self.max_backlog = max_backlog
+        self.heartbeat = heartbeat
+        self.sock = None
+        self.running = False
+
+    def start(self):
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.sock.bind((self.host, self.port))
+        self.sock.listen(16)
+        self.port = self.sock.getsockname()[1]
+        self.running = True
+        threading.Thread(target=self.accept_loop, daemon=True).start()
+        colored_print(f"📢 Event stream listening on {self.host}:{self.port}", Colors.OKGREEN, component='api')
+
+    def stop(self):
+        self.running = False
+        if self.sock:
+            self.sock.close()
+            self.sock = None
+
+    def accept_loop(self):
+        while self.running:
+            try:
+                client, addr = self.sock.accept()
+            except OSError:
+                break
+            threading.Thread(target=self.serve_client, args=(client,), daemon=True).start()
+
+    def serve_client(self, client: socket.socket):
+        backlog = queue.Queue(maxsize=self.max_backlog)
+        overflowed = threading.Event()
+
+        def handler(event, data):
+            try:
+                backlog.put_nowait((event, time.time(), data))
+            except queue.Full:
+                overflowed.set()
+
+        token = None
+        try:
+            client.settimeout(10)
+            request = client.makefile('rb').readline().strip()
+            events = json.loads(request).get('events') if request else None
+            unknown = set(events or ()) - set(EventBus.EVENTS)
+            if unknown:
+                client.sendall(json.dumps({"error": f"unknown events: {sorted(unknown)}"}).encode() + b"\n")
+                return
+
+            client.settimeout(None)
+            client.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            token = self.blockchain.events.subscribe(handler, events)
+            client.sendall(json.dumps({"event": "subscribed", "time": time.time(),
+                                       "data": {"events": events or list(EventBus.EVENTS)}}).encode() + b"\n")
+            while self.running:
+                if overflowed.is_set():
+                    client.sendall(json.dumps({"event": "overflow", "time": time.time(), "data": {}}).encode() + b"\n")
+                    break
+                try:
+                    event, timestamp, data = backlog.get(timeout=self.heartbeat)
+                except queue.Empty:
+                    event, timestamp, data = "heartbeat", time.time(), {}
+                client.sendall(json.dumps({"event": event, "time": timestamp, "data": data}).encode() + b"\n")
+        except Exception:
+            pass
+        finally:
+            if token is not None:
+                self.blockchain.events.unsubscribe(token)
+            client.close()
+
+class MetricsRequestHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if urlparse(self.path).path not in ('/', '/metrics'):
+            self.send_error(404)
+            return
+        payload = self.server.blockchain.metrics.render().encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+class MetricsServer:
+    """Serves the node's metrics in the Prometheus text format on GET /metrics"""
+
+    def __init__(self, blockchain: Blockchain, host: str = '127.0.0.1', port: int = 9100):
+        self.blockchain = blockchain
+        self.host = host
+        self.port = port
+        self.httpd = None
+
+    def start(self):
+        self.httpd = ThreadingHTTPServer((self.host, self.port), MetricsRequestHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.blockchain = self.blockchain
+        self.port = self.httpd.server_address[1]
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        colored_print(f"📈 Metrics available on http://{self.host}:{self.port}/metrics", Colors.OKGREEN, component='api')
+
+    def stop(self):
+        if self.httpd:
+            self.httpd.shutdown()
+            self.httpd.server_close()
+            self.httpd = None
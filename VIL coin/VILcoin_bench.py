@@ -0,0 +1,273 @@
+import argparse
+import gc
+import json
+import logging
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from VILcoin import Block, Blockchain, Transaction
+from VILcoin_log import Colors, colored_print
+from VILcoin_gen import ChainGenerator
+
+# Benchmark sizes; --quick divides the big ones by 10
+HASH_DIFFICULTIES = [1, 2, 3, 4, 5]
+CHAIN_SIZES = [1000, 10000, 100000]
+STORAGE_BLOCKS = 10000
+USER_COUNTS = [100, 1000, 10000]
+TXS_PER_BLOCK = 5
+
+def best_time(func, repeat: int) -> float:
+    """Fastest of `repeat` runs, with the collector out of the way"""
+    times = []
+    for _ in range(repeat):
+        gc.collect()
+        gc.disable()
+        try:
+            start = time.perf_counter()
+            func()
+            times.append(time.perf_counter() - start)
+        finally:
+            gc.enable()
+    return min(times)
+
+def quiet_blockchain(data_dir: str, difficulty: int = 1) -> Blockchain:
+    blockchain = Blockchain(start_network=False, data_dir=data_dir)
+    blockchain.min_difficulty = blockchain.max_difficulty = difficulty
+    blockchain.snapshot_interval = 0
+    # Save synchronously: timings include the write, and no writer outlives the work directory
+    blockchain.persister.stop()
+    return blockchain
+
+def generate(blockchain: Blockchain, users: int, blocks: int, seed: int = 0):
+    """Replace the node's chain and users with a synthetic chain of small blocks"""
+    generator = ChainGenerator(users, TXS_PER_BLOCK, blockchain.min_difficulty, blockchain.target_block_time,
+                               seed=seed, password="bench")
+    for username, user_data in generator.users_data().items():
+        blockchain.add_user_from_data(username, user_data)
+    blockchain.replace_chain(list(generator.blocks(blocks)))
+
+def chain_bytes(blockchain: Blockchain) -> bytes:
+    return b'[' + b', '.join(block.serialize() for block in blockchain.chain) + b']'
+
+class BenchmarkSuite:
+    def __init__(self, repeat: int = 3, quick: bool = False):
+        self.repeat = repeat
+        self.quick = quick
+        self.results = {}
+        self.workdir = tempfile.mkdtemp(prefix='vilcoin-bench-')
+
+    def size(self, n: int) -> int:
+        return max(10, n // 10) if self.quick else n
+
+    def record(self, name: str, value: float, unit: str, higher_is_better: bool = True):
+        self.results[name] = {"value": value, "unit": unit, "better": "higher" if higher_is_better else "lower"}
+        colored_print(f"  {name:<48} {value:>14,.2f} {unit}", Colors.OKBLUE, component='bench')
+
+    def bench_hashing(self):
+        colored_print("🔨 Hashing and mining", Colors.HEADER, component='bench')
+        block = Block(1, [Transaction("alice", "bob", 1.0) for _ in range(TXS_PER_BLOCK)], "0" * 64, "alice",
+                      difficulty=1)
+        calls = self.size(100000)
+        elapsed = best_time(lambda: [block.calculate_hash() for _ in range(calls)], self.repeat)
+        self.record("calculate_hash", calls / elapsed, "hashes/s")
+
+        for difficulty in HASH_DIFFICULTIES[:3] if self.quick else HASH_DIFFICULTIES:
+            # Enough blocks for a stable rate: about 16**5 hashes in total, at least 5 blocks
+            count = max(5, 16 ** 5 // 16 ** difficulty)
+            hashes = 0
+            start = time.perf_counter()
+            for i in range(count):
+                candidate = Block(i, block.transactions, "0" * 64, "alice", difficulty=difficulty)
+                candidate.mine_block(difficulty)
+                hashes += candidate.nonce + 1
+            elapsed = time.perf_counter() - start
+            self.record(f"mine_block[d={difficulty}]", hashes / elapsed, "hashes/s")
+            self.record(f"mine_block[d={difficulty}].time_per_block", elapsed / count * 1000, "ms", False)
+
+    def bench_validation(self):
+        colored_print("✅ Chain validation", Colors.HEADER, component='bench')
+        for blocks in CHAIN_SIZES:
+            blocks = self.size(blocks)
+            blockchain = quiet_blockchain(os.path.join(self.workdir, f"validate{blocks}"))
+            generate(blockchain, 100, blocks)
+            data = json.loads(chain_bytes(blockchain))
+
+            def validate():
+                # Fresh blocks each run, so no hash check is served from a previous run's cache
+                chain = blockchain.deserialize_chain(data)
+                start = time.perf_counter()
+                assert blockchain.is_valid_chain(chain)
+                return time.perf_counter() - start
+
+            gc.collect()
+            elapsed = min(validate() for _ in range(self.repeat))
+            self.record(f"is_valid_chain[{blocks}]", blocks / elapsed, "blocks/s")
+            self.record(f"is_valid_chain[{blocks}].time", elapsed * 1000, "ms", False)
+
+    def bench_storage(self):
+        colored_print("💾 Save / load", Colors.HEADER, component='bench')
+        blocks = self.size(STORAGE_BLOCKS)
+        data_dir = os.path.join(self.workdir, "storage")
+        blockchain = quiet_blockchain(data_dir)
+        generate(blockchain, 1000, blocks)
+
+        def full_save():
+            # Without blocks.dat every block is written again, as on a first save
+            if os.path.exists(blockchain.store.blocks_path):
+                os.remove(blockchain.store.blocks_path)
+            blockchain.save_data()
+
+        elapsed = best_time(full_save, self.repeat)
+        self.record(f"save_data[{blocks}]", elapsed * 1000, "ms", False)
+        elapsed = best_time(blockchain.save_data, self.repeat)
+        self.record(f"save_data[{blocks}].incremental", elapsed * 1000, "ms", False)
+        self.record(f"save_data[{blocks}].file_size", blockchain.store.size() / 2 ** 20, "MiB", False)
+
+        loader = quiet_blockchain(data_dir)
+        elapsed = best_time(loader.load_data, self.repeat)
+        self.record(f"load_data[{blocks}]", elapsed * 1000, "ms", False)
+
+        # Peak memory is measured in separate runs: tracemalloc slows everything down
+        del loader
+        gc.collect()
+        tracemalloc.start()
+        loader = quiet_blockchain(data_dir)
+        loaded, peak = tracemalloc.get_traced_memory()
+        if hasattr(tracemalloc, 'reset_peak'):
+            tracemalloc.reset_peak()
+            loader.save_data()
+            _, save_peak = tracemalloc.get_traced_memory()
+        else:
+            # Python < 3.9: restart tracing and add what was already allocated
+            tracemalloc.stop()
+            tracemalloc.start()
+            loader.save_data()
+            save_peak = loaded + tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        self.record(f"load_data[{blocks}].peak_memory", peak / 2 ** 20, "MiB", False)
+        self.record(f"save_data[{blocks}].peak_memory", save_peak / 2 ** 20, "MiB", False)
+
+    def bench_balances(self):
+        colored_print("💰 Balances and mining against user count", Colors.HEADER, component='bench')
+        for users in USER_COUNTS:
+            users = self.size(users)
+            blockchain = quiet_blockchain(os.path.join(self.workdir, f"users{users}"))
+            generate(blockchain, users, self.size(1000))
+            usernames = list(blockchain.users)
+
+            elapsed = best_time(lambda: [blockchain.get_balance(name) for name in usernames], self.repeat)
+            self.record(f"get_balance[users={users}]", len(usernames) / elapsed, "calls/s")
+
+            rng = random.Random(users)
+            ids = list(blockchain.id_to_username)
+
+            def mine():
+                blockchain.pending_transactions = [Transaction(rng.choice(ids), rng.choice(ids), 0.01)
+                                                   for _ in range(100)]
+                assert blockchain.mine_pending_transactions(usernames[0])
+
+            elapsed = best_time(mine, self.repeat)
+            self.record(f"mine_pending_transactions[users={users}]", elapsed * 1000, "ms", False)
+
+    def bench_deserialize(self):
+        colored_print("📦 Deserialization", Colors.HEADER, component='bench')
+        blocks = self.size(STORAGE_BLOCKS)
+        blockchain = quiet_blockchain(os.path.join(self.workdir, "deserialize"))
+        generate(blockchain, 100, blocks)
+        raw = chain_bytes(blockchain)
+        data = json.loads(raw)
+
+        elapsed = best_time(lambda: json.loads(raw), self.repeat)
+        self.record(f"json_loads[{blocks}]", len(raw) / elapsed / 2 ** 20, "MiB/s")
+        elapsed = best_time(lambda: blockchain.deserialize_chain(data), self.repeat)
+        self.record(f"deserialize_chain[{blocks}]", blocks / elapsed, "blocks/s")
+        transactions = sum(len(block_data['transactions']) for block_data in data)
+        self.record(f"deserialize_chain[{blocks}].transactions", transactions / elapsed, "tx/s")
+
+    GROUPS = {
+        "hashing": bench_hashing,
+        "validation": bench_validation,
+        "storage": bench_storage,
+        "balances": bench_balances,
+        "deserialize": bench_deserialize,
+    }
+
+    def run(self, groups=None) -> dict:
+        try:
+            for group in groups or self.GROUPS:
+                self.GROUPS[group](self)
+        finally:
+            shutil.rmtree(self.workdir, ignore_errors=True)
+        return {
+            "meta": {
+                "time": time.time(),
+                "python": platform.python_version(),
+                "implementation": platform.python_implementation(),
+                "machine": platform.machine(),
+                "platform": platform.platform(),
+                "repeat": self.repeat,
+                "quick": self.quick,
+            },
+            "results": self.results,
+        }
+
+def compare(report: dict, baseline: dict, threshold: float) -> int:
+    """Print the change of every result against the baseline; returns the number of regressions"""
+    colored_print(f"📊 Compared with baseline (threshold {threshold:.0%})", Colors.HEADER, component='bench')
+    regressions = 0
+    for name, result in report["results"].items():
+        base = baseline.get("results", {}).get(name)
+        if not base or not base["value"]:
+            colored_print(f"  {name:<48} (new)", Colors.OKCYAN, component='bench')
+            continue
+        change = result["value"] / base["value"] - 1
+        improvement = change if result["better"] == "higher" else -change
+        if improvement < -threshold:
+            regressions += 1
+            color, mark = Colors.FAIL, "❌"
+        elif improvement > threshold:
+            color, mark = Colors.OKGREEN, "🚀"
+        else:
+            color, mark = Colors.ENDC, "  "
+        colored_print(f"{mark} {name:<48} {base['value']:>14,.2f} -> {result['value']:>14,.2f} {result['unit']} "
+                      f"({change:+.1%})", color, component='bench')
+    if regressions:
+        colored_print(f"❌ {regressions} regressions beyond {threshold:.0%}", Colors.FAIL, component='bench')
+    else:
+        colored_print("✅ No regressions", Colors.OKGREEN, component='bench')
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the VIL Coin hot paths")
+    parser.add_argument('--only', action='append', choices=list(BenchmarkSuite.GROUPS),
+                        help="run only this group (repeatable)")
+    parser.add_argument('--repeat', type=int, default=3, help="runs per timing, the fastest counts")
+    parser.add_argument('--quick', action='store_true', help="a tenth of the sizes, for a fast check")
+    parser.add_argument('--output', '-o', help="write the results as JSON to this file")
+    parser.add_argument('--compare', metavar='BASELINE', help="compare with a JSON file written by --output")
+    parser.add_argument('--threshold', type=float, default=0.10, help="relative change counted as a regression")
+    args = parser.parse_args()
+
+    # The nodes' own messages would only slow the measured paths down
+    logging.getLogger('vilcoin.node').setLevel(logging.ERROR)
+    report = BenchmarkSuite(args.repeat, args.quick).run(args.only)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        colored_print(f"💾 Results written to {args.output}", Colors.OKGREEN, component='bench')
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if compare(report, baseline, args.threshold):
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+import argparse
+import signal
+import threading
+
+from VILcoin import Blockchain
+from VILcoin_log import Colors, add_logging_arguments, colored_print, setup_logging
+from VILcoin_trace import add_tracing_arguments, start_tracing
+
+class NodeDaemon:
+    """A node with no prompts: network server, periodic sync and optional miner"""
+
+    def __init__(self, args):
+        self.args = args
+        self.stop_event = threading.Event()
+        self.blockchain = None
+        self.api = None
+        self.metrics = None
+        self.events = None
+
+    def start(self):
+        args = self.args
+        self.blockchain = Blockchain(prune_depth=args.prune, server_port=args.port, discover=args.discover,
+                                     data_dir=args.data_dir)
+        if args.difficulty:
+            # Blocks mined at any other difficulty are rejected, so this node forks off from every node not given the same value
+            colored_print(f"⚠️  Test network mode: fixed difficulty {args.difficulty}, this node splits from every node "
+                          f"not run with the same --difficulty", Colors.WARNING, component='daemon')
+            self.blockchain.min_difficulty = self.blockchain.max_difficulty = args.difficulty
+        self.blockchain.persister.delay = args.save_delay
+
+        for peer in args.peer:
+            self.blockchain.add_peer(peer)
+
+        if args.api:
+            from VILcoin_api import APIServer
+            host, _, port = args.api.rpartition(':')
+            self.api = APIServer(self.blockchain, host or '127.0.0.1', int(port), args.api_workers)
+            self.api.start()
+
+        if args.events:
+            from VILcoin_api import EventStreamServer
+            host, _, port = args.events.rpartition(':')
+            self.events = EventStreamServer(self.blockchain, host or '127.0.0.1', int(port))
+            self.events.start()
+
+        if args.metrics:
+            from VILcoin_api import MetricsServer
+            host, _, port = args.metrics.rpartition(':')
+            self.metrics = MetricsServer(self.blockchain, host or '127.0.0.1', int(port))
+            self.metrics.start()
+
+        threading.Thread(target=self.sync_loop, daemon=True).start()
+        if args.auto_mine:
+            if args.auto_mine not in self.blockchain.users:
+                colored_print(f"⚠️  Auto-mine user {args.auto_mine} does not exist yet, waiting for it to sync", Colors.WARNING, component='daemon')
+            self.blockchain.start_auto_miner(args.auto_mine, args.mine_batch, args.mine_wait)
+
+        colored_print(f"🛰️  Node daemon running on port {args.port} (height: {len(self.blockchain.chain)})", Colors.OKGREEN, component='daemon')
+
+    def sync_loop(self):
+        # Discovery already runs a sync after its LAN scan
+        if not self.args.discover and self.blockchain.peers:
+            self.sync()
+        while not self.stop_event.wait(self.args.sync_interval):
+            if self.blockchain.peers:
+                self.sync()
+
+    def sync(self):
+        try:
+            self.blockchain.sync_with_network()
+        except Exception as e:
+            colored_print(f"❌ Sync failed: {e}", Colors.FAIL, component='daemon')
+
+    def run(self):
+        self.start()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(signum, self.handle_signal)
+        while not self.stop_event.wait(1):
+            pass
+        self.shutdown()
+
+    def handle_signal(self, signum, frame):
+        colored_print(f"🛑 Received signal {signum}, shutting down...", Colors.WARNING, component='daemon')
+        self.stop_event.set()
+
+    def shutdown(self):
+        if self.api:
+            self.api.stop()
+        if self.events:
+            self.events.stop()
+        if self.metrics:
+            self.metrics.stop()
+        self.blockchain.stop_network_server()
+        if self.blockchain.auto_miner:
+            stats = self.blockchain.auto_miner.stats()
+            self.blockchain.stop_auto_miner()
+            if stats.get('transactions_confirmed'):
+                colored_print(f"⏱️  Confirmed {stats['transactions_confirmed']} transactions in {stats['blocks_mined']} blocks, "
+                              f"latency p50 {stats['latency_p50']:.2f}s / p95 {stats['latency_p95']:.2f}s", Colors.OKBLUE, component='daemon')
+        # Wait for a block being added or mined to finish, then write what is still unsaved
+        with self.blockchain.sync_lock:
+            self.blockchain.persister.stop()
+        colored_print("💾 Node data saved, goodbye!", Colors.OKGREEN, component='daemon')
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a VIL Coin node without the interactive menu")
+    parser.add_argument('--data-dir', help="directory holding the node's data (created if missing)")
+    parser.add_argument('--port', type=int, default=8888, help="P2P listen port")
+    parser.add_argument('--testnet', action='store_true', help="allow test network settings such as --difficulty")
+    parser.add_argument('--difficulty', type=int, help="fixed mining difficulty instead of retargeting; needs --testnet, and splits "
+                                                       "this node from every node not run with the same value")
+    parser.add_argument('--peer', action='append', default=[], metavar='IP[:PORT]', help="peer to connect to (repeatable, port defaults to 8888)")
+    parser.add_argument('--no-discover', dest='discover', action='store_false', help="don't scan the LAN for peers")
+    parser.add_argument('--sync-interval', type=float, default=60, help="seconds between syncs with peers")
+    parser.add_argument('--auto-mine', metavar='USER', help="mine pending transactions as USER")
+    parser.add_argument('--mine-batch', type=int, default=100, metavar='N', help="auto-mine once N transactions are pending")
+    parser.add_argument('--mine-wait', type=float, default=10, metavar='SECONDS', help="auto-mine once the oldest pending transaction is this old")
+    parser.add_argument('--api', metavar='[HOST:]PORT', help="serve the local HTTP/JSON API")
+    parser.add_argument('--api-workers', type=int, default=16, metavar='N', help="threads serving API connections")
+    parser.add_argument('--events', metavar='[HOST:]PORT', help="serve the newline-delimited JSON event stream")
+    parser.add_argument('--metrics', metavar='[HOST:]PORT', help="serve Prometheus metrics on /metrics")
+    parser.add_argument('--prune', type=int, metavar='DEPTH', help="keep transaction bodies only for the last DEPTH blocks")
+    parser.add_argument('--save-delay', type=float, default=1.0, metavar='SECONDS', help="save once changes stop for this long")
+    add_logging_arguments(parser)
+    add_tracing_arguments(parser)
+    args = parser.parse_args()
+    if args.difficulty and not args.testnet:
+        parser.error("--difficulty forks this node off the main network; add --testnet if that is what you want")
+    setup_logging(args.log_level, args.log_json, args.log_file)
+    start_tracing(args)
+    NodeDaemon(args).run()
+
+if __name__ == "__main__":
+    main()
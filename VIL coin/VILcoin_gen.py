@@ -0,0 +1,162 @@
+import argparse
+import gzip
+import json
+import math
+import os
+import random
+import string
+import time
+
+from VILcoin import Block, Transaction, User
+from VILcoin_log import Colors, colored_print
+from VILcoin_store import ChainStore
+
+class ChainGenerator:
+    """Builds a valid chain of random transfers between synthetic users.
+
+    Every transfer is covered by its sender's balance at that point, every
+    block carries the usual mining reward and is mined at `difficulty`, and
+    timestamps are `block_time` apart, ending at the present. A node loading
+    the result must mine at the same fixed difficulty (e.g. the daemon's
+    --difficulty) unless `difficulty` is within its normal range.
+
+    `skew` shapes who transacts: 0 picks users uniformly, higher values make a
+    few users account for most of the traffic (Zipf-like weights).
+    """
+
+    def __init__(self, users: int = 100, txs_per_block=(50, 150), difficulty: int = 3, block_time: float = 60,
+                 skew: float = 0.0, max_amount: float = 50, mining_reward: float = 2, seed: int = None,
+                 password: str = "password"):
+        self.rng = random.Random(seed)
+        self.txs_per_block = txs_per_block if isinstance(txs_per_block, tuple) else (txs_per_block, txs_per_block)
+        self.difficulty = difficulty
+        self.block_time = block_time
+        self.max_amount = max_amount
+        self.mining_reward = mining_reward
+        self.users = {}
+        for i in range(users):
+            user_id = ''.join(self.rng.choices(string.ascii_uppercase + string.digits, k=10))
+            self.users[f"user{i}"] = User(f"user{i}", password, user_id=user_id)
+        self.ids = [user.user_id for user in self.users.values()]
+        self.weights = [1 / (rank + 1) ** skew for rank in range(users)] if skew else None
+        # Every account starts with User.balance, on top of what the chain gives it
+        self.balances = {user.user_id: user.balance for user in self.users.values()}
+        self.transactions = 0
+
+    def pick(self, count: int):
+        return self.rng.choices(self.ids, weights=self.weights, k=count)
+
+    def block_size(self) -> int:
+        return self.rng.randint(*self.txs_per_block)
+
+    def transfers(self, count: int, timestamp: float):
+        transactions = []
+        senders = self.pick(count)
+        receivers = self.pick(count)
+        for sender, receiver in zip(senders, receivers):
+            available = self.balances[sender]
+            if available < 0.01:
+                continue
+            amount = round(self.rng.uniform(0.01, min(self.max_amount, available)), 2)
+            self.balances[sender] -= amount
+            self.balances[receiver] += amount
+            transactions.append(Transaction(sender, receiver, amount, timestamp))
+        return transactions
+
+    def blocks(self, count: int):
+        """Yield `count` blocks, genesis first"""
+        timestamp = time.time() - count * self.block_time
+        # A genesis carrying the difficulty lets block 1 use it too; after a legacy genesis it would have to be 5
+        previous = Block(0, [], "0", timestamp=timestamp, difficulty=self.difficulty)
+        yield previous
+        for index in range(1, count):
+            timestamp += self.block_time
+            transactions = self.transfers(self.block_size(), timestamp)
+            miner = self.pick(1)[0]
+            transactions.append(Transaction("SYSTEM", miner, self.mining_reward, timestamp, tx_type="mining_reward"))
+            self.balances[miner] += self.mining_reward
+            self.transactions += len(transactions) - 1
+
+            block = Block(index, transactions, previous.hash, miner, timestamp=timestamp, difficulty=self.difficulty)
+            block.mine_block(self.difficulty)
+            yield block
+            previous = block
+
+    def blocks_for(self, transactions: int) -> int:
+        """Blocks needed, genesis included, for about `transactions` transfers"""
+        return 1 + math.ceil(transactions / (sum(self.txs_per_block) / 2))
+
+    def pending(self, count: int):
+        return self.transfers(count, time.time())
+
+    def users_data(self) -> dict:
+        return {username: user.to_dict() for username, user in self.users.items()}
+
+    def write_data(self, data_dir: str, blocks: int, pending: int = 0):
+        """Write a node's data directory (see ChainStore), streaming blocks to disk as they are mined"""
+        state = {'format': 'vilcoin-state', 'version': 1, 'pruned_height': 0, 'snapshot': None,
+                 'users': self.users_data()}
+        ChainStore(data_dir).checkpoint(self.progress(self.blocks(blocks), blocks), 0, state, self.pending(pending))
+
+    def write_export(self, path: str, blocks: int):
+        """Write the line-delimited format read by `VILcoin.py import`"""
+        opener = gzip.open if path.endswith('.gz') else open
+        with opener(path, 'wb') as f:
+            f.write(json.dumps({'format': 'vilcoin-chain', 'version': 1, 'height': blocks}).encode() + b'\n')
+            for block in self.progress(self.blocks(blocks), blocks):
+                f.write(block.serialize())
+                f.write(b'\n')
+
+    def progress(self, blocks, total: int, every: int = 1000):
+        start = time.time()
+        for block in blocks:
+            yield block
+            if block.index and block.index % every == 0:
+                rate = block.index / max(time.time() - start, 1e-9)
+                colored_print(f"⛓️  {block.index}/{total} blocks, {self.transactions} transactions ({rate:.0f} blocks/s)",
+                              Colors.OKBLUE, component='gen')
+
+def parse_range(value: str):
+    low, _, high = value.partition('-')
+    return int(low), int(high or low)
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic VIL Coin chain for load tests and benchmarks")
+    parser.add_argument('output', help="data directory to create (or an export file with --export)")
+    size = parser.add_mutually_exclusive_group()
+    size.add_argument('--transactions', type=int, default=10000, help="about this many transfers in total")
+    size.add_argument('--blocks', type=int, help="exactly this many blocks instead")
+    parser.add_argument('--users', type=int, default=100)
+    parser.add_argument('--txs-per-block', type=parse_range, default=(50, 150), metavar='N or MIN-MAX')
+    parser.add_argument('--difficulty', type=int, default=3, help="below 3, nodes must run with the same --difficulty")
+    parser.add_argument('--block-time', type=float, default=60, help="seconds between block timestamps")
+    parser.add_argument('--skew', type=float, default=0.0, help="0 = uniform users, 1+ = a few hot users")
+    parser.add_argument('--max-amount', type=float, default=50)
+    parser.add_argument('--pending', type=int, default=0, help="transfers left in the mempool")
+    parser.add_argument('--password', default="password", help="password of every generated user")
+    parser.add_argument('--seed', type=int)
+    parser.add_argument('--export', action='store_true', help="write an export file instead of a data directory")
+    args = parser.parse_args()
+
+    generator = ChainGenerator(args.users, args.txs_per_block, args.difficulty, args.block_time, args.skew,
+                               args.max_amount, seed=args.seed, password=args.password)
+    blocks = args.blocks or generator.blocks_for(args.transactions)
+    start = time.time()
+
+    if args.export:
+        generator.write_export(args.output, blocks)
+        target = args.output
+    else:
+        os.makedirs(args.output, exist_ok=True)
+        target = args.output
+        store = ChainStore(target)
+        if store.exists() or os.path.exists(store.blocks_path):
+            colored_print(f"❌ {target} already holds a node's data", Colors.FAIL, component='gen')
+            return
+        generator.write_data(target, blocks, args.pending)
+
+    colored_print(f"✅ Wrote {blocks} blocks, {generator.transactions} transactions and {args.users} users to {target} "
+                  f"in {time.time() - start:.1f}s", Colors.OKGREEN, component='gen')
+
+if __name__ == "__main__":
+    main()
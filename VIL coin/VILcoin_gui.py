@@ -2,8 +2,7 @@ import tkinter as tk
 from tkinter import ttk, messagebox, scrolledtext
 import threading
 from datetime import datetime
-from VILcoin import Blockchain, Colors
-from datetime import datetime
+from VILcoin import Blockchain, Colors, setup_logging
 import sys
 import queue
 import os
@@ -13,14 +12,18 @@ if os.name == 'nt':
     ctypes.windll.user32.ShowWindow(ctypes.windll.kernel32.GetConsoleWindow(), 0)
 
 class ConsoleRedirector:
-    def __init__(self, console_callback):
-        self.console_callback = console_callback
-        self.queue = queue.Queue()
+    """Copies output to the real stdout and queues it for the console widget.
+
+    Any thread may print; only the Tk thread (poll_console) touches widgets.
+    """
+    def __init__(self, console_queue):
+        self.queue = console_queue
         
     def write(self, message):
         if message.strip(): 
-            self.console_callback(message.strip())
-        sys.__stdout__.write(message)
+            self.queue.put(message.strip())
+        if sys.__stdout__:
+            sys.__stdout__.write(message)
     
     def flush(self):
         sys.__stdout__.flush()
@@ -47,16 +50,23 @@ class VILCoinGUI:
             'text_dim': '#a0a0b0'
         }
         
-        sys.stdout = ConsoleRedirector(self.buffer_console_message)
-        sys.stderr = ConsoleRedirector(self.buffer_console_message)
+        self.console_queue = queue.Queue()
+        sys.stdout = ConsoleRedirector(self.console_queue)
+        sys.stderr = ConsoleRedirector(self.console_queue)
+        # Colour codes would show up as text in the console widget
+        setup_logging(color=False)
         
         self.blockchain = None
+        self.event_queue = queue.Queue()
+        self.balance_label = None
         self.init_blockchain()
         
         self.main_container = tk.Frame(root, bg=self.colors['bg_dark'])
         self.main_container.pack(fill=tk.BOTH, expand=True)
         
         self.root.after(100, self.setup_fullscreen)
+        self.root.after(500, self.poll_events)
+        self.root.after(100, self.poll_console)
         
         self.setup_styles()
         
@@ -74,6 +84,16 @@ class VILCoinGUI:
             except tk.TclError:
                 pass
 
+    def poll_console(self, max_messages=200):
+        # Floods are shown in batches; whatever is left waits for the next poll
+        for _ in range(max_messages):
+            try:
+                message = self.console_queue.get_nowait()
+            except queue.Empty:
+                break
+            self.buffer_console_message(message)
+        self.root.after(100, self.poll_console)
+
     def display_console_message(self, message):
         self.console_text.config(state=tk.NORMAL)
         timestamp = datetime.now().strftime("%H:%M:%S")
@@ -176,12 +196,31 @@ class VILCoinGUI:
     
     def init_blockchain(self):
         def init():
-            self.blockchain = Blockchain()
+            blockchain = Blockchain()
+            # Node events arrive on network threads; they are queued and handled in poll_events
+            blockchain.events.subscribe(lambda event, data: self.event_queue.put(event),
+                                        ('block_appended', 'tx_received', 'reorg'))
+            self.blockchain = blockchain
         
         thread = threading.Thread(target=init, daemon=True)
         thread.start()
     
+    def poll_events(self):
+        changed = False
+        while not self.event_queue.empty():
+            self.event_queue.get_nowait()
+            changed = True
+        
+        if changed and self.balance_label is not None and self.blockchain and self.blockchain.current_user:
+            try:
+                balance = self.blockchain.get_balance(self.blockchain.current_user)
+                self.balance_label.config(text=f"{balance:.2f} VIL")
+            except tk.TclError:
+                self.balance_label = None
+        self.root.after(500, self.poll_events)
+    
     def clear_container(self):
+        self.balance_label = None
         for widget in self.main_container.winfo_children():
             widget.destroy()
     
@@ -514,7 +553,8 @@ class VILCoinGUI:
 
         balance = self.blockchain.get_balance(self.blockchain.current_user)
         balance_text = f"{balance:.2f} VIL"
-        ttk.Label(balance_display, text=balance_text, style='Balance.TLabel').pack(side=tk.LEFT)
+        self.balance_label = ttk.Label(balance_display, text=balance_text, style='Balance.TLabel')
+        self.balance_label.pack(side=tk.LEFT)
         
         right_half = tk.Frame(balance_card, bg='#1a1a2e')
         right_half.pack(side=tk.RIGHT, fill=tk.BOTH, expand=True)
@@ -828,7 +868,9 @@ class VILCoinGUI:
             text_area.insert(tk.END, f"  🔗 Previous:  {block.previous_hash[:50]}...\n")
             text_area.insert(tk.END, f"  🎲 Nonce:     {block.nonce}\n\n")
             
-            if block.transactions:
+            if block.pruned:
+                text_area.insert(tk.END, "  ✂️ Transactions pruned\n")
+            elif block.transactions:
                 text_area.insert(tk.END, f"  💼 Transactions ({len(block.transactions)}):\n")
                 text_area.insert(tk.END, f"  {'-' * 71}\n")
                 for tx in block.transactions:
@@ -885,7 +927,7 @@ class VILCoinGUI:
             text_area.insert(tk.END, "  │" + " " * 58 + "│\n")
             text_area.insert(tk.END, "  " + "─" * 60 + "\n")
         else:
-            for i, tx in enumerate(self.blockchain.pending_transactions, 1):
+            for i, tx in enumerate(self.blockchain.pending_snapshot(), 1):
                 timestamp_str = datetime.fromtimestamp(tx.timestamp).strftime('%Y-%m-%d %H:%M:%S')
                 
                 text_area.insert(tk.END, f"\n  [{i}] {timestamp_str}\n")
@@ -931,7 +973,7 @@ class VILCoinGUI:
         canvas.create_window((0, 0), window=scrollable, anchor="nw")
         canvas.configure(yscrollcommand=scrollbar.set)
         
-        for username, user in self.blockchain.users.items():
+        for username, user in self.blockchain.users_snapshot().items():
             user_card = self.create_card(scrollable)
             user_card.pack(fill=tk.X, pady=5, expand=True)
             
@@ -1088,7 +1130,7 @@ class VILCoinGUI:
                 def scan():
                     discovered = self.blockchain.scan_for_peers()
                     for peer in discovered:
-                        self.blockchain.peers.add(peer)
+                        self.blockchain.add_peer(peer)
                     progress.destroy()
                     
                     if self.blockchain.peers:
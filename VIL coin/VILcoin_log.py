@@ -0,0 +1,152 @@
+import argparse
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+import threading
+
+class Colors:
+    HEADER = '\033[95m'
+    OKBLUE = '\033[94m'
+    OKCYAN = '\033[96m'
+    OKGREEN = '\033[92m'
+    WARNING = '\033[93m'
+    FAIL = '\033[91m'
+    ENDC = '\033[0m'
+    BOLD = '\033[1m'
+    UNDERLINE = '\033[4m'
+
+# Output goes through the "vilcoin.<component>" loggers; the colour is only a hint for ColorFormatter
+COLOR_LEVELS = {Colors.FAIL: logging.ERROR, Colors.WARNING: logging.WARNING}
+LEVEL_COLORS = {logging.DEBUG: Colors.ENDC, logging.INFO: Colors.OKBLUE, logging.WARNING: Colors.WARNING,
+                logging.ERROR: Colors.FAIL, logging.CRITICAL: Colors.FAIL}
+_loggers = {}
+_log_listener = None
+
+class ColorFormatter(logging.Formatter):
+    def __init__(self, color: bool = True):
+        super().__init__()
+        self.color = color
+
+    def format(self, record: logging.LogRecord) -> str:
+        message = record.getMessage()
+        if not self.color:
+            return message
+        color = getattr(record, 'color', None) or LEVEL_COLORS.get(record.levelno, Colors.ENDC)
+        return f"{color}{message}{Colors.ENDC}"
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: time, level, component, message, thread"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        return json.dumps({
+            'time': record.created,
+            'level': record.levelname.lower(),
+            'component': record.name.partition('.')[2] or record.name,
+            'message': record.getMessage(),
+            'thread': record.threadName,
+        }, ensure_ascii=False)
+
+class ConsoleHandler(logging.StreamHandler):
+    """Writes to whatever sys.stdout is at the time, so redirections (the GUI console) still see it"""
+
+    def emit(self, record: logging.LogRecord) -> None:
+        self.stream = sys.stdout
+        super().emit(record)
+
+class RateLimitFilter(logging.Filter):
+    """Lets at most `burst` node records per call site through every `interval` seconds.
+
+    Floods of the same message (one line per received transaction) are cut
+    down to a sample, followed by a count of what was dropped. Output of the
+    tools and the CLI (other loggers than `prefix`) is never limited.
+    """
+
+    def __init__(self, burst: int = 20, interval: float = 10, prefix: str = 'vilcoin.node'):
+        super().__init__()
+        self.prefix = prefix
+        self.burst = burst
+        self.interval = interval
+        self.sites = {}
+        self.lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not record.name.startswith(self.prefix):
+            return True
+        site = (record.pathname, record.lineno)
+        with self.lock:
+            window_start, count, suppressed = self.sites.get(site, (record.created, 0, 0))
+            if record.created - window_start >= self.interval:
+                if suppressed:
+                    record.msg = f"{record.msg} (+{suppressed} similar messages suppressed)"
+                self.sites[site] = (record.created, 1, 0)
+                return True
+            if count < self.burst:
+                self.sites[site] = (window_start, count + 1, suppressed)
+                return True
+            self.sites[site] = (window_start, count, suppressed + 1)
+            return False
+
+def setup_logging(level='INFO', json_format: bool = False, log_file: str = None, color: bool = True,
+                  burst: int = 20, interval: float = 10) -> None:
+    """Route node output through a queue to a background writer thread.
+
+    Callers only pay for putting a record on the queue; formatting and
+    writing happen on the listener thread. Interactive CLI output
+    ("vilcoin.cli") is written synchronously so it stays in order with
+    prompts, and is never rate limited.
+    """
+    global _log_listener
+    if _log_listener is not None:
+        _log_listener.stop()
+
+    formatter = JsonFormatter() if json_format else ColorFormatter(color)
+    console = ConsoleHandler()
+    console.setFormatter(formatter)
+    handlers = [console]
+    if log_file:
+        file_handler = logging.FileHandler(log_file, encoding='utf-8')
+        file_handler.setFormatter(JsonFormatter() if json_format else ColorFormatter(color=False))
+        handlers.append(file_handler)
+
+    log_queue = queue.Queue()
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    queue_handler.addFilter(RateLimitFilter(burst, interval))
+    logger = logging.getLogger('vilcoin')
+    logger.handlers = [queue_handler]
+    logger.setLevel(level.upper() if isinstance(level, str) else level)
+    logger.propagate = False
+
+    cli_logger = logging.getLogger('vilcoin.cli')
+    cli_logger.handlers = handlers
+    # --log-level filters node diagnostics, never the menus and answers the user asked for
+    cli_logger.setLevel(logging.DEBUG)
+    cli_logger.propagate = False
+
+    _log_listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _log_listener.start()
+
+def add_logging_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument('--log-level', default='INFO', choices=['DEBUG', 'INFO', 'WARNING', 'ERROR'],
+                        help="lowest level of node messages to show")
+    parser.add_argument('--log-json', action='store_true', help="log one JSON object per line instead of coloured text")
+    parser.add_argument('--log-file', help="also write the log to this file")
+
+def _stop_logging():
+    if _log_listener is not None:
+        _log_listener.stop()
+
+atexit.register(_stop_logging)
+
+def colored_print(text, color, component: str = 'node'):
+    """Log `text` from `component`; the level follows the colour (FAIL is an error, WARNING a warning)"""
+    if _log_listener is None:
+        setup_logging()
+    logger = _loggers.get(component)
+    if logger is None:
+        logger = _loggers[component] = logging.getLogger('vilcoin.' + component)
+    level = COLOR_LEVELS.get(color, logging.INFO)
+    if logger.isEnabledFor(level):
+        logger.log(level, text, extra={'color': color}, stacklevel=2)
@@ -0,0 +1,144 @@
+import threading
+from bisect import bisect_left
+from typing import TYPE_CHECKING, Callable, List
+
+if TYPE_CHECKING:
+    from VILcoin import Blockchain
+
+class Metric:
+    """One named metric with optional labels; values are kept per label combination"""
+    kind = None
+
+    def __init__(self, name: str, help_text: str, labels=()):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def key(self, labels: dict) -> tuple:
+        return tuple(str(labels.get(label, '')) for label in self.labels)
+
+    def label_text(self, key: tuple, extra: str = '') -> str:
+        pairs = [f'{label}="{value}"' for label, value in zip(self.labels, key)]
+        if extra:
+            pairs.append(extra)
+        return '{' + ','.join(pairs) + '}' if pairs else ''
+
+    def samples(self):
+        """(suffix, key, extra label, value) lines to expose"""
+        with self.lock:
+            return [('', key, '', value) for key, value in sorted(self.values.items())]
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for suffix, key, extra, value in self.samples():
+            lines.append(f"{self.name}{suffix}{self.label_text(key, extra)} {value if isinstance(value, int) else repr(float(value))}")
+        return lines
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self.key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+class Gauge(Metric):
+    """A value that goes up and down; with `function` it is read when scraped"""
+    kind = 'gauge'
+
+    def __init__(self, name: str, help_text: str, labels=(), function: Callable[[], float] = None):
+        super().__init__(name, help_text, labels)
+        self.function = function
+
+    def set(self, value: float, **labels) -> None:
+        with self.lock:
+            self.values[self.key(labels)] = value
+
+    def samples(self):
+        if self.function is not None:
+            return [('', (), '', self.function())]
+        return super().samples()
+
+class Histogram(Metric):
+    kind = 'histogram'
+    DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30, 60, 300)
+
+    def __init__(self, name: str, help_text: str, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels) -> None:
+        key = self.key(labels)
+        with self.lock:
+            counts = self.values.get(key)
+            if counts is None:
+                # Per-bucket counts, then +Inf, sum
+                counts = self.values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            counts[bisect_left(self.buckets, value)] += 1
+            counts[-1] += value
+
+    def samples(self):
+        samples = []
+        with self.lock:
+            for key, counts in sorted(self.values.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float('inf'),), counts):
+                    cumulative += count
+                    le = '+Inf' if bound == float('inf') else f'{bound:g}'
+                    samples.append(('_bucket', key, f'le="{le}"', cumulative))
+                samples.append(('_sum', key, '', counts[-1]))
+                samples.append(('_count', key, '', cumulative))
+        return samples
+
+class MetricsRegistry:
+    def __init__(self):
+        self.metrics = {}
+
+    def register(self, metric: Metric) -> Metric:
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help_text: str, labels=()) -> Counter:
+        return self.register(Counter(name, help_text, labels))
+
+    def gauge(self, name: str, help_text: str, labels=(), function: Callable[[], float] = None) -> Gauge:
+        return self.register(Gauge(name, help_text, labels, function))
+
+    def histogram(self, name: str, help_text: str, labels=(), buckets=Histogram.DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, help_text, labels, buckets))
+
+    def render(self) -> str:
+        """Everything in the Prometheus text exposition format"""
+        lines = []
+        for metric in list(self.metrics.values()):
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+class NodeMetrics(MetricsRegistry):
+    """The metrics a Blockchain node keeps about itself"""
+
+    def __init__(self, blockchain: 'Blockchain'):
+        super().__init__()
+        self.hashes = self.counter('vilcoin_hashes_total', "Hashes computed while mining")
+        self.hash_rate = self.gauge('vilcoin_hash_rate', "Hashes per second of the last mined block")
+        self.mining_seconds = self.histogram('vilcoin_block_mining_seconds', "Time to mine a block")
+        self.blocks_mined = self.counter('vilcoin_blocks_mined_total', "Blocks mined by this node")
+        self.blocks_received = self.counter('vilcoin_blocks_received_total', "Blocks announced by peers, by outcome",
+                                            ('status',))
+        self.transactions_received = self.counter('vilcoin_transactions_received_total',
+                                                  "New transactions received from peers")
+        self.validation_seconds = self.histogram('vilcoin_validation_seconds', "Time to validate blocks, by what was validated",
+                                                 ('kind',))
+        self.save_seconds = self.histogram('vilcoin_save_seconds', "Time to write the data file")
+        self.save_bytes = self.gauge('vilcoin_save_bytes', "Size of the last data file written")
+        self.rpc_seconds = self.histogram('vilcoin_peer_rpc_seconds', "Time to send a message to a peer",
+                                          ('peer', 'method'))
+        self.rpc_failures = self.counter('vilcoin_peer_rpc_failures_total', "Failed messages to a peer",
+                                         ('peer', 'method'))
+        self.sync_seconds = self.histogram('vilcoin_sync_seconds', "Duration of a full network sync")
+        self.gauge('vilcoin_peers', "Known peers", function=lambda: len(blockchain.peers))
+        self.gauge('vilcoin_mempool_size', "Pending transactions", function=lambda: len(blockchain.pending_transactions))
+        self.gauge('vilcoin_chain_height', "Blocks in the main chain", function=lambda: len(blockchain.chain))
+        self.gauge('vilcoin_difficulty', "Difficulty of the next block", function=lambda: blockchain.difficulty)
@@ -0,0 +1,113 @@
+import threading
+import time
+from collections import deque
+from typing import TYPE_CHECKING
+
+from VILcoin_log import Colors, colored_print
+
+if TYPE_CHECKING:
+    from VILcoin import Blockchain
+
+class AutoMiner:
+    """Background miner that starts a block once the mempool holds `max_pending`
+    transactions or its oldest transaction has waited `max_wait` seconds.
+
+    Keeps the confirmation latency (block mined minus transaction timestamp) of
+    the transactions it confirmed, for stats().
+    """
+
+    def __init__(self, blockchain: 'Blockchain', miner: str, max_pending: int = 100, max_wait: float = 10,
+                 max_samples: int = 10000):
+        self.blockchain = blockchain
+        self.miner = miner
+        self.max_pending = max_pending
+        self.max_wait = max_wait
+        self.latencies = deque(maxlen=max_samples)
+        self.blocks_mined = 0
+        self.transactions_confirmed = 0
+        self.wakeup = threading.Event()
+        self.stop_event = threading.Event()
+        # Set when an attempt found nothing minable; cleared by a change, or retried after max_wait
+        self.stalled_until = 0.0
+        # Bumped by every mempool or chain change, so a failed attempt can tell whether it raced one
+        self.changes = 0
+        self.lock = threading.Lock()
+        self.token = None
+        self.thread = None
+
+    def start(self):
+        self.token = self.blockchain.events.subscribe(self.on_change, ('tx_received', 'block_appended'))
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+        colored_print(f"🤖 Auto-miner started for {self.miner} (every {self.max_pending} transactions or {self.max_wait}s)", Colors.OKGREEN, component='node.mining')
+
+    def stop(self):
+        self.stop_event.set()
+        self.wakeup.set()
+        self.blockchain.events.unsubscribe(self.token)
+        if self.thread:
+            self.thread.join()
+
+    def on_change(self, event: str, data: dict):
+        with self.lock:
+            self.changes += 1
+            self.stalled_until = 0.0
+        self.wakeup.set()
+
+    def run(self):
+        while not self.stop_event.is_set():
+            self.wakeup.clear()
+            pending = self.blockchain.pending_snapshot()
+            timeout = self.max_wait
+            # A missed event must not stall mining for good
+            stalled = self.stalled_until - time.time()
+            if stalled > 0:
+                timeout = stalled
+            elif pending and self.miner in self.blockchain.users:
+                waited = time.time() - min(tx.timestamp for tx in pending)
+                if len(pending) >= self.max_pending or waited >= self.max_wait:
+                    self.mine()
+                    continue
+                timeout = self.max_wait - waited
+            self.wakeup.wait(timeout)
+
+    def mine(self):
+        with self.lock:
+            self.stalled_until = 0.0
+            changes = self.changes
+        try:
+            block = self.blockchain.mine_pending_transactions(self.miner)
+        except Exception as e:
+            colored_print(f"❌ Auto-mining failed: {e}", Colors.FAIL, component='node.mining')
+            block = None
+        
+        if block is None:
+            with self.lock:
+                # Nothing minable (e.g. insufficient funds): wait for the mempool to change or max_wait, unless it
+                # already did while this attempt ran (a new tip makes the attempt fail, not the mempool)
+                if self.changes == changes:
+                    self.stalled_until = time.time() + self.max_wait
+            return
+        
+        for tx in block.transactions:
+            if tx.tx_type != "mining_reward":
+                self.latencies.append(block.timestamp - tx.timestamp)
+        self.blocks_mined += 1
+        self.transactions_confirmed += len(block.transactions) - 1
+
+    def stats(self) -> dict:
+        samples = sorted(self.latencies)
+        if not samples:
+            return {"blocks_mined": self.blocks_mined, "transactions_confirmed": 0}
+        
+        def percentile(p):
+            return samples[min(len(samples) - 1, int(p * len(samples)))]
+        
+        return {
+            "blocks_mined": self.blocks_mined,
+            "transactions_confirmed": self.transactions_confirmed,
+            "latency_mean": sum(samples) / len(samples),
+            "latency_p50": percentile(0.50),
+            "latency_p95": percentile(0.95),
+            "latency_max": samples[-1],
+        }
@@ -0,0 +1,511 @@
+import argparse
+import heapq
+import json
+import logging
+import random
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from VILcoin import Block, Blockchain, TCPTransport, Transaction
+from VILcoin_log import Colors, colored_print
+from VILcoin_trace import add_tracing_arguments, start_tracing
+
+def percentiles(samples) -> dict:
+    samples = sorted(samples)
+    if not samples:
+        return {"count": 0}
+
+    def percentile(p):
+        return samples[min(len(samples) - 1, int(p * len(samples)))]
+
+    return {
+        "count": len(samples),
+        "mean": sum(samples) / len(samples),
+        "p50": percentile(0.50),
+        "p95": percentile(0.95),
+        "max": samples[-1],
+    }
+
+class SimNetwork:
+    """Links between simulated nodes, with latency, jitter, loss and partitions.
+
+    One-way messages (broadcasts) are delivered after the link delay by a
+    scheduler thread; request/response messages block the caller for a round
+    trip. A partitioned link refuses connections like an unreachable host,
+    a lost message just never arrives.
+    """
+
+    def __init__(self, latency: float = 0.05, jitter: float = 0.02, loss: float = 0.0, seed: int = None,
+                 workers: int = 32):
+        self.latency = latency
+        self.jitter = jitter
+        self.loss = loss
+        self.random = random.Random(seed)
+        self.random_lock = threading.Lock()
+        self.nodes = {}
+        self.groups = None
+        self.queue = []
+        self.queue_cond = threading.Condition()
+        self.sequence = 0
+        self.running = True
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='vilcoin-sim')
+        self.scheduler = threading.Thread(target=self.run_scheduler, daemon=True)
+        self.scheduler.start()
+
+    def delay(self) -> float:
+        with self.random_lock:
+            return max(0.0, self.latency + self.random.uniform(-self.jitter, self.jitter))
+
+    def lost(self) -> bool:
+        if not self.loss:
+            return False
+        with self.random_lock:
+            return self.random.random() < self.loss
+
+    def partition(self, *groups):
+        """Only nodes in the same group can reach each other until heal()"""
+        self.groups = {name: i for i, group in enumerate(groups) for name in group}
+
+    def heal(self):
+        self.groups = None
+
+    def reachable(self, source: str, target: str) -> bool:
+        if target not in self.nodes:
+            return False
+        groups = self.groups
+        return groups is None or groups.get(source) == groups.get(target)
+
+    def schedule(self, delay: float, callback, *args):
+        with self.queue_cond:
+            self.sequence += 1
+            heapq.heappush(self.queue, (time.monotonic() + delay, self.sequence, callback, args))
+            self.queue_cond.notify()
+
+    def run_scheduler(self):
+        while True:
+            with self.queue_cond:
+                while self.running and (not self.queue or self.queue[0][0] > time.monotonic()):
+                    timeout = self.queue[0][0] - time.monotonic() if self.queue else None
+                    self.queue_cond.wait(timeout)
+                if not self.running:
+                    return
+                _, _, callback, args = heapq.heappop(self.queue)
+            self.executor.submit(callback, *args)
+
+    def deliver(self, source: str, target: str, payload: bytes) -> bytes:
+        sender = self.nodes[source].transport
+        if sender.tcp:
+            return sender.tcp.request(target, payload)
+        try:
+            node = self.nodes[target]
+            with node.store.reading():
+                response = node.handle_message(json.loads(payload), source)
+                return b''.join(response) if isinstance(response, list) else response or b''
+        except Exception:
+            # A real server closes the connection without an answer
+            return b''
+
+    def close(self):
+        with self.queue_cond:
+            self.running = False
+            self.queue_cond.notify()
+        self.executor.shutdown(wait=False)
+
+class SimTransport:
+    """Transport for a node inside a SimNetwork; with `tcp` set, messages that get
+    through the simulated link still travel over real localhost sockets."""
+
+    def __init__(self, network: SimNetwork, name: str, tcp: TCPTransport = None):
+        self.network = network
+        self.name = name
+        self.tcp = tcp
+
+    def request(self, peer: str, payload: bytes, timeout: float = 10) -> bytes:
+        if not self.network.reachable(self.name, peer):
+            raise ConnectionRefusedError(f"{peer} is unreachable")
+        if self.network.lost() or self.network.lost():
+            time.sleep(min(timeout, 2 * self.network.latency))
+            raise TimeoutError(f"request to {peer} was lost")
+        time.sleep(self.network.delay() + self.network.delay())
+        return self.network.deliver(self.name, peer, payload)
+
+    def send(self, peer: str, payload: bytes, timeout: float = 5) -> None:
+        if not self.network.reachable(self.name, peer):
+            raise ConnectionRefusedError(f"{peer} is unreachable")
+        if not self.network.lost():
+            self.network.schedule(self.network.delay(), self.network.deliver, self.name, peer, payload)
+
+class Metrics:
+    """Collects when each node first saw each block and transaction, from node events"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.block_seen = {}
+        self.block_heights = {}
+        self.tx_seen = {}
+        self.tx_created = {}
+        self.reorgs = 0
+
+    def watch(self, name: str, node: Blockchain):
+        def handler(event, data):
+            now = time.time()
+            with self.lock:
+                if event == 'block_appended':
+                    self.block_seen.setdefault(data['hash'], {}).setdefault(name, now)
+                    self.block_heights[data['hash']] = data['height']
+                elif event == 'tx_received':
+                    self.tx_seen.setdefault(data['hash'], {}).setdefault(name, now)
+                    self.tx_created.setdefault(data['hash'], data['timestamp'])
+                elif event == 'reorg':
+                    self.reorgs += 1
+        node.events.subscribe(handler, ('block_appended', 'tx_received', 'reorg'))
+
+    @staticmethod
+    def spread(seen: dict, node_count: int):
+        """Per item: seconds from the first node until every node had it, and the share of items that got everywhere"""
+        complete = [max(times.values()) - min(times.values()) for times in seen.values() if len(times) >= node_count]
+        return complete, (len(complete) / len(seen) if seen else 0.0)
+
+    @staticmethod
+    def arrivals(seen: dict, origins: dict):
+        """Seconds from creation until each other node had it; a transaction whose block
+        overtook it never enters that node's mempool, so this is per delivery"""
+        delays = []
+        for key, times in seen.items():
+            first = min(times.values())
+            delays.extend(t - origins.get(key, first) for t in times.values() if t != first)
+        return delays
+
+class Simulation:
+    """N Blockchain nodes on a SimNetwork, seeded with the same funded chain and users"""
+
+    def __init__(self, nodes: int = 5, users: int = 20, difficulty: int = 2, latency: float = 0.05,
+                 jitter: float = 0.02, loss: float = 0.0, seed: int = None, tcp_port: int = None):
+        self.network = SimNetwork(latency, jitter, loss, seed)
+        self.random = random.Random(seed)
+        self.difficulty = difficulty
+        self.tcp_port = tcp_port
+        self.workdir = tempfile.mkdtemp(prefix='vilcoin-sim-')
+        self.metrics = Metrics()
+        self.nodes = {}
+        self.usernames = [f"user{i}" for i in range(users)]
+        self.setup_height = 0
+        self.stop_event = threading.Event()
+        # Hashes of the transfers the scenario submitted, and whether settle() got every node onto one tip
+        self.submitted = set()
+        self.settled = None
+
+        seed_node = self.add_node()
+        for username in self.usernames:
+            seed_node.create_user(username, "sim")
+        self.fund(seed_node)
+        for _ in range(nodes - 1):
+            self.add_node(seed_node)
+        self.connect_all()
+
+    def add_node(self, template: Blockchain = None) -> Blockchain:
+        index = len(self.nodes)
+        data_dir = f"{self.workdir}/node{index}"
+        if self.tcp_port:
+            port = self.tcp_port + index
+            node = Blockchain(server_port=port, discover=False, data_dir=data_dir)
+            node.my_ip = '127.0.0.1'
+            name = node.peer_name('127.0.0.1', port)
+            node.transport = SimTransport(self.network, name, TCPTransport(node))
+        else:
+            node = Blockchain(start_network=False, data_dir=data_dir)
+            name = f"10.0.0.{index + 1}"
+            node.my_ip = name
+            node.transport = SimTransport(self.network, name)
+        node.min_difficulty = node.max_difficulty = self.difficulty
+
+        if template is not None:
+            node.replace_chain([Block.from_dict(block.to_dict()) for block in template.chain])
+            for username, user in template.users.items():
+                node.add_user_from_data(username, user.to_dict())
+            node.save_data()
+
+        self.nodes[name] = node
+        self.network.nodes[name] = node
+        self.metrics.watch(name, node)
+        return node
+
+    def fund(self, node: Blockchain, amount: float = 1_000_000):
+        """Give every user a balance in one block, so storms never run out of funds"""
+        rewards = [Transaction("SYSTEM", node.username_to_id[username], amount, tx_type="mining_reward")
+                   for username in self.usernames]
+        block = Block(len(node.chain), rewards, node.get_latest_block().hash, rewards[0].receiver,
+                      difficulty=node.difficulty)
+        block.mine_block(block.difficulty)
+        node.append_block(block)
+        node.save_data()
+        self.setup_height = len(node.chain)
+
+    def connect_all(self):
+        for name, node in self.nodes.items():
+            for other in self.nodes:
+                if other != name:
+                    node.add_peer(other)
+
+    def name_of(self, node: Blockchain) -> str:
+        return node.transport.name
+
+    def tips(self) -> set:
+        return {node.get_latest_block().hash for node in self.nodes.values()}
+
+    def converged(self) -> bool:
+        return len(self.tips()) == 1 and not any(node.pending_transactions for node in self.nodes.values())
+
+    def wait_for(self, condition, timeout: float) -> bool:
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            if condition():
+                return True
+            time.sleep(0.05)
+        return condition()
+
+    def start_miners(self, names, batch: int, wait: float):
+        for name in names:
+            self.nodes[name].start_auto_miner(self.usernames[0], batch, wait)
+
+    def stop_miners(self, keep=()):
+        for name, node in self.nodes.items():
+            if name not in keep:
+                node.stop_auto_miner()
+
+    def storm(self, rate: float, duration: float, names=None, tick: float = 0.1):
+        """Submit `rate` random transfers per second, each batch at a random node"""
+        names = list(names or self.nodes)
+        deadline = time.time() + duration
+        carry = 0.0
+        while time.time() < deadline and not self.stop_event.is_set():
+            carry += rate * tick
+            count, carry = int(carry), carry - int(carry)
+            if count:
+                node = self.nodes[self.random.choice(names)]
+                transfers = [(self.random.choice(self.usernames), self.random.choice(self.usernames),
+                              round(self.random.uniform(0.01, 1), 2)) for _ in range(count)]
+                self.submitted.update(tx.hash for tx in node.create_transactions(transfers) if tx is not None)
+            time.sleep(tick)
+
+    def settle(self, timeout: float) -> bool:
+        """Mine what is left everywhere, then let one miner resolve equal-work forks"""
+        deadline = time.time() + timeout
+        mempools_empty = lambda: not any(node.pending_transactions for node in self.nodes.values())
+        # Transactions a node only has locally (lost messages) are never relayed, so nodes still
+        # holding some after the running miners had their go mine them themselves
+        if not self.wait_for(mempools_empty, min(3, timeout)):
+            for node in self.nodes.values():
+                if node.auto_miner is None and node.pending_transactions:
+                    node.start_auto_miner(self.usernames[0], 100, 0.5)
+            self.wait_for(mempools_empty, max(0, deadline - time.time()))
+
+        first = next(iter(self.nodes))
+        self.stop_miners(keep=(first,))
+        node = self.nodes[first]
+        if node.auto_miner is None:
+            node.start_auto_miner(self.usernames[0], 100, 0.5)
+        self.settled = False
+        while time.time() < deadline:
+            if self.wait_for(self.converged, min(5, max(0, deadline - time.time()))):
+                self.settled = True
+                break
+            # Nothing left to mine but tips still differ: a new block breaks the tie
+            tx = node.create_transactions([(self.usernames[0], self.usernames[-1], 0.01)])[0]
+            if tx:
+                self.submitted.add(tx.hash)
+        else:
+            self.settled = self.converged()
+        return self.settled
+
+    def sync_all(self, names=None) -> float:
+        start = time.time()
+        threads = [threading.Thread(target=self.nodes[name].sync_with_network, daemon=True)
+                   for name in (names or self.nodes)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return time.time() - start
+
+    def report(self, scenario: str, elapsed: float, **extra) -> dict:
+        final = self.nodes[next(iter(self.nodes))]
+        main_chain = {final.chain[height].hash for height in range(self.setup_height, len(final.chain))}
+        mined = {h for h, height in self.metrics.block_heights.items() if height >= self.setup_height}
+        confirmed = sum(1 for height in range(self.setup_height, len(final.chain))
+                        for tx in final.chain[height].transactions if tx.hash in self.submitted)
+        converged = bool(self.settled) and self.converged() and confirmed == len(self.submitted)
+
+        with self.metrics.lock:
+            block_spread, block_coverage = Metrics.spread(
+                {h: t for h, t in self.metrics.block_seen.items() if h in main_chain}, len(self.nodes))
+            tx_delays = Metrics.arrivals(self.metrics.tx_seen, self.metrics.tx_created)
+            reorgs = self.metrics.reorgs
+
+        return dict({
+            "scenario": scenario,
+            "nodes": len(self.nodes),
+            "mode": "tcp" if self.tcp_port else "in-process",
+            "latency": self.network.latency,
+            "jitter": self.network.jitter,
+            "loss": self.network.loss,
+            "difficulty": self.difficulty,
+            "elapsed": elapsed,
+            "converged": converged,
+            "height": len(final.chain),
+            "transactions_submitted": len(self.submitted),
+            "transactions_confirmed": confirmed,
+            "tps": confirmed / elapsed if elapsed else 0.0,
+            "blocks_seen": len(mined),
+            "blocks_orphaned": len(mined - main_chain),
+            "orphan_rate": len(mined - main_chain) / len(mined) if mined else 0.0,
+            "reorgs": reorgs,
+            "block_propagation": percentiles(block_spread),
+            "block_coverage": block_coverage,
+            "tx_propagation": percentiles(tx_delays),
+        }, **extra)
+
+    def close(self):
+        self.stop_event.set()
+        self.stop_miners()
+        for node in self.nodes.values():
+            if self.tcp_port:
+                node.stop_network_server()
+            node.persister.stop()
+        self.network.close()
+        shutil.rmtree(self.workdir, ignore_errors=True)
+
+def run_tx_storm(sim: Simulation, args) -> dict:
+    """One miner, every node takes transactions"""
+    start = time.time()
+    sim.start_miners(list(sim.nodes)[:1], args.batch, args.mine_wait)
+    sim.storm(args.rate, args.duration)
+    sim.settle(args.timeout)
+    return sim.report("tx_storm", time.time() - start)
+
+def run_competing_miners(sim: Simulation, args) -> dict:
+    """Every node mines, so blocks race each other and forks get resolved"""
+    start = time.time()
+    sim.start_miners(list(sim.nodes), args.batch, args.mine_wait)
+    sim.storm(args.rate, args.duration)
+    sim.settle(args.timeout)
+    return sim.report("competing_miners", time.time() - start)
+
+def run_partition(sim: Simulation, args) -> dict:
+    """Split the network in two, let both halves mine, then heal and time the resync"""
+    names = list(sim.nodes)
+    half = max(1, len(names) // 2)
+    start = time.time()
+    sim.network.partition(names[:half], names[half:])
+    sim.start_miners(names, args.batch, args.mine_wait)
+    sim.storm(args.rate, args.duration)
+    sim.stop_miners()
+    split_tips = len(sim.tips())
+
+    sim.network.heal()
+    heal_start = time.time()
+    sim.connect_all()
+    sync_time = sim.sync_all()
+    # Halves with equal work keep their own tips until the next block breaks the tie
+    sim.settle(args.timeout)
+    return sim.report("partition", time.time() - start, tips_during_partition=split_tips, sync_time=sync_time,
+                      converge_time=time.time() - heal_start)
+
+def run_late_joiner(sim: Simulation, args) -> dict:
+    """Build history on the existing nodes, then start an empty node and time its catch-up"""
+    start = time.time()
+    sim.start_miners(list(sim.nodes)[:1], args.batch, args.mine_wait)
+    sim.storm(args.rate, args.duration)
+    sim.settle(args.timeout)
+    sim.stop_miners()
+    elapsed = time.time() - start
+
+    joiner = sim.add_node()
+    joiner_name = sim.name_of(joiner)
+    target = sim.nodes[next(iter(sim.nodes))].get_latest_block().hash
+    sync_start = time.time()
+    sim.connect_all()
+    joiner.sync_with_network()
+    caught_up = sim.wait_for(lambda: joiner.get_latest_block().hash == target, args.timeout)
+    sync_time = time.time() - sync_start
+    return sim.report("late_joiner", elapsed, sync_time=sync_time, joiner=joiner_name, joiner_caught_up=caught_up,
+                      blocks_synced=len(joiner.chain))
+
+SCENARIOS = {
+    "tx_storm": run_tx_storm,
+    "competing_miners": run_competing_miners,
+    "partition": run_partition,
+    "late_joiner": run_late_joiner,
+}
+
+def print_report(report: dict):
+    colored_print(f"📊 {report['scenario']}: {report['nodes']} nodes ({report['mode']}), "
+                  f"latency {report['latency'] * 1000:.0f}±{report['jitter'] * 1000:.0f}ms, loss {report['loss']:.0%}",
+                  Colors.HEADER, component='sim')
+    colored_print(f"{'✅' if report['converged'] else '❌'} Converged: {report['converged']} at height {report['height']}",
+                  Colors.OKGREEN if report['converged'] else Colors.FAIL, component='sim')
+    colored_print(f"💸 {report['transactions_confirmed']}/{report['transactions_submitted']} transactions confirmed "
+                  f"in {report['elapsed']:.2f}s ({report['tps']:.1f} TPS)", Colors.OKBLUE, component='sim')
+    colored_print(f"🧩 Orphan rate: {report['orphan_rate']:.1%} ({report['blocks_orphaned']}/{report['blocks_seen']} blocks), "
+                  f"{report['reorgs']} reorgs", Colors.OKBLUE, component='sim')
+    stats = report['block_propagation']
+    if stats['count']:
+        colored_print(f"📡 Block propagation to every node: p50 {stats['p50'] * 1000:.0f}ms, p95 {stats['p95'] * 1000:.0f}ms, "
+                      f"max {stats['max'] * 1000:.0f}ms ({report['block_coverage']:.0%} of main-chain blocks)", Colors.OKCYAN, component='sim')
+    stats = report['tx_propagation']
+    if stats['count']:
+        colored_print(f"📡 Transaction arrival at peers: p50 {stats['p50'] * 1000:.0f}ms, p95 {stats['p95'] * 1000:.0f}ms, "
+                      f"max {stats['max'] * 1000:.0f}ms", Colors.OKCYAN, component='sim')
+    if 'sync_time' in report:
+        colored_print(f"🔄 Sync time: {report['sync_time']:.2f}s", Colors.OKCYAN, component='sim')
+    if 'converge_time' in report:
+        colored_print(f"🔀 {report['tips_during_partition']} tips during the partition, one tip "
+                      f"{report['converge_time']:.2f}s after healing", Colors.OKCYAN, component='sim')
+    if 'blocks_synced' in report:
+        colored_print(f"🆕 Late joiner {'caught up' if report['joiner_caught_up'] else 'did NOT catch up'} "
+                      f"({report['blocks_synced']} blocks)", Colors.OKGREEN if report['joiner_caught_up'] else Colors.FAIL, component='sim')
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate a VIL Coin network and measure how it performs")
+    parser.add_argument('scenario', choices=sorted(SCENARIOS) + ['all'])
+    parser.add_argument('--nodes', type=int, default=5)
+    parser.add_argument('--users', type=int, default=20)
+    parser.add_argument('--difficulty', type=int, default=2, help="fixed mining difficulty of the simulated network")
+    parser.add_argument('--latency', type=float, default=0.05, help="one-way link delay in seconds")
+    parser.add_argument('--jitter', type=float, default=0.02, help="random +/- added to each delay, in seconds")
+    parser.add_argument('--loss', type=float, default=0.0, help="probability that a message is dropped")
+    parser.add_argument('--rate', type=float, default=200, help="transactions submitted per second")
+    parser.add_argument('--duration', type=float, default=10, help="seconds of workload")
+    parser.add_argument('--batch', type=int, default=100, help="miners start a block at this many pending transactions")
+    parser.add_argument('--mine-wait', type=float, default=1, help="...or once the oldest has waited this long")
+    parser.add_argument('--timeout', type=float, default=30, help="max seconds to wait for the network to settle")
+    parser.add_argument('--seed', type=int)
+    parser.add_argument('--tcp', type=int, metavar='BASE_PORT', help="run nodes on real localhost ports BASE_PORT+i")
+    parser.add_argument('--json', action='store_true', help="print the report as JSON")
+    parser.add_argument('--verbose', action='store_true', help="show the nodes' own output")
+    add_tracing_arguments(parser)
+    args = parser.parse_args()
+    start_tracing(args)
+
+    if not args.verbose:
+        # Failed sends and rejected blocks are part of most scenarios
+        logging.getLogger('vilcoin.node').setLevel(logging.CRITICAL)
+    reports = []
+    for scenario in (sorted(SCENARIOS) if args.scenario == 'all' else [args.scenario]):
+        sim = Simulation(args.nodes, args.users, args.difficulty, args.latency, args.jitter, args.loss,
+                         args.seed, args.tcp)
+        try:
+            reports.append(SCENARIOS[scenario](sim, args))
+        finally:
+            sim.close()
+        if not args.json:
+            print_report(reports[-1])
+
+    if args.json:
+        print(json.dumps(reports if len(reports) > 1 else reports[0], indent=2))
+
+if __name__ == "__main__":
+    main()
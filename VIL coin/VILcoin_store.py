@@ -0,0 +1,389 @@
+import atexit
+import contextlib
+import itertools
+import json
+import mmap
+import os
+import shutil
+import threading
+import time
+import zlib
+from array import array
+from typing import TYPE_CHECKING, Callable, List, Optional
+
+from VILcoin_log import Colors, colored_print
+
+if TYPE_CHECKING:
+    from VILcoin import Block, Transaction
+
+class ChainStore:
+    """Crash-safe storage of a node's data directory.
+
+    blocks.dat   one serialized block per line, appended to between compactions
+    state.json   checkpoint of users, mempool and balance base, replaced atomically
+    journal.log  changes since the checkpoint, one checksummed record per line
+
+    Changes are journaled as they happen. A checkpoint brings blocks.dat and
+    state.json up to date and retires the journal; on startup the journal is
+    replayed on top of the last checkpoint, stopping at a torn record.
+    Journal records reach the OS at once, so they survive the process
+    crashing; block and mempool-clearing records and checkpoints are also
+    fsynced, so they survive a power loss. Mempool and user records written
+    just before one may be lost.
+
+    A reorg appends the new branch after the blocks it replaces, which stay
+    behind as dead lines, and blocks pruned in memory keep their bodies on
+    disk. The file is rewritten, into a fresh one, for a new base or once
+    such dead bytes make up `compact_ratio` of it; pruned blocks are then
+    written as headers. Bytes once written therefore stay put, so views() can
+    hand out slices of a read-only mapping of the file without copying them.
+    The slices are only valid inside the reading() scope they were taken in;
+    a rewrite waits for other threads' scopes to end and unmaps the file
+    first, as Windows cannot replace or truncate a file that is still mapped.
+    """
+
+    compact_ratio = 0.5
+
+    def __init__(self, data_dir: str):
+        self.blocks_path = os.path.join(data_dir, 'blocks.dat')
+        self.state_path = os.path.join(data_dir, 'state.json')
+        self.journal_path = os.path.join(data_dir, 'journal.log')
+        # Records already handed to a checkpoint that is still being written
+        self.old_journal_path = os.path.join(data_dir, 'journal.old')
+        self.lock = threading.Lock()
+        self.base = 0
+        # Hash, start offset and length of every block of the chain in blocks.dat, by height - base
+        self.hashes = []
+        self.offsets = array('q')
+        self.lengths = array('q')
+        self.end = 0
+        # Bytes of lines no longer indexed (replaced by a reorg), and how many leading blocks are headers only
+        self.dead = 0
+        self.headers = 0
+        self.map = None
+        # Threads inside a reading() scope that took views, and whether a rewrite is waiting for them
+        self.readers = 0
+        self.unread = threading.Condition(self.lock)
+        self.rewriting = False
+        self.local = threading.local()
+        self.journal = None
+        self.rotations = 0
+
+    def exists(self) -> bool:
+        return os.path.exists(self.state_path)
+
+    def size(self) -> int:
+        return sum(os.path.getsize(path) for path in (self.blocks_path, self.state_path) if os.path.exists(path))
+
+    def read_state(self) -> dict:
+        with open(self.state_path, 'rb') as f:
+            return json.load(f)
+
+    def read_blocks(self, base: int, decode: Callable[[dict], 'Block']) -> List['Block']:
+        """Blocks from base upward, each made by `decode` from its JSON; a torn or corrupt tail
+        left by a crash is cut off"""
+        blocks = []
+        hashes, offsets, lengths = [], array('q'), array('q')
+        position = 0
+        if os.path.exists(self.blocks_path):
+            with open(self.blocks_path, 'rb') as f:
+                for line in f:
+                    try:
+                        block = decode(json.loads(line)) if line.endswith(b'\n') else None
+                    except (ValueError, KeyError, TypeError):
+                        block = None
+                    height = block.index - base if block is not None else -1
+                    if not 0 <= height <= len(blocks) or (height and blocks[height - 1].hash != block.previous_hash):
+                        break
+                    # A block at a height already read is a reorg's branch replacing the blocks from there on
+                    del blocks[height:], hashes[height:], offsets[height:], lengths[height:]
+                    blocks.append(block)
+                    hashes.append(block.hash)
+                    offsets.append(position)
+                    lengths.append(len(line) - 1)
+                    position += len(line)
+        with self.lock:
+            self.close_map()
+            if os.path.exists(self.blocks_path) and os.path.getsize(self.blocks_path) > position:
+                colored_print(f"⚠️  Cutting a damaged tail off {self.blocks_path} after block #{base + len(blocks) - 1}",
+                              Colors.WARNING, component='node.storage')
+                with open(self.blocks_path, 'r+b') as f:
+                    f.truncate(position)
+            self.base = base
+            self.hashes, self.offsets, self.lengths = hashes, offsets, lengths
+            self.end = position
+            self.dead = position - sum(lengths) - len(lengths)
+            self.headers = next((i for i, block in enumerate(blocks) if not block.pruned), len(blocks))
+        return blocks
+
+    def read_journal(self) -> List[dict]:
+        records = []
+        for path in (self.old_journal_path, self.journal_path):
+            if not os.path.exists(path):
+                continue
+            with open(path, 'rb') as f:
+                for line in f:
+                    checksum, _, payload = line.rstrip(b'\n').partition(b' ')
+                    if not line.endswith(b'\n') or checksum != b'%08x' % zlib.crc32(payload):
+                        # Written while the node went down; nothing after it was acknowledged
+                        break
+                    records.append(json.loads(payload))
+        return records
+
+    def open_journal(self) -> None:
+        with self.lock:
+            if self.journal is None:
+                self.journal = open(self.journal_path, 'ab')
+
+    def close(self) -> None:
+        with self.lock:
+            if self.journal is not None:
+                self.journal.close()
+                self.journal = None
+
+    def log(self, record: bytes, sync: bool = False) -> None:
+        """Append one JSON record to the journal (a no-op until the journal is opened);
+        with `sync` it is on disk when this returns"""
+        line = b'%08x ' % zlib.crc32(record) + record + b'\n'
+        with self.lock:
+            if self.journal is not None:
+                self.journal.write(line)
+                self.journal.flush()
+                if sync:
+                    os.fsync(self.journal.fileno())
+
+    def rotate(self) -> int:
+        """Start a new journal for the changes after a checkpoint that is about to be written"""
+        with self.lock:
+            if self.journal is not None:
+                self.journal.close()
+            if os.path.exists(self.journal_path):
+                if os.path.exists(self.old_journal_path):
+                    # An earlier checkpoint has not finished: keep its records too
+                    with open(self.old_journal_path, 'ab') as old, open(self.journal_path, 'rb') as new:
+                        shutil.copyfileobj(new, old)
+                    os.remove(self.journal_path)
+                else:
+                    os.replace(self.journal_path, self.old_journal_path)
+            if self.journal is not None:
+                self.journal = open(self.journal_path, 'ab')
+            self.rotations += 1
+            return self.rotations
+
+    def write_blocks(self, blocks, base: int) -> None:
+        """Make blocks.dat hold `blocks`, appending only the blocks after the part already on disk,
+        or rewriting the file when a new base or dead bytes call for it"""
+        rewrite = base != self.base or not os.path.exists(self.blocks_path)
+        common = 0
+        if not rewrite:
+            # Each hash covers its parent, so matching at a height means matching below it too
+            common = min(len(self.hashes), len(blocks))
+            while common and self.hashes[common - 1] != blocks[common - 1].hash:
+                common -= 1
+            if self.dead_bytes(blocks, common) > self.end * self.compact_ratio:
+                rewrite, common = True, 0
+        
+        path = self.blocks_path + '.tmp' if rewrite else self.blocks_path
+        position = 0 if rewrite else self.end
+        hashes, offsets, lengths = [], array('q'), array('q')
+        headers = 0
+        with open(path, 'wb' if rewrite else 'ab') as f:
+            for block in itertools.islice(blocks, common, None):
+                if block.pruned and headers == len(hashes):
+                    headers += 1
+                data = block.serialize()
+                f.write(data)
+                f.write(b'\n')
+                hashes.append(block.hash)
+                offsets.append(position)
+                lengths.append(len(data))
+                position += len(data) + 1
+            f.flush()
+            os.fsync(f.fileno())
+        
+        with self.lock:
+            if rewrite:
+                self.close_map()
+                os.replace(path, self.blocks_path)
+                self.dead = 0
+                self.headers = headers
+            else:
+                self.dead += sum(self.lengths[common:]) + len(self.lengths) - common
+                self.headers = min(self.headers, common)
+            self.base = base
+            del self.hashes[common:], self.offsets[common:], self.lengths[common:]
+            self.hashes.extend(hashes)
+            self.offsets.extend(offsets)
+            self.lengths.extend(lengths)
+            self.end = position
+    
+    def dead_bytes(self, blocks, common: int) -> int:
+        """Bytes a rewrite would drop: lines replaced by reorgs, including the ones past `common`
+        about to be, and bodies of blocks pruned since they were written"""
+        dead = self.dead + sum(self.lengths[common:]) + len(self.lengths) - common
+        for height in range(self.headers, common):
+            if not blocks[height].pruned:
+                break
+            dead += self.lengths[height] - len(blocks[height].serialize())
+        return dead
+
+    @contextlib.contextmanager
+    def reading(self):
+        """Scope for views(): the views it hands out are released when the scope ends"""
+        if getattr(self.local, 'views', None) is not None:
+            yield
+            return
+        self.local.views = []
+        try:
+            yield
+        finally:
+            views, self.local.views = self.local.views, None
+            for view in views:
+                view.release()
+            if views:
+                with self.lock:
+                    self.readers -= 1
+                    self.unread.notify_all()
+
+    def views(self, start: int, stop: int, last_hash: str) -> Optional[List[memoryview]]:
+        """Serialized blocks start..stop-1 as slices of the mapped file, or None unless the file
+        holds them all and its block at stop-1 is `last_hash`. Only available inside reading(),
+        and not to be used after it ends."""
+        held = getattr(self.local, 'views', None)
+        with self.lock:
+            first, last = start - self.base, stop - self.base
+            if (held is None or self.rewriting or first < 0 or not first < last <= len(self.hashes)
+                    or self.hashes[last - 1] != last_hash):
+                return None
+            if self.map is None or len(self.map) < self.end:
+                # The file only grows, so a mapping is replaced once blocks were appended after it
+                with open(self.blocks_path, 'rb') as f:
+                    self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            if not held:
+                self.readers += 1
+            view = memoryview(self.map)
+            views = [view[offset:offset + length]
+                     for offset, length in zip(self.offsets[first:last], self.lengths[first:last])]
+            held.extend(views)
+            held.append(view)
+            return views
+
+    def close_map(self) -> None:
+        """Unmap blocks.dat once no other thread holds views of it (called with self.lock held)"""
+        own = 1 if getattr(self.local, 'views', None) else 0
+        self.rewriting = True
+        try:
+            while self.readers > own:
+                self.unread.wait()
+        finally:
+            self.rewriting = False
+        if self.map is not None:
+            try:
+                self.map.close()
+            except BufferError:
+                # Still viewed, by this thread's own scope or by an older mapping's views being dropped;
+                # POSIX keeps the old file alive for them
+                pass
+            self.map = None
+
+    def write_state(self, state: dict, pending: List['Transaction']) -> None:
+        tmp_path = self.state_path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(json.dumps(state)[:-1].encode() + b', "pending_transactions": [')
+            f.write(b', '.join(tx.serialize() for tx in pending))
+            f.write(b']}')
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.state_path)
+
+    def checkpoint(self, blocks, base: int, state: dict, pending: List['Transaction'], rotation: int = None) -> None:
+        self.write_blocks(blocks, base)
+        self.write_state(dict(state, base=base, height=base + len(self.hashes)), pending)
+        with self.lock:
+            if rotation == self.rotations and os.path.exists(self.old_journal_path):
+                os.remove(self.old_journal_path)
+
+class Persister:
+    """Write-behind saving: callers mark the node dirty and a background thread
+    writes once changes stop for `delay` seconds, or at the latest `max_delay`
+    seconds after the first unsaved change, so a burst costs a few writes.
+    """
+
+    def __init__(self, save: Callable[[], None], delay: float = 1.0, max_delay: float = 5.0):
+        self.save = save
+        self.delay = delay
+        self.max_delay = max_delay
+        self.condition = threading.Condition()
+        self.write_lock = threading.Lock()
+        self.dirty_since = None
+        self.last_change = None
+        self.requests = 0
+        self.writes = 0
+        self.stopped = False
+        self.thread = None
+
+    def mark_dirty(self):
+        with self.condition:
+            now = time.monotonic()
+            if self.dirty_since is None:
+                self.dirty_since = now
+            self.last_change = now
+            self.requests += 1
+            if self.stopped:
+                immediate = True
+            else:
+                immediate = False
+                if self.thread is None:
+                    self.thread = threading.Thread(target=self.run, daemon=True)
+                    self.thread.start()
+                    atexit.register(self.flush)
+                self.condition.notify()
+        if immediate:
+            self.flush()
+
+    def run(self):
+        with self.condition:
+            while not self.stopped:
+                if self.dirty_since is None:
+                    self.condition.wait()
+                    continue
+                due = min(self.last_change + self.delay, self.dirty_since + self.max_delay)
+                wait = due - time.monotonic()
+                if wait > 0:
+                    self.condition.wait(wait)
+                    continue
+                self.condition.release()
+                try:
+                    self.flush()
+                finally:
+                    self.condition.acquire()
+
+    def flush(self) -> bool:
+        """Write now if anything is unsaved; returns once it is on disk (or the write failed)"""
+        with self.write_lock:
+            with self.condition:
+                if self.dirty_since is None:
+                    return False
+                self.dirty_since = None
+            try:
+                self.save()
+            except Exception as e:
+                colored_print(f"❌ Background save failed: {e}", Colors.FAIL, component='node.storage')
+                with self.condition:
+                    # Try again after the next quiet period
+                    now = time.monotonic()
+                    self.dirty_since = self.dirty_since or now
+                    self.last_change = now
+                return False
+            self.writes += 1
+            return True
+
+    def stop(self):
+        """Stop the thread and write whatever is still unsaved; later changes are saved immediately"""
+        with self.condition:
+            self.stopped = True
+            self.condition.notify()
+        if self.thread is not None:
+            self.thread.join()
+            atexit.unregister(self.flush)
+        self.flush()
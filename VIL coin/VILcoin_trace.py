@@ -0,0 +1,142 @@
+import argparse
+import atexit
+import cProfile
+import json
+import os
+import threading
+import time
+from typing import Optional
+
+from VILcoin_log import Colors, colored_print
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+_NULL_SPAN = _NullSpan()
+
+class Span:
+    __slots__ = ('tracer', 'name', 'args', 'start', 'profiler')
+
+    def __init__(self, tracer: 'Tracer', name: str, args: dict):
+        self.tracer = tracer
+        self.name = name
+        self.args = args
+        self.profiler = None
+
+    def __enter__(self):
+        if self.tracer.profile and self.name.startswith(self.tracer.profile):
+            self.profiler = self.tracer.start_profiler()
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        end = time.perf_counter_ns()
+        if self.profiler is not None:
+            self.tracer.dump_profile(self.profiler, self.name)
+        if exc_type is not None:
+            self.args['error'] = exc_type.__name__
+        self.tracer.record(self.name, self.start, end, self.args)
+        return False
+
+class Tracer:
+    """Named timing spans written as a Chrome trace (chrome://tracing, Perfetto).
+
+    Disabled by default, when span() hands back a shared no-op context manager.
+    With `profile` set, spans whose name starts with it also run under cProfile,
+    one .prof file per span in `profile_dir`.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.path = None
+        self.profile = None
+        self.profile_dir = '.'
+        self.profiles = 0
+        self.max_events = 1_000_000
+        self.events = []
+        self.threads = {}
+        self.lock = threading.Lock()
+
+    def span(self, name: str, **args):
+        if not self.enabled:
+            return _NULL_SPAN
+        return Span(self, name, args)
+
+    def start(self, path: str = None, profile: str = None, profile_dir: str = None) -> None:
+        self.path = path
+        self.profile = profile
+        if profile_dir:
+            os.makedirs(profile_dir, exist_ok=True)
+            self.profile_dir = profile_dir
+        self.events = []
+        self.enabled = True
+
+    def record(self, name: str, start_ns: int, end_ns: int, args: dict) -> None:
+        thread = threading.current_thread()
+        with self.lock:
+            if len(self.events) >= self.max_events:
+                return
+            self.threads.setdefault(thread.ident, thread.name)
+            self.events.append({
+                'name': name, 'cat': name.partition('.')[0], 'ph': 'X', 'pid': os.getpid(), 'tid': thread.ident,
+                'ts': start_ns / 1000, 'dur': (end_ns - start_ns) / 1000, 'args': args,
+            })
+
+    def start_profiler(self):
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Another span is already being profiled
+            return None
+        return profiler
+
+    def dump_profile(self, profiler, name: str) -> None:
+        profiler.disable()
+        with self.lock:
+            self.profiles += 1
+            number = self.profiles
+        profiler.dump_stats(os.path.join(self.profile_dir, f"{name}-{number}.prof"))
+
+    def stop(self) -> Optional[str]:
+        """Stop tracing and write the trace file, if one was asked for"""
+        if not self.enabled:
+            return None
+        self.enabled = False
+        if not self.path:
+            return None
+        with self.lock:
+            events = self.events
+            self.events = []
+            metadata = [{'name': 'thread_name', 'ph': 'M', 'pid': os.getpid(), 'tid': tid, 'args': {'name': name}}
+                        for tid, name in self.threads.items()]
+        with open(self.path, 'w') as f:
+            json.dump({'traceEvents': metadata + events, 'displayTimeUnit': 'ms'}, f)
+        return self.path
+
+tracer = Tracer()
+
+def add_tracing_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument('--trace', metavar='FILE', help="write timing spans as a Chrome trace (chrome://tracing) at exit")
+    parser.add_argument('--profile', metavar='SPAN', help="also run spans whose name starts with SPAN under cProfile")
+    parser.add_argument('--profile-dir', default='.', help="directory for the --profile .prof files")
+
+def start_tracing(args) -> None:
+    """Enable the tracer as asked on the command line; the trace is written at exit"""
+    if not (args.trace or args.profile):
+        return
+    tracer.start(args.trace, args.profile, args.profile_dir)
+    atexit.register(_stop_tracing)
+
+def _stop_tracing():
+    path = tracer.stop()
+    if path:
+        colored_print(f"🧵 Trace written to {path}", Colors.OKGREEN, component='cli')
+    if tracer.profiles:
+        colored_print(f"🧵 {tracer.profiles} profiles written to {tracer.profile_dir}", Colors.OKGREEN, component='cli')
@@ -0,0 +1,113 @@
+import http.client
+import json
+import socket
+import unittest
+
+from VILcoin_api import APIServer, EventStreamServer
+from tests.support import NodeTestCase
+
+class APIServerTest(NodeTestCase, unittest.TestCase):
+    def setUp(self):
+        super().setUp()
+        self.node = self.make_node('10.0.0.1')
+        self.node.create_user('alice', 'pw')
+        self.node.create_user('bob', 'pw')
+        self.api = APIServer(self.node, port=0, workers=2)
+        self.api.start()
+
+    def tearDown(self):
+        self.api.stop()
+        super().tearDown()
+
+    def call(self, method: str, path: str, body: dict = None):
+        connection = http.client.HTTPConnection(self.api.host, self.api.port, timeout=10)
+        try:
+            connection.request(method, path, json.dumps(body) if body is not None else None,
+                               {'Content-Type': 'application/json'})
+            response = connection.getresponse()
+            return response.status, json.loads(response.read())
+        finally:
+            connection.close()
+
+    def send(self, amount, password='pw'):
+        return self.call('POST', '/send', {"sender": 'alice', "password": password, "receiver": 'bob', "amount": amount})
+
+    def test_send_then_mine(self):
+        status, sent = self.send(10)
+        self.assertEqual(status, 200)
+        self.assertEqual(self.call('GET', f"/tx/{sent['hash']}")[1]['status'], 'pending')
+        self.assertEqual(self.call('GET', '/mempool')[1]['count'], 1)
+
+        status, mined = self.call('POST', '/mine', {"miner": 'bob'})
+        self.assertEqual(status, 200)
+        self.assertEqual(mined['block'], 1)
+        self.assertEqual(mined['hash'], self.node.get_latest_block().hash)
+        tx = self.call('GET', f"/tx/{sent['hash']}")[1]
+        self.assertEqual((tx['status'], tx['block'], tx['confirmations']), ('confirmed', 1, 1))
+        self.assertEqual(self.call('GET', '/balance?user=alice')[1]['balance'], self.node.get_balance('alice'))
+        self.assertEqual(self.call('GET', '/status')[1]['height'], 2)
+        self.assertEqual(self.call('GET', '/block/1')[1]['hash'], mined['hash'])
+
+    def test_send_batch_reports_each_transfer(self):
+        balance = self.node.get_balance('alice')
+        status, result = self.call('POST', '/send_batch', {"sender": 'alice', "password": 'pw', "transfers": [
+            {"receiver": 'bob', "amount": 1}, {"receiver": 'bob', "amount": balance}, {"receiver": 'nobody', "amount": 1}]})
+        self.assertEqual(status, 200)
+        self.assertEqual(result['accepted'], 1)
+        self.assertEqual(result['hashes'][0], self.node.pending_transactions[0].hash)
+        self.assertEqual(result['hashes'][1:], [None, None])
+
+    def test_send_errors(self):
+        self.assertEqual(self.send(10, password='wrong')[0], 403)
+        self.assertEqual(self.send(-1)[0], 400)
+        self.assertEqual(self.send('ten')[0], 400)
+        self.assertEqual(self.send(self.node.get_balance('alice') + 1)[0], 400)
+        self.assertEqual(self.call('POST', '/send', {"sender": 'nobody', "password": 'pw', "receiver": 'bob', "amount": 1})[0], 404)
+        self.assertFalse(self.node.pending_transactions)
+
+    def test_mine_errors(self):
+        self.assertEqual(self.call('POST', '/mine', {"miner": 'bob'})[0], 409)
+        self.assertEqual(self.call('POST', '/mine', {"miner": 'nobody'})[0], 404)
+        self.assertEqual(self.call('GET', '/nowhere')[0], 404)
+
+class EventStreamTest(NodeTestCase, unittest.TestCase):
+    def setUp(self):
+        super().setUp()
+        self.node = self.make_node('10.0.0.1')
+        self.node.create_user('alice', 'pw')
+        self.node.create_user('bob', 'pw')
+        self.stream = EventStreamServer(self.node, port=0)
+        self.stream.start()
+
+    def tearDown(self):
+        self.stream.stop()
+        super().tearDown()
+
+    def subscribe(self, events) -> socket.socket:
+        client = socket.create_connection(('127.0.0.1', self.stream.port), timeout=10)
+        self.addCleanup(client.close)
+        client.sendall(json.dumps({"events": events}).encode() + b"\n")
+        lines = client.makefile('rb')
+        self.assertEqual(json.loads(lines.readline())['event'], 'subscribed')
+        return lines
+
+    def test_sends_and_blocks_are_streamed(self):
+        lines = self.subscribe(['tx_received', 'block_appended'])
+        # Both ways of sending: the CLI's single transfer and the API's batch
+        self.node.create_transaction('alice', 'bob', 1)
+        self.node.create_transactions([('alice', 'bob', 2)])
+        block = self.node.mine_pending_transactions('bob')
+
+        received = [json.loads(lines.readline()) for _ in range(3)]
+        self.assertEqual([message['event'] for message in received], ['tx_received', 'tx_received', 'block_appended'])
+        self.assertEqual([message['data']['amount'] for message in received[:2]], [1, 2])
+        self.assertEqual(received[2]['data']['hash'], block.hash)
+
+    def test_unknown_event_is_refused(self):
+        client = socket.create_connection(('127.0.0.1', self.stream.port), timeout=10)
+        self.addCleanup(client.close)
+        client.sendall(b'{"events": ["nonsense"]}\n')
+        self.assertIn('error', json.loads(client.makefile('rb').readline()))
+
+if __name__ == '__main__':
+    unittest.main()
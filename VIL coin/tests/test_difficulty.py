@@ -0,0 +1,101 @@
+import json
+import unittest
+
+from VILcoin import Block
+from tests.support import NodeTestCase
+
+def copy_block(block: Block) -> Block:
+    return Block.from_dict(json.loads(block.serialize()))
+
+class RetargetTest(NodeTestCase, unittest.TestCase):
+    def setUp(self):
+        super().setUp()
+        self.node = self.make_node('10.0.0.1')
+        self.node.min_difficulty = 1
+        self.node.max_difficulty = 8
+
+    def window(self, spacing: float, difficulty: int = 4) -> list:
+        """Blocks 0..9 mined `spacing` seconds apart; the block after them is a retarget"""
+        return [Block(height, [], "0", timestamp=1000000 + height * spacing, difficulty=difficulty)
+                for height in range(self.node.retarget_interval)]
+
+    def next_difficulty(self, blocks: list):
+        return self.node.next_difficulty(blocks[-1], blocks.__getitem__)
+
+    def test_difficulty_is_kept_between_retargets(self):
+        blocks = self.window(1)
+        self.assertEqual(self.node.next_difficulty(blocks[4], blocks.__getitem__), 4)
+
+    def test_window_on_target_keeps_the_difficulty(self):
+        self.assertEqual(self.next_difficulty(self.window(self.node.target_block_time)), 4)
+
+    def test_window_within_four_times_the_target_keeps_the_difficulty(self):
+        # Each step is 16x the work, so smaller deviations would only make it oscillate
+        self.assertEqual(self.next_difficulty(self.window(self.node.target_block_time / 3)), 4)
+        self.assertEqual(self.next_difficulty(self.window(self.node.target_block_time * 3)), 4)
+
+    def test_fast_window_raises_the_difficulty(self):
+        self.assertEqual(self.next_difficulty(self.window(self.node.target_block_time / 5)), 5)
+
+    def test_slow_window_lowers_the_difficulty(self):
+        self.assertEqual(self.next_difficulty(self.window(self.node.target_block_time * 5)), 3)
+
+    def test_difficulty_stays_within_bounds(self):
+        self.assertEqual(self.next_difficulty(self.window(1, difficulty=8)), 8)
+        self.assertEqual(self.next_difficulty(self.window(10000, difficulty=1)), 1)
+
+    def test_window_below_the_snapshot_is_unknown(self):
+        blocks = self.window(1)
+
+        def lookup(height):
+            raise IndexError(height)
+
+        self.assertIsNone(self.node.next_difficulty(blocks[-1], lookup))
+
+    def test_block_at_the_wrong_difficulty_is_rejected(self):
+        parent = self.node.get_latest_block()
+        block = Block(1, [], parent.hash, difficulty=2)
+        block.mine_block(2)
+        self.assertFalse(self.node.is_valid_next_block(block, parent))
+
+class ForkChoiceTest(NodeTestCase, unittest.TestCase):
+    def setUp(self):
+        super().setUp()
+        self.node = self.make_node('10.0.0.1')
+        self.node.create_user('alice', 'pw')
+        self.rival = self.make_node('10.0.0.2', template=self.node)
+
+    def mine(self, node, blocks: int, difficulty: int):
+        node.min_difficulty = node.max_difficulty = difficulty
+        for _ in range(blocks):
+            node.create_transaction('alice', 'alice', 1)
+            node.mine_pending_transactions('alice')
+
+    def test_shorter_branch_with_more_work_wins(self):
+        self.mine(self.node, 3, difficulty=1)
+        self.mine(self.rival, 1, difficulty=2)
+        self.node.max_difficulty = 2
+
+        self.assertEqual(self.node.add_block(copy_block(self.rival.chain[1])), 'reorg')
+        self.assertEqual(self.node.get_latest_block().hash, self.rival.get_latest_block().hash)
+        self.assertEqual(len(self.node.chain), 2)
+
+    def test_longer_branch_with_less_work_stays_aside(self):
+        self.mine(self.node, 1, difficulty=2)
+        tip = self.node.get_latest_block().hash
+        self.mine(self.rival, 3, difficulty=1)
+        self.node.min_difficulty = self.node.max_difficulty = 1
+
+        self.assertEqual([self.node.add_block(copy_block(block)) for block in self.rival.chain[1:]], ['side'] * 3)
+        self.assertEqual(self.node.get_latest_block().hash, tip)
+
+    def test_equal_work_keeps_the_branch_seen_first(self):
+        self.mine(self.node, 2, difficulty=1)
+        tip = self.node.get_latest_block().hash
+        self.mine(self.rival, 2, difficulty=1)
+
+        self.assertEqual([self.node.add_block(copy_block(block)) for block in self.rival.chain[1:]], ['side'] * 2)
+        self.assertEqual(self.node.get_latest_block().hash, tip)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,38 @@
+import unittest
+
+from tests.support import NodeTestCase
+
+class NodeEventsTest(NodeTestCase, unittest.TestCase):
+    def setUp(self):
+        super().setUp()
+        self.node = self.make_node('10.0.0.1')
+        self.node.create_user('alice', 'pw')
+        self.node.create_user('bob', 'pw')
+        self.received = []
+        self.node.events.subscribe(lambda event, data: self.received.append((event, data)))
+
+    def events(self, name):
+        return [data for event, data in self.received if event == name]
+
+    def test_single_transfer_is_published(self):
+        # The CLI and the GUI send through create_transaction
+        self.assertTrue(self.node.create_transaction('alice', 'bob', 10))
+        self.assertEqual([data['hash'] for data in self.events('tx_received')],
+                         [self.node.pending_transactions[0].hash])
+
+    def test_batch_and_received_transfers_are_published(self):
+        created = self.node.create_transactions([('alice', 'bob', 1), ('bob', 'alice', 2)])
+        source = self.make_node('10.0.0.2', template=self.node)
+        source.create_transaction('alice', 'bob', 3)
+        self.node.add_pending_transactions(source.pending_transactions)
+
+        hashes = [tx.hash for tx in created] + [source.pending_transactions[0].hash]
+        self.assertEqual([data['hash'] for data in self.events('tx_received')], hashes)
+
+    def test_mined_block_is_published(self):
+        self.node.create_transaction('alice', 'bob', 10)
+        block = self.node.mine_pending_transactions('alice')
+        self.assertEqual([data['hash'] for data in self.events('block_appended')], [block.hash])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,65 @@
+import os
+import unittest
+
+from tests.support import NodeTestCase
+
+class ExportImportTest(NodeTestCase, unittest.TestCase):
+    def setUp(self):
+        super().setUp()
+        self.source = self.make_node('10.0.0.1')
+        self.source.create_user('alice', 'pw')
+        self.source.create_user('bob', 'pw')
+        for amount in (1, 2, 3, 4):
+            self.source.create_transaction('alice', 'bob', amount)
+            self.source.mine_pending_transactions('alice')
+
+    def hashes(self, node):
+        return [block.hash for block in node.chain]
+
+    def export(self, name: str) -> str:
+        path = os.path.join(self.workdir, name)
+        self.assertEqual(self.source.export_chain(path), len(self.source.chain))
+        return path
+
+    def test_round_trip(self):
+        for name in ('chain.jsonl', 'chain.jsonl.gz'):
+            with self.subTest(name):
+                node = self.make_node(f'10.0.1.{len(self.nodes)}')
+                self.assertEqual(node.import_chain(self.export(name)), len(self.source.chain) - 1)
+                self.assertEqual(self.hashes(node), self.hashes(self.source))
+                self.assertEqual(node.balances, self.source.balances)
+
+    def test_import_again_skips_what_is_held(self):
+        path = self.export('chain.jsonl')
+        node = self.make_node('10.0.0.2')
+        node.import_chain(path)
+        self.assertEqual(node.import_chain(path), 0)
+        self.assertEqual(self.hashes(node), self.hashes(self.source))
+
+    def test_corrupt_record_stops_at_the_last_good_block(self):
+        path = self.export('chain.jsonl')
+        with open(path, 'rb') as f:
+            lines = f.readlines()
+        # Block #3 is cut off mid-record, as by an interrupted copy
+        with open(path, 'wb') as f:
+            f.writelines(lines[:4])
+            f.write(lines[4][:40] + b'\n')
+            f.writelines(lines[5:])
+
+        node = self.make_node('10.0.0.2')
+        self.assertEqual(node.import_chain(path), 2)
+        self.assertEqual(self.hashes(node), self.hashes(self.source)[:3])
+        # What was imported was saved
+        self.crash(node)
+        self.assertEqual(self.hashes(self.make_node('10.0.0.2')), self.hashes(self.source)[:3])
+
+    def test_file_that_is_not_an_export_is_refused(self):
+        path = os.path.join(self.workdir, 'garbage.jsonl')
+        with open(path, 'wb') as f:
+            f.write(b'not json\n')
+        node = self.make_node('10.0.0.2')
+        self.assertEqual(node.import_chain(path), 0)
+        self.assertEqual(len(node.chain), 1)
+
+if __name__ == '__main__':
+    unittest.main()
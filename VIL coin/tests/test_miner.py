@@ -0,0 +1,48 @@
+import time
+import unittest
+from unittest import mock
+
+from tests.support import NodeTestCase
+
+class AutoMinerTest(NodeTestCase, unittest.TestCase):
+    def setUp(self):
+        super().setUp()
+        self.node = self.make_node('10.0.0.1')
+        self.node.create_user('alice', 'pw')
+        self.node.create_user('bob', 'pw')
+
+    def tearDown(self):
+        self.node.stop_auto_miner()
+        super().tearDown()
+
+    def wait_for_height(self, height: int, timeout: float = 5) -> bool:
+        deadline = time.time() + timeout
+        while len(self.node.chain) < height and time.time() < deadline:
+            time.sleep(0.02)
+        return len(self.node.chain) >= height
+
+    def test_mines_once_enough_transactions_are_pending(self):
+        miner = self.node.start_auto_miner('alice', max_pending=2, max_wait=60)
+        self.node.create_transaction('alice', 'bob', 1)
+        self.node.create_transaction('alice', 'bob', 2)
+
+        self.assertTrue(self.wait_for_height(2))
+        self.assertEqual(miner.stats()['transactions_confirmed'], 2)
+
+    def test_stall_expires_after_max_wait(self):
+        mine = self.node.mine_pending_transactions
+        attempts = []
+
+        def first_attempt_fails(miner):
+            attempts.append(time.time())
+            return mine(miner) if len(attempts) > 1 else None
+
+        # The first attempt finds nothing minable, and no later event arrives to clear the stall
+        with mock.patch.object(self.node, 'mine_pending_transactions', side_effect=first_attempt_fails):
+            self.node.start_auto_miner('alice', max_pending=1, max_wait=0.2)
+            self.node.create_transaction('alice', 'bob', 1)
+            self.assertTrue(self.wait_for_height(2))
+        self.assertGreaterEqual(attempts[1] - attempts[0], 0.2)
+
+if __name__ == '__main__':
+    unittest.main()
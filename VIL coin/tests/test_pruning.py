@@ -0,0 +1,46 @@
+import json
+import unittest
+
+from tests.support import NodeTestCase
+
+class PrunedNodeTest(NodeTestCase, unittest.TestCase):
+    def setUp(self):
+        super().setUp()
+        self.node = self.make_node('10.0.0.1')
+        self.node.prune_depth = 5
+        self.node.create_user('alice', 'pw')
+        self.node.create_user('bob', 'pw')
+        for amount in range(1, 11):
+            self.node.create_transaction('alice', 'bob', amount)
+            self.node.mine_pending_transactions('alice')
+
+    def request(self, node, message_type: str, data: dict = None) -> dict:
+        response = node.handle_message({"type": message_type, "data": data or {}}, '10.0.0.2')
+        return json.loads(b''.join(response) if isinstance(response, list) else response)
+
+    def test_bodies_below_the_depth_are_dropped(self):
+        self.assertEqual(self.node.pruned_height, len(self.node.chain) - 5)
+        self.assertTrue(all(block.pruned for block in self.node.chain[1:self.node.pruned_height]))
+        self.assertFalse(any(block.pruned for block in self.node.chain[self.node.pruned_height:]))
+
+    def test_full_chain_request_gets_an_empty_chain_and_the_base(self):
+        response = self.request(self.node, 'request_blockchain')
+        self.assertEqual(response['type'], 'blockchain_response')
+        self.assertEqual(response['data'], [])
+        self.assertEqual(response['base'], self.node.pruned_height)
+
+    def test_full_node_sends_its_whole_chain(self):
+        full = self.make_node('10.0.0.3')
+        response = self.request(full, 'request_blockchain')
+        self.assertEqual([block['hash'] for block in response['data']], [full.chain[0].hash])
+        self.assertNotIn('base', response)
+
+    def test_block_requests_are_served_from_the_base(self):
+        base = self.node.pruned_height
+        response = self.request(self.node, 'request_blocks', {"from": base})
+        self.assertEqual(response['data']['base'], base)
+        self.assertEqual([block['index'] for block in response['data']['blocks']], list(range(base, len(self.node.chain))))
+        self.assertEqual(self.request(self.node, 'request_blocks', {"from": 0})['data']['blocks'], [])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,78 @@
+import json
+import unittest
+from unittest import mock
+
+from VILcoin import Block
+from tests.support import NodeTestCase
+
+def copy_block(block: Block) -> Block:
+    # What a peer receives: its own Block objects, not ours
+    return Block.from_dict(json.loads(block.serialize()))
+
+class ReorgMempoolTest(NodeTestCase, unittest.TestCase):
+    def setUp(self):
+        super().setUp()
+        self.node = self.make_node('10.0.0.1')
+        self.node.create_user('alice', 'pw')
+        self.node.create_user('bob', 'pw')
+        self.node.create_user('carol', 'pw')
+        self.rival = self.make_node('10.0.0.2', template=self.node)
+
+    def confirmed_hashes(self, node):
+        return [tx.hash for block in node.chain for tx in block.transactions if tx.tx_type != "mining_reward"]
+
+    def test_transactions_only_on_the_abandoned_branch_return_to_the_mempool(self):
+        self.node.create_transaction('alice', 'bob', 10)
+        abandoned = self.node.pending_transactions[0]
+        self.node.mine_pending_transactions('alice')
+
+        # The rival confirms another transfer, on a longer branch
+        self.rival.create_transaction('carol', 'bob', 5)
+        confirmed = self.rival.pending_transactions[0]
+        self.rival.mine_pending_transactions('carol')
+        self.rival.create_transaction('carol', 'alice', 1)
+        self.rival.mine_pending_transactions('carol')
+        # The node heard of the rival's first transfer, but not of its block yet
+        self.node.add_pending_transactions([confirmed])
+
+        with mock.patch.object(self.node, 'broadcast_transactions') as broadcast:
+            self.assertEqual(self.node.add_block(copy_block(self.rival.chain[1])), 'side')
+            self.assertEqual(self.node.add_block(copy_block(self.rival.chain[2])), 'reorg')
+
+        self.assertEqual(self.node.get_latest_block().hash, self.rival.get_latest_block().hash)
+        self.assertEqual([tx.hash for tx in self.node.pending_transactions], [abandoned.hash])
+        # Peers on the new branch may never have seen it
+        broadcast.assert_called_once()
+        self.assertEqual([tx.hash for tx in broadcast.call_args[0][0]], [abandoned.hash])
+
+    def test_returned_transaction_is_mined_once(self):
+        self.node.create_transaction('alice', 'bob', 10)
+        abandoned = self.node.pending_transactions[0]
+        self.node.mine_pending_transactions('alice')
+        for amount in (1, 2):
+            self.rival.create_transaction('carol', 'bob', amount)
+            self.rival.mine_pending_transactions('carol')
+        for block in self.rival.chain[1:]:
+            self.node.add_block(copy_block(block))
+
+        block = self.node.mine_pending_transactions('bob')
+        self.assertEqual([tx.hash for tx in block.transactions if tx.tx_type != "mining_reward"], [abandoned.hash])
+        self.assertFalse(self.node.pending_transactions)
+        confirmed = self.confirmed_hashes(self.node)
+        self.assertEqual(len(confirmed), len(set(confirmed)))
+        self.assertIsNone(self.node.mine_pending_transactions('bob'))
+
+    def test_balances_follow_the_new_branch(self):
+        self.node.create_transaction('alice', 'bob', 10)
+        self.node.mine_pending_transactions('alice')
+        for amount in (1, 2):
+            self.rival.create_transaction('carol', 'bob', amount)
+            self.rival.mine_pending_transactions('carol')
+        for block in self.rival.chain[1:]:
+            self.node.add_block(copy_block(block))
+
+        for username in ('alice', 'bob', 'carol'):
+            self.assertEqual(self.node.get_balance(username), self.rival.get_balance(username))
+
+if __name__ == '__main__':
+    unittest.main()
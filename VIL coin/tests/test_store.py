@@ -0,0 +1,91 @@
+import os
+import unittest
+
+from tests.support import NodeTestCase
+
+class JournalReplayTest(NodeTestCase, unittest.TestCase):
+    def setUp(self):
+        super().setUp()
+        self.node = self.make_node('10.0.0.1')
+        self.node.create_user('alice', 'pw')
+        self.node.create_user('bob', 'pw')
+        self.node.create_transaction('alice', 'bob', 10)
+        self.mined = self.node.mine_pending_transactions('alice')
+        self.node.create_transaction('bob', 'alice', 3)
+
+    def state(self, node):
+        return (len(node.chain), node.get_latest_block().hash, sorted(node.users),
+                {username: node.get_balance(username) for username in node.users},
+                [tx.hash for tx in node.pending_transactions])
+
+    def test_restart_after_crash_replays_the_journal(self):
+        before = self.state(self.node)
+        self.crash(self.node)
+
+        restarted = self.make_node('10.0.0.1')
+        self.assertEqual(self.state(restarted), before)
+        self.assertEqual(restarted.get_latest_block().hash, self.mined.hash)
+        self.assertEqual(len(restarted.pending_transactions), 1)
+
+    def test_torn_last_record_is_ignored(self):
+        before = self.state(self.node)
+        self.crash(self.node)
+        with open(os.path.join(self.workdir, '10.0.0.1', 'journal.log'), 'ab') as f:
+            f.write(b'0badc0de {"op": "pending", "transactions": [')
+
+        self.assertEqual(self.state(self.make_node('10.0.0.1')), before)
+
+    def test_checkpoint_retires_the_journal(self):
+        self.node.save_data()
+        before = self.state(self.node)
+        self.assertFalse(self.node.store.read_journal())
+        self.crash(self.node)
+
+        self.assertEqual(self.state(self.make_node('10.0.0.1')), before)
+
+    def test_new_node_checkpoints_its_genesis(self):
+        # Without it, the journal's blocks would be replayed on top of a different genesis
+        node = self.make_node('10.0.0.2')
+        self.assertTrue(node.store.exists())
+        genesis = node.chain[0].hash
+        self.crash(node)
+
+        self.assertEqual(self.make_node('10.0.0.2').chain[0].hash, genesis)
+
+class CompactionTest(NodeTestCase, unittest.TestCase):
+    def setUp(self):
+        super().setUp()
+        self.node = self.make_node('10.0.0.1')
+        self.node.prune_depth = 5
+        self.node.create_user('alice', 'pw')
+        self.node.create_user('bob', 'pw')
+
+    def mine(self, blocks: int):
+        for _ in range(blocks):
+            for amount in range(1, 21):
+                self.assertTrue(self.node.create_transaction('alice', 'bob', amount / 100))
+            self.node.mine_pending_transactions('alice')
+            self.node.save_data()
+
+    def test_pruned_bodies_do_not_pile_up_in_blocks_dat(self):
+        self.mine(100)
+        live = sum(len(block.serialize()) + 1 for block in self.node.chain)
+        block_size = len(self.node.get_latest_block().serialize()) + 1
+        size = os.path.getsize(self.node.store.blocks_path)
+        # At most compact_ratio of the file is dead after a checkpoint, plus the block that tipped it over
+        self.assertLessEqual(size, live / (1 - self.node.store.compact_ratio) + block_size)
+        self.assertLess(size, block_size * len(self.node.chain) / 3)
+
+    def test_restart_after_compaction_keeps_the_chain(self):
+        self.mine(30)
+        hashes = [block.hash for block in self.node.chain]
+        pruned_height = self.node.pruned_height
+        self.crash(self.node)
+
+        restarted = self.make_node('10.0.0.1')
+        self.assertEqual([block.hash for block in restarted.chain], hashes)
+        self.assertEqual(restarted.pruned_height, pruned_height)
+        self.assertEqual(restarted.get_balance('bob'), self.node.get_balance('bob'))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,60 @@
+import unittest
+
+from tests.support import NodeTestCase
+
+class UserSyncTest(NodeTestCase, unittest.TestCase):
+    def setUp(self):
+        super().setUp()
+        self.source = self.make_node('10.0.0.1')
+        for i in range(25):
+            self.source.create_user(f"user{i}", 'pw')
+        self.node = self.make_node('10.0.0.2')
+        self.node.user_batch_size = 10
+
+    def sync(self):
+        """Users added by one sync with the source, and the requests it took"""
+        self.node.transport.requests = []
+        added = self.node.sync_users_from_peer('10.0.0.1')
+        return added, [request['data'] for request in self.node.transport.requests]
+
+    def test_first_sync_fetches_every_user_in_batches(self):
+        added, requests = self.sync()
+        self.assertEqual(added, 25)
+        self.assertEqual(sorted(self.node.users), sorted(self.source.users))
+        self.assertEqual([request['since'] for request in requests], [0, 10, 20])
+        self.assertEqual(self.node.user_cursors['10.0.0.1'], (25, 'user24'))
+
+    def test_later_sync_only_fetches_new_users(self):
+        self.sync()
+        # Announcements of new accounts can be missed; the next sync picks them up
+        self.source.remove_peer('10.0.0.2')
+        for i in range(25, 28):
+            self.source.create_user(f"user{i}", 'pw')
+        self.assertEqual(len(self.node.users), 25)
+
+        added, requests = self.sync()
+        self.assertEqual(added, 3)
+        self.assertEqual([request['since'] for request in requests], [25])
+        self.assertEqual(sorted(self.node.users), sorted(self.source.users))
+
+    def test_up_to_date_node_fetches_nothing(self):
+        self.sync()
+        added, requests = self.sync()
+        self.assertEqual(added, 0)
+        self.assertEqual(len(requests), 1)
+
+    def test_cursor_from_a_reset_registry_starts_over(self):
+        # The position is past the source's end, as after the source lost its users
+        self.node.user_cursors['10.0.0.1'] = (40, 'someone')
+        added, requests = self.sync()
+        self.assertEqual(added, 25)
+        self.assertEqual(requests[0]['since'], 40)
+        self.assertEqual(sorted(self.node.users), sorted(self.source.users))
+
+    def test_old_nodes_still_get_the_whole_registry(self):
+        response = self.source.handle_message({"type": "request_users", "data": {}}, '10.0.0.2')
+        self.assertIn(b'"user24"', response)
+        self.assertNotIn(b'"version"', response)
+
+if __name__ == '__main__':
+    unittest.main()